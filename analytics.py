@@ -0,0 +1,171 @@
+"""Sales analytics from daily rollup tables.
+
+Every purchase and order adds its units and revenue to ``sales_by_category``
+and ``sales_by_sweet`` in the transaction that takes the stock (see
+:func:`record_sale`). Each table holds one row per key per UTC day. The
+row's ``units`` and ``revenue`` columns pack the day's 24 hourly values as
+little-endian int64 and float64 arrays. A report therefore never reads
+individual sales. Its cost depends on the length of the range and the number
+of keys, not on how much was sold.
+
+A report reads one row per key and day and decodes all the arrays with a
+single ``np.frombuffer``. NumPy then scatters them into a dense (key x hour)
+grid and sums hours into the requested buckets. Packing the hours keeps a
+90-day report to a few thousand rows; building a Python object per hourly row
+would cost more than the report itself.
+"""
+
+import math
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from models import SalesByCategory, SalesBySweet
+from schemas import SalesReport, SalesSeries
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+GRANULARITIES = {"hour": HOUR, "day": DAY}
+# Upper bound on the buckets of one report: a little over a year of hours
+MAX_BUCKETS = 10_000
+
+_UNITS = np.dtype("<i8")
+_REVENUE = np.dtype("<f8")
+
+_ROLLUPS = {
+    "category": (SalesByCategory, SalesByCategory.category),
+    "sweet": (SalesBySweet, SalesBySweet.sweet_id),
+}
+
+# Plain SQL on the write path: building the equivalent Core statements on
+# every sale costs far more than running them.
+_ROLLUP_SQL = tuple(
+    (
+        text(f"SELECT units, revenue FROM {model.__tablename__} WHERE day = :day AND {key_column.key} = :key"),
+        text(
+            f"INSERT INTO {model.__tablename__} (day, {key_column.key}, units, revenue) "
+            "VALUES (:day, :key, :units, :revenue) "
+            f"ON CONFLICT (day, {key_column.key}) DO UPDATE SET units = excluded.units, revenue = excluded.revenue"
+        ),
+    )
+    for model, key_column in _ROLLUPS.values()
+)
+
+
+def record_sale(db: Session, category: str, sweet_id: int, units: int, revenue: float, at: float | None = None) -> None:
+    """Add a sale to both rollups inside the current transaction.
+
+    Each rollup row is read, updated and written back. This is only safe
+    because the caller has already taken the stock in the same transaction,
+    so it holds SQLite's write lock and no other sale can change the row in
+    between. The caller owns the commit, so the sale is counted if and only if
+    the stock it took is.
+
+    Args:
+        db: Active SQLAlchemy session that has already written.
+        category: Category of the sweet sold.
+        sweet_id: Identifier of the sweet sold.
+        units: Number of units sold.
+        revenue: Amount charged for them.
+        at: Time of the sale in seconds since the epoch, defaults to now.
+    """
+
+    moment = int(time.time() if at is None else at)
+    day, hour = moment // DAY * DAY, moment % DAY // HOUR
+    for (read, write), key in zip(_ROLLUP_SQL, (category, sweet_id)):
+        stored = db.execute(read, {"day": day, "key": key}).first()
+        if stored is None:
+            hourly_units, hourly_revenue = np.zeros(24, _UNITS), np.zeros(24, _REVENUE)
+        else:
+            hourly_units = np.frombuffer(stored.units, _UNITS).copy()
+            hourly_revenue = np.frombuffer(stored.revenue, _REVENUE).copy()
+        hourly_units[hour] += units
+        hourly_revenue[hour] += revenue
+        db.execute(
+            write,
+            {"day": day, "key": key, "units": hourly_units.tobytes(), "revenue": hourly_revenue.tobytes()},
+        )
+
+
+def sales_report(
+    db: Session,
+    group_by: str,
+    start: float,
+    end: float,
+    granularity: str = "day",
+    key: str | int | None = None,
+) -> SalesReport:
+    """Build a sales report over a time range.
+
+    Args:
+        db: Active SQLAlchemy session.
+        group_by: "category" or "sweet".
+        start: Start of the range in seconds since the epoch, rounded down
+            to a whole bucket.
+        end: End of the range (exclusive) in seconds since the epoch.
+        granularity: "hour" or "day"; days are UTC days.
+        key: Restrict the report to one category or sweet.
+
+    Returns:
+        One series per key that sold anything in the range, best-selling
+        by revenue first, aligned with the report's buckets.
+
+    Raises:
+        ValueError: If the range is empty or spans more than
+            ``MAX_BUCKETS`` buckets.
+    """
+
+    if end <= start:
+        raise ValueError("The report range must end after it starts")
+    step = GRANULARITIES[granularity]
+    first = int(start // step) * step
+    count = math.ceil((end - first) / step)
+    if count > MAX_BUCKETS:
+        raise ValueError(f"The report range spans more than {MAX_BUCKETS} {granularity}s")
+    first_day = first // DAY * DAY
+    days = math.ceil((first + count * step - first_day) / DAY)
+
+    model, key_column = _ROLLUPS[group_by]
+    query = select(key_column, model.day, model.units, model.revenue).where(
+        model.day >= first_day, model.day < first_day + days * DAY
+    )
+    if key is not None:
+        query = query.where(key_column == key)
+    # Core execution: the ORM's per-row loading would double the fetch time
+    rows = db.connection().execute(query).all()
+
+    buckets = [datetime.fromtimestamp(first + index * step, timezone.utc) for index in range(count)]
+    if not rows:
+        return SalesReport(group_by=group_by, granularity=granularity, buckets=buckets, series=[])
+
+    keys, row_days, units, revenue = zip(*rows)
+    labels, key_index = np.unique(keys, return_inverse=True)
+    day_index = (np.asarray(row_days) - first_day) // DAY
+    # Trim the hours outside the range, then sum them into buckets
+    hours = slice((first - first_day) // HOUR, (first - first_day) // HOUR + count * step // HOUR)
+
+    def bucketed(blobs: tuple[bytes, ...], dtype: np.dtype) -> np.ndarray:
+        grid = np.zeros((len(labels), days, 24), dtype)
+        grid[key_index, day_index] = np.frombuffer(b"".join(blobs), dtype).reshape(-1, 24)
+        return grid.reshape(len(labels), -1)[:, hours].reshape(len(labels), count, -1).sum(axis=2)
+
+    units_grid = bucketed(units, _UNITS)
+    revenue_grid = bucketed(revenue, _REVENUE).round(2)
+    total_units = units_grid.sum(axis=1)
+    total_revenue = revenue_grid.sum(axis=1).round(2)
+
+    series = [
+        SalesSeries(
+            key=labels[index].item(),
+            units=units_grid[index].tolist(),
+            revenue=revenue_grid[index].tolist(),
+            total_units=total_units[index].item(),
+            total_revenue=total_revenue[index].item(),
+        )
+        for index in np.argsort(-total_revenue, kind="stable")
+        if total_units[index]
+    ]
+    return SalesReport(group_by=group_by, granularity=granularity, buckets=buckets, series=series)
@@ -0,0 +1,87 @@
+"""Async counterparts of the ``crud`` write paths for ``async def`` routes.
+
+Each function runs the matching ``crud`` function on the session's sync
+facade through ``AsyncSession.run_sync``. The query logic therefore lives
+only in ``crud``, while the SQLite I/O is awaited on the aiosqlite driver
+instead of blocking the event loop.
+"""
+
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import crud
+from models import Order, Sweet, User
+from schemas import OrderCreate, SweetCreate, SweetImportRow, SweetUpdate, UserCreate
+
+
+async def get_user_by_email(db: AsyncSession, email: str) -> User | None:
+    """Async version of :func:`crud.get_user_by_email`."""
+
+    return await db.run_sync(crud.get_user_by_email, email)
+
+
+async def create_user(
+    db: AsyncSession, user_in: UserCreate, role: str = "customer", hashed_password: str | None = None
+) -> User:
+    """Async version of :func:`crud.create_user`."""
+
+    return await db.run_sync(crud.create_user, user_in, role, hashed_password)
+
+
+async def create_sweet(db: AsyncSession, sweet_in: SweetCreate, owner_id: int) -> Sweet:
+    """Async version of :func:`crud.create_sweet`."""
+
+    return await db.run_sync(crud.create_sweet, sweet_in, owner_id)
+
+
+async def upsert_sweets(db: AsyncSession, rows: list[SweetImportRow], owner_id: int) -> tuple[int, set[int]]:
+    """Async version of :func:`crud.upsert_sweets`."""
+
+    return await db.run_sync(crud.upsert_sweets, rows, owner_id)
+
+
+async def get_sweet(db: AsyncSession, sweet_id: int) -> Sweet | None:
+    """Async version of :func:`crud.get_sweet`."""
+
+    return await db.run_sync(crud.get_sweet, sweet_id)
+
+
+async def update_sweet(
+    db: AsyncSession, sweet_id: int, sweet_update: SweetUpdate, expected_version: int | None = None
+) -> Row | str | None:
+    """Async version of :func:`crud.update_sweet`."""
+
+    return await db.run_sync(crud.update_sweet, sweet_id, sweet_update, expected_version)
+
+
+async def delete_sweet(db: AsyncSession, sweet_id: int) -> Sweet | None:
+    """Async version of :func:`crud.delete_sweet`."""
+
+    return await db.run_sync(crud.delete_sweet, sweet_id)
+
+
+async def purchase_sweet(db: AsyncSession, sweet_id: int, quantity: int = 1) -> Row | str | None:
+    """Async version of :func:`crud.purchase_sweet`."""
+
+    return await db.run_sync(crud.purchase_sweet, sweet_id, quantity)
+
+
+async def restock_sweet(db: AsyncSession, sweet_id: int, quantity_to_add: int) -> Sweet | None:
+    """Async version of :func:`crud.restock_sweet`."""
+
+    return await db.run_sync(crud.restock_sweet, sweet_id, quantity_to_add)
+
+
+def _create_order_with_lines(db: Session, order_in: OrderCreate, user_id: int) -> tuple[Order, list[Row]]:
+    order, updated = crud.create_order(db, order_in, user_id)
+    # Load the lines while still inside run_sync; a lazy load during response
+    # serialization would happen outside the async driver's greenlet.
+    db.refresh(order, ["lines"])
+    return order, updated
+
+
+async def create_order(db: AsyncSession, order_in: OrderCreate, user_id: int) -> tuple[Order, list[Row]]:
+    """Async version of :func:`crud.create_order`, returning the order with its lines loaded."""
+
+    return await db.run_sync(_create_order_with_lines, order_in, user_id)
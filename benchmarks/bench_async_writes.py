@@ -0,0 +1,127 @@
+"""Event-loop lag and WebSocket latency during a burst of purchases.
+
+Runs concurrent purchase tasks on one event loop, the way ``async def``
+routes share uvicorn's loop. It runs twice: once calling the sync
+``crud.purchase_sweet`` directly (every commit blocks the loop) and once
+awaiting ``async_crud.purchase_sweet`` on aiosqlite. Meanwhile a monitor
+measures how late 1 ms timers fire, and a heartbeat is broadcast to a
+simulated WebSocket client every 5 ms.
+
+Usage:
+    python benchmarks/bench_async_writes.py [purchases] [concurrency]
+"""
+
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import AsyncAdaptedQueuePool, create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import async_crud
+import crud
+import models
+from database import Base
+from websocket_manager import ConnectionManager
+
+
+class TimingSocket:
+    def __init__(self) -> None:
+        self.latencies: list[float] = []
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        self.latencies.append((time.perf_counter() - json.loads(data)["sent"]) * 1000)
+
+
+def p99(values: list[float]) -> float:
+    return statistics.quantiles(values, n=100)[98] if len(values) > 1 else values[0]
+
+
+async def run(workdir: str, purchases: int, concurrency: int, use_async: bool) -> dict[str, float]:
+    url = f"{workdir}/bench_{'async' if use_async else 'sync'}.db"
+    engine = create_engine(f"sqlite:///{url}", connect_args={"check_same_thread": False}, pool_size=concurrency)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with SessionLocal() as db:
+        owner = models.User(email="bench@example.com", hashed_password="x", role="admin")
+        db.add(owner)
+        db.flush()
+        sweet = models.Sweet(name="Bench Toffee", category="Candy", price=1.0, quantity=purchases, owner_id=owner.id)
+        db.add(sweet)
+        db.commit()
+        sweet_id = sweet.id
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{url}", poolclass=AsyncAdaptedQueuePool, pool_size=concurrency)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    manager = ConnectionManager()
+    socket = TimingSocket()
+    await manager.connect(socket)
+    lags: list[float] = []
+    done = asyncio.Event()
+
+    async def monitor() -> None:
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append((time.perf_counter() - started - 0.001) * 1000)
+
+    async def heartbeat() -> None:
+        while not done.is_set():
+            await manager.broadcast({"type": "heartbeat", "sent": time.perf_counter()})
+            await asyncio.sleep(0.005)
+
+    remaining = purchases
+
+    async def buyer() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            if use_async:
+                async with AsyncSessionLocal() as db:
+                    await async_crud.purchase_sweet(db, sweet_id)
+            else:
+                with SessionLocal() as db:
+                    crud.purchase_sweet(db, sweet_id)
+                await asyncio.sleep(0)
+
+    background = [asyncio.create_task(monitor()), asyncio.create_task(heartbeat())]
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await asyncio.gather(*(buyer() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await asyncio.gather(*background)
+    await asyncio.sleep(0.01)
+    manager.disconnect(socket)
+    await async_engine.dispose()
+    engine.dispose()
+    return {
+        "purchases/s": purchases / elapsed,
+        "loop lag p99 ms": p99(lags),
+        "loop lag max ms": max(lags),
+        "ws latency p99 ms": p99(socket.latencies),
+    }
+
+
+def main() -> None:
+    purchases = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    workdir = tempfile.mkdtemp(prefix="bench_async_")
+    print(f"{purchases} purchases from {concurrency} concurrent tasks")
+    for label, use_async in (("sync crud", False), ("async_crud", True)):
+        result = asyncio.run(run(workdir, purchases, concurrency, use_async))
+        print(f"{label:<11} " + "  ".join(f"{name} {value:8.2f}" for name, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
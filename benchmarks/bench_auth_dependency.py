@@ -0,0 +1,59 @@
+"""Per-request cost of the ``Depends(get_current_user)`` dependency.
+
+Resolves the same bearer token repeatedly, once clearing the principal cache
+before every call (the previous decode-and-query path) and once letting the
+cache serve repeat requests.
+
+Usage:
+    python benchmarks/bench_auth_dependency.py [requests]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+import security
+from database import Base
+
+
+def run(SessionLocal, token: str, requests: int, cached: bool) -> float:
+    security.clear_principal_cache()
+    started = time.perf_counter()
+    for _ in range(requests):
+        if not cached:
+            security.clear_principal_cache()
+        # FastAPI opens a fresh session per request for Depends(get_db).
+        with SessionLocal() as db:
+            security.get_current_user(token, db)
+    return (time.perf_counter() - started) / requests * 1_000_000
+
+
+def main() -> None:
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    workdir = tempfile.mkdtemp(prefix="bench_auth_")
+    engine = create_engine(f"sqlite:///{workdir}/bench.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with SessionLocal() as db:
+        db.add(models.User(email="bench@example.com", hashed_password="x", role="customer"))
+        db.commit()
+    token = security.create_access_token({"sub": "bench@example.com"})
+
+    before = run(SessionLocal, token, requests, cached=False)
+    after = run(SessionLocal, token, requests, cached=True)
+    print(f"{requests} requests with one token")
+    print(f"  before (decode + query)  {before:8.1f} us/request")
+    print(f"  after  (principal cache) {after:8.1f} us/request")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Throughput benchmark for the bulk catalog import pipeline.
+
+Streams generated NDJSON through the same line splitting, validation and
+batched upserts used by ``POST /api/sweets/bulk`` and reports rows per second.
+
+Usage:
+    python benchmarks/bench_bulk_import.py [rows ...]   # default: 10000 100000
+    python benchmarks/bench_bulk_import.py 10000 100000 1000000
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import bulk_import
+import crud
+import models
+from database import Base
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def body_chunks(rows: int):
+    """Yield an NDJSON body in network-sized chunks."""
+
+    buffer = bytearray()
+    for index in range(rows):
+        line = {"name": f"Sweet {index}", "category": f"Category {index % 50}", "price": 1.0 + index % 7, "quantity": index % 100}
+        buffer += json.dumps(line).encode() + b"\n"
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+async def import_rows(db, rows: int, owner_id: int) -> int:
+    imported = 0
+    batch = []
+    async for _, row, _ in bulk_import.iter_rows(bulk_import.iter_lines(body_chunks(rows)), "ndjson"):
+        batch.append(row)
+        if len(batch) >= bulk_import.BATCH_SIZE:
+            imported += crud.upsert_sweets(db, batch, owner_id=owner_id)[0]
+            batch = []
+    imported += crud.upsert_sweets(db, batch, owner_id=owner_id)[0]
+    return imported
+
+
+def run(rows: int) -> float:
+    workdir = tempfile.mkdtemp(prefix="bench_bulk_")
+    engine = create_engine(f"sqlite:///{workdir}/bench.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with SessionLocal() as db:
+        owner = models.User(email="bench@example.com", hashed_password="x", role="admin")
+        db.add(owner)
+        db.commit()
+
+        started = time.perf_counter()
+        imported = asyncio.run(import_rows(db, rows, owner.id))
+        elapsed = time.perf_counter() - started
+
+    engine.dispose()
+    assert imported == rows
+    return rows / elapsed
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    for rows in sizes:
+        print(f"{rows:>9} rows  {run(rows):10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Catalog read throughput with the read-through cache on and off.
+
+Replays a read-heavy mix (single sweets, list pages and searches) with one
+write per ``WRITE_EVERY`` reads, going through ``catalog_cache`` exactly as
+the API routes do.
+
+Usage:
+    python benchmarks/bench_catalog_cache.py [rows] [reads]
+"""
+
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import catalog_cache
+import crud
+import models
+from database import Base
+
+WRITE_EVERY = 100
+
+
+def seed(db, rows: int) -> None:
+    owner = models.User(email="bench@example.com", hashed_password="x", role="admin")
+    db.add(owner)
+    db.flush()
+    db.execute(
+        insert(models.Sweet),
+        [
+            {"name": f"Sweet {index}", "category": f"Category {index % 20}", "price": float(index % 50), "quantity": 1000, "owner_id": owner.id}
+            for index in range(rows)
+        ],
+    )
+    db.commit()
+
+
+def replay(db, rows: int, reads: int) -> float:
+    rng = random.Random(7)
+    hot_ids = [rng.randint(1, rows) for _ in range(200)]
+    started = time.perf_counter()
+    for index in range(reads):
+        choice = index % 4
+        if choice == 0:
+            catalog_cache.get_sweets(db, limit=100)
+        elif choice == 1:
+            catalog_cache.search_sweets(db, category=f"Category {rng.randint(0, 3)}", limit=100)
+        else:
+            catalog_cache.get_sweet(db, rng.choice(hot_ids))
+        if index % WRITE_EVERY == WRITE_EVERY - 1:
+            sweet_id = rng.choice(hot_ids)
+            crud.purchase_sweet(db, sweet_id)
+            catalog_cache.invalidate(sweet_id)
+    return reads / (time.perf_counter() - started)
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    reads = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    workdir = tempfile.mkdtemp(prefix="bench_cache_")
+    engine = create_engine(f"sqlite:///{workdir}/bench.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with SessionLocal() as db:
+        seed(db, rows)
+        print(f"{rows} rows, {reads} reads, one write per {WRITE_EVERY} reads")
+        for enabled in (False, True):
+            catalog_cache.ENABLED = enabled
+            catalog_cache.invalidate()
+            throughput = replay(db, rows, reads)
+            print(f"  cache {'on ' if enabled else 'off'}  {throughput:10.0f} reads/s")
+        print(f"  counters {catalog_cache.stats()}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
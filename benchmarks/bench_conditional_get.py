@@ -0,0 +1,111 @@
+"""Bandwidth and CPU saved by ETag revalidation of dashboard catalog reads.
+
+Replays dashboard traffic through the full HTTP stack: clients mount or
+reconnect and call ``GET /api/sweets``, and sometimes open a sweet. One
+purchase is made every ``write_every`` reads (see ``WRITE_RATES``). At each
+write rate the replay runs twice: once with clients that never revalidate
+and once with clients that send back the ETag they last saw, the way a
+browser's HTTP cache does with ``Cache-Control: no-cache``.
+
+Usage:
+    python benchmarks/bench_conditional_get.py [rows] [reads]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+WORKDIR = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{WORKDIR.name}/bench_conditional.db"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+import migrations
+import models
+import security
+from database import SessionLocal, engine
+from main import app
+
+CLIENTS = 20
+WRITE_RATES = (25, 200)
+
+
+def seed(rows: int) -> tuple[dict[str, str], list[int]]:
+    migrations.migrate(engine)
+    with SessionLocal() as db:
+        owner = models.User(email="bench@example.com", hashed_password="x", role="admin")
+        db.add(owner)
+        db.flush()
+        db.execute(
+            insert(models.Sweet),
+            [
+                {"name": f"Sweet {index}", "category": f"Category {index % 20}", "price": float(index % 50), "quantity": 100000, "owner_id": owner.id}
+                for index in range(rows)
+            ],
+        )
+        db.commit()
+        token = security.create_access_token({"sub": owner.email})
+        ids = [sweet.id for sweet in db.query(models.Sweet.id).limit(100)]
+    return {"Authorization": f"Bearer {token}"}, ids
+
+
+def replay(client: TestClient, headers: dict[str, str], ids: list[int], reads: int, write_every: int, revalidate: bool) -> dict[str, float]:
+    rng = random.Random(11)
+    etags: dict[tuple[int, str], str] = {}
+    body_bytes = 0
+    not_modified = 0
+    latency = {200: 0.0, 304: 0.0}
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    for index in range(reads):
+        user = rng.randrange(CLIENTS)
+        path = "/api/sweets" if rng.random() < 0.8 else f"/api/sweets/{rng.choice(ids)}"
+        request_headers = dict(headers)
+        if revalidate and (user, path) in etags:
+            request_headers["If-None-Match"] = etags[(user, path)]
+        request_started = time.perf_counter()
+        response = client.get(path, headers=request_headers)
+        latency[response.status_code] += time.perf_counter() - request_started
+        if response.status_code == 304:
+            not_modified += 1
+        else:
+            etags[(user, path)] = response.headers["ETag"]
+        body_bytes += len(response.content)
+        if index % write_every == write_every - 1:
+            client.post(f"/api/sweets/{rng.choice(ids)}/purchase", headers=headers)
+    elapsed = time.perf_counter() - started
+    return {
+        "cpu_ms_per_read": (time.process_time() - cpu_started) * 1000 / reads,
+        "reads_per_second": reads / elapsed,
+        "body_kib": body_bytes / 1024,
+        "not_modified": not_modified / reads,
+        "ms_per_200": latency[200] * 1000 / (reads - not_modified),
+        "ms_per_304": latency[304] * 1000 / not_modified if not_modified else 0.0,
+    }
+
+
+def main(rows: int, reads: int) -> None:
+    headers, ids = seed(rows)
+    client = TestClient(app)
+    replay(client, headers, ids, 100, WRITE_RATES[0], revalidate=False)
+    print(f"{'write every':<12}{'clients':<14}{'CPU ms/read':>12}{'reads/s':>10}{'body KiB':>11}{'304 share':>11}{'ms/200':>8}{'ms/304':>8}")
+    for write_every in WRITE_RATES:
+        for name, revalidate in (("unconditional", False), ("revalidating", True)):
+            result = replay(client, headers, ids, reads, write_every, revalidate)
+            print(
+                f"{write_every:<12}{name:<14}{result['cpu_ms_per_read']:>12.3f}{result['reads_per_second']:>10.0f}"
+                f"{result['body_kib']:>11.0f}{result['not_modified']:>11.0%}"
+                f"{result['ms_per_200']:>8.2f}{result['ms_per_304']:>8.2f}"
+            )
+    engine.dispose()
+    WORKDIR.cleanup()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000, int(sys.argv[2]) if len(sys.argv) > 2 else 2000)
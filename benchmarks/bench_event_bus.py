@@ -0,0 +1,94 @@
+"""Event delivery throughput across worker processes sharing a SQLiteEventBus.
+
+Spreads a fixed number of simulated WebSocket clients and published events
+evenly over 1, 2, 4 ... worker processes. Each worker runs its own
+``ConnectionManager`` on the shared bus and fans events out to its own
+clients only. Reports, once every client has every event, the events
+published per second across all workers and the resulting client deliveries
+per second. Scaling needs as many free cores as workers.
+
+Usage:
+    python benchmarks/bench_event_bus.py [clients] [events] [max_workers]
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from event_bus import SQLiteEventBus
+from websocket_manager import ConnectionManager
+
+
+class CountingSocket:
+    received = 0
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        self.received += 1
+
+
+async def worker_main(path: str, clients: int, events: int, expected: int, ready, go) -> None:
+    manager = ConnectionManager(queue_size=expected + 1, bus=SQLiteEventBus(path, poll_interval=0.005))
+    await manager.start()
+    sockets = [CountingSocket() for _ in range(clients)]
+    for socket in sockets:
+        await manager.connect(socket)
+    ready.wait()
+    go.wait()
+    for n in range(events):
+        await manager.broadcast({"type": "sweet_purchased", "data": {"id": n, "pid": os.getpid()}})
+    while any(socket.received < expected for socket in sockets):
+        await asyncio.sleep(0.005)
+    for websocket in list(manager.active_connections):
+        manager.disconnect(websocket)
+    await manager.stop()
+
+
+def worker(path: str, clients: int, events: int, expected: int, ready, go) -> None:
+    asyncio.run(worker_main(path, clients, events, expected, ready, go))
+
+
+def run(workers: int, clients: int, events: int) -> tuple[float, float]:
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_bus_"), "events.db")
+    per_worker_events = events // workers
+    expected = per_worker_events * workers
+    ready = multiprocessing.Barrier(workers + 1)
+    go = multiprocessing.Barrier(workers + 1)
+    processes = [
+        multiprocessing.Process(target=worker, args=(path, clients // workers, per_worker_events, expected, ready, go))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    ready.wait()
+    started = time.perf_counter()
+    go.wait()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    return expected / elapsed, (clients // workers) * workers * expected / elapsed
+
+
+def main() -> None:
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 4_000
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    max_workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    print(f"{clients} clients, {events} events, {os.cpu_count()} CPUs")
+    workers = 1
+    print(f"{'workers':<10}{'events/s':>12}{'deliveries/s':>16}")
+    while workers <= max_workers:
+        events_per_second, deliveries_per_second = run(workers, clients, events)
+        print(f"{workers:<10}{events_per_second:>12,.0f}{deliveries_per_second:>16,.0f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Per-request cost of Idempotency-Key handling on the purchase path.
+
+Runs sequential purchases through ``async_crud.purchase_sweet`` wrapped in
+``idempotency.guard``, the way the purchase route does. It compares no key,
+keys held in memory, and keys also persisted to the ``idempotency_keys``
+table. It then replays every in-memory key to time the duplicate path, which
+never touches ``sweets``.
+
+Usage:
+    python benchmarks/bench_idempotency.py [purchases]
+"""
+
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import async_crud
+import idempotency
+import migrations
+import models
+import schemas
+
+
+class FakeRequest:
+    method = "POST"
+
+    def __init__(self, path: str) -> None:
+        self.url = type("URL", (), {"path": path})()
+
+    async def body(self) -> bytes:
+        return b""
+
+
+def p99(values: list[float]) -> float:
+    return statistics.quantiles(values, n=100)[98] if len(values) > 1 else values[0]
+
+
+async def purchase(AsyncSessionLocal, sweet_id: int, key: str | None) -> None:
+    request = FakeRequest(f"/api/sweets/{sweet_id}/purchase")
+    async with AsyncSessionLocal() as db:
+        async with idempotency.guard(request, 1, key) as attempt:
+            if attempt.replay is not None:
+                return
+            result = await async_crud.purchase_sweet(db, sweet_id)
+            attempt.save(schemas.Sweet.model_validate(result).model_dump())
+
+
+async def timed(AsyncSessionLocal, sweet_id: int, keys: list[str | None]) -> list[float]:
+    latencies = []
+    for key in keys:
+        started = time.perf_counter()
+        await purchase(AsyncSessionLocal, sweet_id, key)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def main(purchases: int) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"{workdir}/bench_idempotency.db"
+        engine = create_engine(f"sqlite:///{url}", connect_args={"check_same_thread": False})
+        migrations.migrate(engine)
+        with sessionmaker(bind=engine)() as db:
+            owner = models.User(email="bench@example.com", hashed_password="x", role="admin")
+            db.add(owner)
+            db.flush()
+            sweet = models.Sweet(name="Bench Toffee", category="Candy", price=1.0, quantity=purchases * 10, owner_id=owner.id)
+            db.add(sweet)
+            db.commit()
+            sweet_id = sweet.id
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{url}")
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+        await timed(AsyncSessionLocal, sweet_id, [None] * 20)
+        memory_keys = [uuid.uuid4().hex for _ in range(purchases)]
+        runs = {}
+        idempotency.store = idempotency.IdempotencyStore()
+        runs["no key"] = await timed(AsyncSessionLocal, sweet_id, [None] * purchases)
+        runs["memory keys"] = await timed(AsyncSessionLocal, sweet_id, memory_keys)
+        runs["memory replays"] = await timed(AsyncSessionLocal, sweet_id, memory_keys)
+        idempotency.store = idempotency.IdempotencyStore(engine=engine)
+        runs["sqlite keys"] = await timed(AsyncSessionLocal, sweet_id, [uuid.uuid4().hex for _ in range(purchases)])
+
+        baseline = statistics.mean(runs["no key"])
+        print(f"{'mode':<16}{'mean ms':>10}{'p99 ms':>10}{'overhead ms':>14}")
+        for name, latencies in runs.items():
+            mean = statistics.mean(latencies)
+            print(f"{name:<16}{mean:>10.3f}{p99(latencies):>10.3f}{mean - baseline:>14.3f}")
+        await async_engine.dispose()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,131 @@
+"""Cost of the inventory ledger on writes, and point-in-time read latency.
+
+Part 1 times sequential ``crud.purchase_sweet`` calls on the WAL storage
+profile twice: once with the ledger triggers installed, once with them
+dropped.
+
+Part 2 loads ``movements`` ledger rows for one sweet spread over a day.
+It then times ``inventory_ledger.stock_at`` at random moments, first with
+only an opening snapshot (every read sums the whole history up to that
+moment) and then with the periodic ``inventory_ledger.snapshot_busy`` pass
+run after every ``SNAPSHOT_EVERY`` movements, which also reports the median
+cost of one pass. Last, it times the compaction of the ledger's first 90%.
+
+Usage:
+    python benchmarks/bench_inventory_ledger.py [purchases] [movements]
+"""
+
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import inventory_ledger
+import models
+from database import Base
+from storage import StorageSettings, apply_pragmas
+
+SNAPSHOT_EVERY = 1000
+DAY = 24 * 60 * 60
+
+
+def make_session(workdir: str, name: str):
+    settings = StorageSettings(url=f"sqlite:///{workdir}/{name}.db")
+    engine = create_engine(settings.url, **settings.engine_options())
+    apply_pragmas(engine, settings)
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seed_sweet(db, quantity: int) -> int:
+    owner = models.User(email="bench@example.com", hashed_password="x", role="admin")
+    db.add(owner)
+    db.flush()
+    sweet = models.Sweet(name="Bench Toffee", category="Candy", price=1.0, quantity=quantity, owner_id=owner.id)
+    db.add(sweet)
+    db.commit()
+    return sweet.id
+
+
+def purchase_cost(workdir: str, purchases: int, ledger: bool) -> float:
+    engine, SessionLocal = make_session(workdir, f"purchases_{ledger}")
+    with SessionLocal() as db:
+        if not ledger:
+            for suffix in ("ai", "au", "ad"):
+                db.connection().exec_driver_sql(f"DROP TRIGGER sweets_ledger_{suffix}")
+            db.commit()
+        sweet_id = seed_sweet(db, purchases + 100)
+        for _ in range(100):
+            crud.purchase_sweet(db, sweet_id)
+        started = time.perf_counter()
+        for _ in range(purchases):
+            crud.purchase_sweet(db, sweet_id)
+        elapsed = time.perf_counter() - started
+    engine.dispose()
+    return elapsed * 1_000_000 / purchases
+
+
+def reconstruction(workdir: str, movements: int, snapshot_every: int | None) -> tuple[float, float, float | None]:
+    engine, SessionLocal = make_session(workdir, f"history_{snapshot_every}")
+    rng = random.Random(5)
+    start = time.time() - DAY
+    step = DAY / movements
+    with SessionLocal() as db:
+        sweet_id = seed_sweet(db, 0)
+        db.query(models.InventoryMovement).delete()
+        db.add(models.InventorySnapshot(sweet_id=sweet_id, quantity=0, movement_id=0, as_of=start - 1))
+        chunk = snapshot_every or movements
+        since_id, passes = 0, []
+        for offset in range(0, movements, chunk):
+            db.execute(
+                insert(models.InventoryMovement),
+                [
+                    {"sweet_id": sweet_id, "delta": rng.choice((-1, -1, -2, 5)), "created_at": start + (offset + index) * step}
+                    for index in range(min(chunk, movements - offset))
+                ],
+            )
+            db.commit()
+            if snapshot_every:
+                started = time.perf_counter()
+                _, since_id = inventory_ledger.snapshot_busy(db, snapshot_every, since_id)
+                passes.append((time.perf_counter() - started) * 1000)
+
+        moments = [start + rng.random() * DAY for _ in range(200)]
+        latencies = []
+        for moment in moments:
+            started = time.perf_counter()
+            inventory_ledger.stock_at(db, sweet_id, moment)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        inventory_ledger.compact(db, retention_seconds=DAY * 0.1)
+        compaction = (time.perf_counter() - started) * 1000
+    engine.dispose()
+    return statistics.median(latencies), compaction, statistics.median(passes) if passes else None
+
+
+def main(purchases: int, movements: int) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        without = purchase_cost(workdir, purchases, ledger=False)
+        with_ledger = purchase_cost(workdir, purchases, ledger=True)
+        print(f"purchase without ledger  {without:8.1f} us")
+        print(f"purchase with ledger     {with_ledger:8.1f} us  (+{with_ledger - without:.1f} us)")
+        print()
+        print(f"{movements} movements over one day")
+        print(f"{'snapshots':<22}{'stock_at median ms':>20}{'compaction ms':>15}{'pass ms':>10}")
+        for label, every in (("opening only", None), (f"every {SNAPSHOT_EVERY} movements", SNAPSHOT_EVERY)):
+            median, compaction, snapshot_pass = reconstruction(workdir, movements, every)
+            pass_text = "-" if snapshot_pass is None else f"{snapshot_pass:.2f}"
+            print(f"{label:<22}{median:>20.3f}{compaction:>15.1f}{pass_text:>10}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, int(sys.argv[2]) if len(sys.argv) > 2 else 200_000)
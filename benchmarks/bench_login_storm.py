@@ -0,0 +1,95 @@
+"""Browse latency while a burst of logins is verifying bcrypt hashes.
+
+Fires a storm of concurrent password verifications alongside a steady stream
+of cheap "browse" calls. Both run through the default AnyIO threadpool, the
+way sync FastAPI endpoints do. The storm runs twice: once on that same
+threadpool (the previous sync ``login_user``) and once on the dedicated
+``hashing.PasswordHasher`` pool. Logins the hasher turns away are counted as
+503s.
+
+Usage:
+    python benchmarks/bench_login_storm.py [logins] [workers] [queue_size]
+"""
+
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import anyio
+import anyio.to_thread
+
+import hashing
+
+BROWSE_INTERVAL = 0.005
+
+
+def browse() -> int:
+    return sum(range(2_000))
+
+
+async def run(logins: int, hasher: hashing.PasswordHasher | None) -> tuple[list[float], int, float]:
+    hashed = hashing.hash_password("password123")
+    latencies: list[float] = []
+    rejected = 0
+    storm_done = anyio.Event()
+
+    async def login() -> None:
+        nonlocal rejected
+        if hasher is None:
+            await anyio.to_thread.run_sync(hashing.verify_password, "password123", hashed)
+            return
+        try:
+            await hasher.verify("password123", hashed)
+        except hashing.HasherBusyError:
+            rejected += 1
+
+    async def storm() -> None:
+        async with anyio.create_task_group() as tg:
+            for _ in range(logins):
+                tg.start_soon(login)
+        storm_done.set()
+
+    async def browser() -> None:
+        while not storm_done.is_set():
+            started = time.perf_counter()
+            await anyio.to_thread.run_sync(browse)
+            latencies.append((time.perf_counter() - started) * 1000)
+            await anyio.sleep(BROWSE_INTERVAL)
+
+    started = time.perf_counter()
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(storm)
+        tg.start_soon(browser)
+    return latencies, rejected, time.perf_counter() - started
+
+
+def report(label: str, latencies: list[float], rejected: int, elapsed: float, logins: int) -> None:
+    p99 = statistics.quantiles(latencies, n=100)[98] if len(latencies) > 1 else latencies[0]
+    print(
+        f"{label:<22} browse p50 {statistics.median(latencies):8.2f} ms  p99 {p99:8.2f} ms  "
+        f"logins served {logins - rejected:4d}  503s {rejected:4d}  storm {elapsed:6.2f} s"
+    )
+
+
+def main() -> None:
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    queue_size = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+    print(f"{logins} concurrent logins, bcrypt rounds {hashing.ROUNDS}")
+
+    latencies, rejected, elapsed = anyio.run(run, logins, None)
+    report("shared threadpool", latencies, rejected, elapsed, logins)
+
+    hasher = hashing.PasswordHasher(workers=workers, queue_size=queue_size)
+    try:
+        latencies, rejected, elapsed = anyio.run(run, logins, hasher)
+    finally:
+        hasher.shutdown()
+    report(f"hasher {workers}w/{queue_size}q", latencies, rejected, elapsed, logins)
+
+
+if __name__ == "__main__":
+    main()
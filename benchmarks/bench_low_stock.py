@@ -0,0 +1,90 @@
+"""Latency of the low-stock view with and without the partial index.
+
+Loads ``sweets`` sweets, a few of them at or below their reorder threshold,
+and times ``crud.get_low_stock`` (limit 100). The same query is then timed
+with ``ix_sweets_low_stock`` dropped. SQLite then scans every sweet and sorts
+the matches, since no other index covers ``quantity``.
+
+Usage:
+    python benchmarks/bench_low_stock.py [sweets]
+"""
+
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import models
+from database import Base
+from storage import StorageSettings, apply_pragmas
+
+LOW_COUNTS = (10, 1000)
+RUNS = 20
+
+
+def time_low_stock(SessionLocal) -> tuple[float, int]:
+    latencies = []
+    with SessionLocal() as db:
+        for _ in range(RUNS):
+            started = time.perf_counter()
+            found = crud.get_low_stock(db, limit=100)
+            latencies.append((time.perf_counter() - started) * 1000)
+            db.expunge_all()
+    return statistics.median(latencies), len(found)
+
+
+def load(sweets: int, low: int):
+    workdir = tempfile.mkdtemp(prefix="bench_low_stock_")
+    settings = StorageSettings(url=f"sqlite:///{workdir}/bench.db")
+    engine = create_engine(settings.url, **settings.engine_options())
+    apply_pragmas(engine, settings)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    rng = random.Random(3)
+    low_indexes = set(rng.sample(range(sweets), low))
+    with SessionLocal() as db:
+        owner = models.User(email="bench@example.com", hashed_password="x", role="admin")
+        db.add(owner)
+        db.flush()
+        db.execute(
+            insert(models.Sweet),
+            [
+                {
+                    "name": f"Sweet {index}",
+                    "category": f"Category {index % 20}",
+                    "price": 1.0,
+                    "quantity": rng.randint(0, 5) if index in low_indexes else rng.randint(6, 500),
+                    "owner_id": owner.id,
+                }
+                for index in range(sweets)
+            ],
+        )
+        db.commit()
+    return engine, SessionLocal
+
+
+def main(sweets: int) -> None:
+    print(f"{sweets} sweets")
+    print(f"{'low-stock sweets':<18}{'plan':<28}{'median ms':>10}{'rows':>6}")
+    for low in LOW_COUNTS:
+        engine, SessionLocal = load(sweets, low)
+        median, found = time_low_stock(SessionLocal)
+        print(f"{low:<18}{'partial index':<28}{median:>10.3f}{found:>6}")
+        with engine.begin() as connection:
+            connection.exec_driver_sql("DROP INDEX ix_sweets_low_stock")
+        median, found = time_low_stock(SessionLocal)
+        print(f"{low:<18}{'table scan':<28}{median:>10.3f}{found:>6}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
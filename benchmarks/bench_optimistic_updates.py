@@ -0,0 +1,124 @@
+"""Throughput of optimistic versus pessimistic sweet updates.
+
+N threads play admins editing sweets. Each edit reads a sweet, spends
+``THINK_MS`` preparing the change (validation, a client round trip) and
+writes it back. Two strategies are compared:
+
+- pessimistic: ``BEGIN IMMEDIATE`` before the read, so SQLite's write lock
+  is held across the read, the think time and the write.
+- optimistic: a plain read, then ``crud.update_sweet`` with the version that
+  was read. On a 409-style conflict the edit is re-read and retried.
+
+The runs cover a hot sweet that every admin edits and a catalog of 100
+sweets.
+
+Usage:
+    python benchmarks/bench_optimistic_updates.py [threads] [edits_per_thread]
+"""
+
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import models
+import schemas
+from database import Base
+from storage import StorageSettings, apply_pragmas
+
+THINK_MS = 2.0
+
+
+def pessimistic_edit(SessionLocal, sweet_id: int, rng: random.Random) -> int:
+    with SessionLocal() as db:
+        connection = db.connection()
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        price = connection.execute(select(models.Sweet.price).where(models.Sweet.id == sweet_id)).scalar_one()
+        time.sleep(THINK_MS / 1000)
+        connection.execute(
+            models.Sweet.__table__.update()
+            .where(models.Sweet.id == sweet_id)
+            .values(price=round(price + rng.random(), 2), version=models.Sweet.version + 1)
+        )
+        connection.exec_driver_sql("COMMIT")
+    return 0
+
+
+def optimistic_edit(SessionLocal, sweet_id: int, rng: random.Random) -> int:
+    retries = 0
+    with SessionLocal() as db:
+        while True:
+            price, version = db.execute(
+                select(models.Sweet.price, models.Sweet.version).where(models.Sweet.id == sweet_id)
+            ).one()
+            db.rollback()
+            time.sleep(THINK_MS / 1000)
+            result = crud.update_sweet(
+                db, sweet_id, schemas.SweetUpdate(price=round(price + rng.random(), 2)), expected_version=version
+            )
+            if result != crud.VERSION_CONFLICT:
+                return retries
+            retries += 1
+
+
+def run(edit, threads: int, edits: int, sweets: int) -> dict[str, float]:
+    workdir = tempfile.mkdtemp(prefix="bench_occ_")
+    settings = StorageSettings(url=f"sqlite:///{workdir}/bench.db", pool_size=threads)
+    engine = create_engine(settings.url, **settings.engine_options())
+    apply_pragmas(engine, settings)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with SessionLocal() as db:
+        owner = models.User(email="bench@example.com", hashed_password="x", role="admin")
+        db.add(owner)
+        db.flush()
+        db.execute(
+            insert(models.Sweet),
+            [{"name": f"Sweet {index}", "category": "Candy", "price": 1.0, "quantity": 10, "owner_id": owner.id} for index in range(sweets)],
+        )
+        db.commit()
+        ids = list(db.execute(select(models.Sweet.id)).scalars())
+
+    retries = [0] * threads
+
+    def worker(index: int) -> None:
+        rng = random.Random(index)
+        for _ in range(edits):
+            retries[index] += edit(SessionLocal, rng.choice(ids), rng)
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with SessionLocal() as db:
+        versions = sum(db.execute(select(models.Sweet.version)).scalars()) - len(ids)
+    engine.dispose()
+    return {
+        "edits_per_second": threads * edits / elapsed,
+        "retries": sum(retries),
+        "lost_updates": threads * edits - versions,
+    }
+
+
+def main(threads: int, edits: int) -> None:
+    print(f"{'sweets':<8}{'strategy':<13}{'edits/s':>9}{'retries':>9}{'lost':>6}")
+    for sweets in (1, 100):
+        for name, edit in (("pessimistic", pessimistic_edit), ("optimistic", optimistic_edit)):
+            result = run(edit, threads, edits, sweets)
+            print(f"{sweets:<8}{name:<13}{result['edits_per_second']:>9.0f}{result['retries']:>9}{result['lost_updates']:>6}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8, int(sys.argv[2]) if len(sys.argv) > 2 else 100)
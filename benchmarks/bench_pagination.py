@@ -0,0 +1,89 @@
+"""Per-page latency of keyset (cursor) pagination versus OFFSET pagination.
+
+Seeds a catalog large enough for 10,000 pages of 100 rows and times fetching
+individual pages deep into the listing through ``crud.get_sweets``.
+
+Usage:
+    python benchmarks/bench_pagination.py [rows]   # default: 1000000
+"""
+
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import models
+from database import Base
+
+PAGE_SIZE = 100
+REPEATS = 20
+
+
+def seed(db, rows: int) -> None:
+    owner = models.User(email="bench@example.com", hashed_password="x", role="admin")
+    db.add(owner)
+    db.flush()
+    batch = []
+    for index in range(rows):
+        batch.append({
+            "name": f"Sweet {index:07d}",
+            "category": f"Category {index % 50}",
+            "price": float(index % 997),
+            "quantity": index % 100,
+            "owner_id": owner.id,
+        })
+        if len(batch) == 50_000:
+            db.execute(insert(models.Sweet), batch)
+            batch = []
+    if batch:
+        db.execute(insert(models.Sweet), batch)
+    db.commit()
+
+
+def timed(fn) -> float:
+    samples = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    workdir = tempfile.mkdtemp(prefix="bench_pages_")
+    engine = create_engine(f"sqlite:///{workdir}/bench.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with SessionLocal() as db:
+        seed(db, rows)
+        last_page = rows // PAGE_SIZE
+        pages = [page for page in (1, 10, 100, 1_000, 10_000) if page <= last_page]
+
+        print(f"{rows} rows, {PAGE_SIZE} rows per page, median of {REPEATS} runs (ms)")
+        for sort in ("id", "name"):
+            column = crud.SWEET_SORT_KEYS[sort]
+            print(f"sort={sort}")
+            for page in pages:
+                skip = (page - 1) * PAGE_SIZE
+                after = None
+                if skip:
+                    boundary = db.query(column, models.Sweet.id).order_by(column, models.Sweet.id).offset(skip - 1).first()
+                    after = (boundary[0], boundary[1])
+                keyset = timed(lambda: crud.get_sweets(db, limit=PAGE_SIZE, sort=sort, after=after))
+                offset = timed(lambda: crud.get_sweets(db, skip=skip, limit=PAGE_SIZE, sort=sort))
+                print(f"  page {page:>6}  keyset {keyset:8.2f}  offset {offset:8.2f}")
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Concurrency stress benchmark for the sweet purchase path.
+
+Runs N threads that all buy the same sweet until its stock is exhausted, once
+with the legacy read-modify-write purchase and once with the atomic
+``crud.purchase_sweet``. Reports purchases per second and whether the sweet
+was oversold.
+
+Usage:
+    python benchmarks/bench_purchase_contention.py [threads] [stock]
+"""
+
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+
+import crud
+import models
+from database import Base
+
+
+def legacy_purchase(db: Session, sweet_id: int) -> models.Sweet | str | None:
+    """Reproduce the original SELECT, Python-side decrement, commit and refresh."""
+
+    sweet = db.query(models.Sweet).filter(models.Sweet.id == sweet_id).first()
+    if sweet is None:
+        return None
+    if sweet.quantity <= 0:
+        return "out_of_stock"
+    sweet.quantity -= 1
+    db.commit()
+    db.refresh(sweet)
+    return sweet
+
+
+def run(purchase, threads: int, stock: int) -> dict[str, float]:
+    """Hammer a single sweet from many threads and collect the outcome."""
+
+    workdir = tempfile.mkdtemp(prefix="bench_purchase_")
+    engine = create_engine(
+        f"sqlite:///{workdir}/bench.db",
+        connect_args={"check_same_thread": False},
+        pool_size=threads,
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with SessionLocal() as db:
+        owner = models.User(email="bench@example.com", hashed_password="x", role="admin")
+        db.add(owner)
+        db.flush()
+        sweet = models.Sweet(name="Bench Toffee", category="Candy", price=1.0, quantity=stock, owner_id=owner.id)
+        db.add(sweet)
+        db.commit()
+        sweet_id = sweet.id
+
+    sold = 0
+    errors = 0
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(threads)
+
+    def worker() -> None:
+        nonlocal sold, errors
+        start_barrier.wait()
+        with SessionLocal() as db:
+            while True:
+                try:
+                    result = purchase(db, sweet_id)
+                except OperationalError:
+                    db.rollback()
+                    with lock:
+                        errors += 1
+                    continue
+                if result is None or result == crud.OUT_OF_STOCK:
+                    return
+                with lock:
+                    sold += 1
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with SessionLocal() as db:
+        remaining = db.query(models.Sweet.quantity).filter(models.Sweet.id == sweet_id).scalar()
+    engine.dispose()
+
+    return {
+        "sold": sold,
+        "remaining": remaining,
+        "oversold": sold + remaining != stock or sold > stock,
+        "errors": errors,
+        "per_second": sold / elapsed if elapsed else 0.0,
+        "valid_per_second": min(sold, stock) / elapsed if elapsed else 0.0,
+    }
+
+
+def main() -> None:
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    stock = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    print(f"{threads} threads buying one sweet with {stock} units in stock")
+    for label, purchase in (("before (read-modify-write)", legacy_purchase), ("after (conditional UPDATE)", crud.purchase_sweet)):
+        result = run(purchase, threads, stock)
+        print(
+            f"{label:28} {result['per_second']:8.0f} purchases/s "
+            f"({result['valid_per_second']:.0f}/s backed by stock)  "
+            f"sold={result['sold']} remaining={result['remaining']} "
+            f"oversold={result['oversold']} lock_errors={result['errors']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
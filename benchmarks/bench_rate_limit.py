@@ -0,0 +1,91 @@
+"""Per-request overhead of the rate-limiting middleware at 100k clients.
+
+Drives ``RateLimitMiddleware`` directly, wrapped around an ASGI app that
+answers immediately, so the timings are the middleware's alone. Each case
+sends ``requests`` requests round-robin from ``keys`` distinct clients after
+one warm-up pass, and reports the time per request above the bare app:
+
+- a route without a policy (the cost every other request pays);
+- logins keyed by client IP;
+- purchases keyed by the ``sub`` of ``keys`` distinct bearer tokens;
+- logins with the store bounded to half the clients, so every take evicts;
+- logins through the shared SQLite store.
+
+Usage:
+    python benchmarks/bench_rate_limit.py [requests] [keys]
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import rate_limit
+import security
+
+# Generous enough that no request is refused; only the bookkeeping is timed
+POLICIES = {
+    "login": rate_limit.Policy("login", capacity=1_000_000, period=1),
+    "purchase": rate_limit.Policy("purchase", capacity=1_000_000, period=1, by_user=True),
+}
+ROUTES = tuple((method, pattern, POLICIES[policy.name]) for method, pattern, policy in rate_limit.ROUTES)
+
+
+async def app(scope, receive, send) -> None:
+    return None
+
+
+def scopes(path: str, keys: int, tokens: list[str] | None = None) -> list[dict]:
+    return [
+        {
+            "type": "http",
+            "method": "POST",
+            "path": path,
+            "headers": [(b"authorization", f"Bearer {tokens[index]}".encode())] if tokens else [],
+            "client": (f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}", 50000),
+        }
+        for index in range(keys)
+    ]
+
+
+async def run(handler, requests: list[dict], count: int) -> float:
+    for scope in requests:
+        await handler(scope, None, None)
+    started = time.perf_counter()
+    for index in range(count):
+        await handler(requests[index % len(requests)], None, None)
+    return (time.perf_counter() - started) / count * 1_000_000
+
+
+def main(count: int, keys: int) -> None:
+    middleware = rate_limit.RateLimitMiddleware(app, routes=ROUTES)
+    tokens = [security.create_access_token({"sub": f"user{index}@example.com"}) for index in range(keys)]
+    login = scopes("/api/auth/login", keys)
+    purchase = scopes("/api/sweets/1/purchase", keys, tokens)
+    other = scopes("/api/sweets/1/restock", keys, tokens)
+
+    baseline = asyncio.run(run(app, login, count))
+    print(f"{keys} distinct clients, {count} requests")
+    print(f"{'case':<36}{'us/request':>12}{'overhead':>10}")
+    print(f"{'bare app':<36}{baseline:>12.2f}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = (
+            ("unlimited route", rate_limit.MemoryBucketStore(max_keys=keys), other),
+            ("login, memory, by IP", rate_limit.MemoryBucketStore(max_keys=keys), login),
+            ("purchase, memory, by token sub", rate_limit.MemoryBucketStore(max_keys=keys), purchase),
+            ("login, memory, evicting", rate_limit.MemoryBucketStore(max_keys=keys // 2), login),
+            ("login, sqlite, by IP", rate_limit.SQLiteBucketStore(f"{workdir}/buckets.db"), login),
+        )
+        for label, store, requests in cases:
+            rate_limit.store = store
+            elapsed = asyncio.run(run(middleware, requests, count))
+            print(f"{label:<36}{elapsed:>12.2f}{elapsed - baseline:>10.2f}")
+            store.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300_000, int(sys.argv[2]) if len(sys.argv) > 2 else 100_000)
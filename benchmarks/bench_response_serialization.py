@@ -0,0 +1,67 @@
+"""Serialization cost of a sweets list response at 100, 1k and 10k rows.
+
+The input is a list of already validated ``schemas.Sweet`` models, which is
+what ``catalog_cache`` hands the list route. Three paths are timed:
+
+- classic: FastAPI re-validates the models against ``response_model``, dumps
+  them to Python data and encodes that with ``json.dumps`` (FastAPI's path
+  before its ``dump_json`` shortcut, and whenever a response class is set).
+- dump_json: re-validation, then pydantic's Rust encoder (newer FastAPI).
+- fast_json: ``fast_json.FastJSONResponse`` encodes the models directly.
+
+Usage:
+    python benchmarks/bench_response_serialization.py [repeat]
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from pydantic import TypeAdapter
+
+import fast_json
+import schemas
+
+SIZES = (100, 1_000, 10_000)
+ADAPTER = TypeAdapter(list[schemas.Sweet])
+
+
+def classic(sweets: list[schemas.Sweet]) -> bytes:
+    validated = ADAPTER.validate_python(sweets, from_attributes=True)
+    return json.dumps(ADAPTER.dump_python(validated, mode="json"), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def dump_json(sweets: list[schemas.Sweet]) -> bytes:
+    return ADAPTER.dump_json(ADAPTER.validate_python(sweets, from_attributes=True))
+
+
+def fast(sweets: list[schemas.Sweet]) -> bytes:
+    return fast_json.FastJSONResponse(sweets).body
+
+
+def per_call_ms(encode, sweets: list[schemas.Sweet], repeat: int) -> float:
+    encode(sweets)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        encode(sweets)
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def main(repeat: int) -> None:
+    print(f"{'rows':>7}{'classic ms':>12}{'dump_json ms':>14}{'fast_json ms':>14}{'vs classic':>12}")
+    for size in SIZES:
+        sweets = [
+            schemas.Sweet(id=index, name=f"Sweet {index}", category=f"Category {index % 20}", price=index % 50 + 0.25, quantity=100, owner_id=1, version=3)
+            for index in range(size)
+        ]
+        assert json.loads(classic(sweets)) == json.loads(fast(sweets))
+        rounds = max(1, repeat * 100 // size)
+        timings = [per_call_ms(encode, sweets, rounds) for encode in (classic, dump_json, fast)]
+        print(f"{size:>7}{timings[0]:>12.3f}{timings[1]:>14.3f}{timings[2]:>14.3f}{timings[0] / timings[2]:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,178 @@
+"""Sales report latency from the rollup tables versus scanning raw sales.
+
+Part 1 times sequential ``crud.purchase_sweet`` calls on the WAL storage
+profile twice: once as shipped, once with ``analytics.record_sale``
+replaced by a no-op. The difference is the cost of keeping the rollups
+incrementally.
+
+Part 2 generates ``events`` purchase events over 90 days across
+``CATEGORIES`` categories and ``SWEETS`` sweets. It loads them twice: as
+the daily rollup rows ``record_sale`` would have produced, and as a raw
+event table with one row per sale. It then times the 90-day reports through
+``analytics.sales_report``, and the same per-category daily report as an
+ad-hoc ``GROUP BY`` over the raw events.
+
+Usage:
+    python benchmarks/bench_sales_analytics.py [purchases] [events]
+"""
+
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import analytics
+import crud
+import models
+from database import Base
+from storage import StorageSettings, apply_pragmas
+
+CATEGORIES = 12
+SWEETS = 200
+DAYS = 90
+RUNS = 20
+
+
+def make_session(workdir: str, name: str):
+    settings = StorageSettings(url=f"sqlite:///{workdir}/{name}.db")
+    engine = create_engine(settings.url, **settings.engine_options())
+    apply_pragmas(engine, settings)
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def purchase_cost(workdir: str, purchases: int, rollups: bool) -> float:
+    engine, SessionLocal = make_session(workdir, f"purchases_{rollups}")
+    record_sale = analytics.record_sale
+    if not rollups:
+        analytics.record_sale = lambda *args, **kwargs: None
+    try:
+        with SessionLocal() as db:
+            owner = models.User(email="bench@example.com", hashed_password="x", role="admin")
+            db.add(owner)
+            db.flush()
+            sweet = models.Sweet(name="Bench Toffee", category="Candy", price=1.0, quantity=purchases + 100, owner_id=owner.id)
+            db.add(sweet)
+            db.commit()
+            for _ in range(100):
+                crud.purchase_sweet(db, sweet.id)
+            started = time.perf_counter()
+            for _ in range(purchases):
+                crud.purchase_sweet(db, sweet.id)
+            elapsed = time.perf_counter() - started
+    finally:
+        analytics.record_sale = record_sale
+    engine.dispose()
+    return elapsed * 1_000_000 / purchases
+
+
+def generate(events: int, start: int):
+    rng = np.random.default_rng(7)
+    sweet_ids = rng.integers(1, SWEETS + 1, events)
+    categories = sweet_ids % CATEGORIES
+    prices = 0.5 + (sweet_ids % 17) * 0.25
+    units = rng.integers(1, 4, events)
+    moments = start + rng.random(events) * DAYS * 86400
+    return sweet_ids, categories, units, units * prices, moments
+
+
+def rollup_rows(keys, units, revenue, moments, start: int, key_name: str, label) -> list[dict]:
+    """Aggregate events per (key, day) into the hourly arrays ``record_sale`` keeps."""
+
+    hour_count = DAYS * 24
+    cells = keys * hour_count + ((moments - start) // analytics.HOUR).astype(np.int64)
+    size = (keys.max() + 1) * hour_count
+    unit_grid = np.bincount(cells, weights=units, minlength=size).astype("<i8").reshape(-1, DAYS, 24)
+    revenue_grid = np.bincount(cells, weights=revenue, minlength=size).astype("<f8").reshape(-1, DAYS, 24)
+    return [
+        {
+            "day": start + int(day) * analytics.DAY,
+            key_name: label(int(key)),
+            "units": unit_grid[key, day].tobytes(),
+            "revenue": revenue_grid[key, day].tobytes(),
+        }
+        for key, day in zip(*np.nonzero(unit_grid.sum(axis=2)))
+    ]
+
+
+def time_call(call) -> float:
+    latencies = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies)
+
+
+def reports(workdir: str, events: int) -> None:
+    end = int(time.time() // 86400) * 86400
+    start = end - DAYS * 86400
+    sweet_ids, categories, units, revenue, moments = generate(events, start)
+
+    engine, SessionLocal = make_session(workdir, "rollups")
+    with SessionLocal() as db:
+        by_category = rollup_rows(categories, units, revenue, moments, start, "category", lambda key: f"Category {key}")
+        by_sweet = rollup_rows(sweet_ids, units, revenue, moments, start, "sweet_id", lambda key: key)
+        db.execute(insert(models.SalesByCategory), by_category)
+        db.execute(insert(models.SalesBySweet), by_sweet)
+        db.commit()
+        print(f"{events} events -> {len(by_category)} category rows, {len(by_sweet)} sweet rows")
+        print(f"{'90-day report':<38}{'median ms':>10}")
+        for label, args in (
+            ("per category, daily", ("category", "day", None)),
+            ("per category, hourly", ("category", "hour", None)),
+            ("per sweet, daily", ("sweet", "day", None)),
+            ("one sweet, hourly", ("sweet", "hour", 1)),
+        ):
+            group_by, granularity, key = args
+            median = time_call(lambda: analytics.sales_report(db, group_by, start, end, granularity, key))
+            print(f"{label:<38}{median:>10.2f}")
+    engine.dispose()
+
+    raw = sqlite3.connect(f"{workdir}/events.db")
+    raw.execute("PRAGMA journal_mode = WAL")
+    raw.execute("CREATE TABLE sales (sweet_id INTEGER, category TEXT, units INTEGER, revenue FLOAT, created_at FLOAT)")
+    chunk = 1_000_000
+    for offset in range(0, events, chunk):
+        part = slice(offset, offset + chunk)
+        raw.executemany(
+            "INSERT INTO sales VALUES (?, ?, ?, ?, ?)",
+            zip(
+                sweet_ids[part].tolist(),
+                [f"Category {key}" for key in categories[part].tolist()],
+                units[part].tolist(),
+                revenue[part].tolist(),
+                moments[part].tolist(),
+            ),
+        )
+    raw.commit()
+    query = (
+        "SELECT category, CAST(created_at / 86400 AS INTEGER), SUM(units), SUM(revenue) FROM sales "
+        "WHERE created_at >= ? AND created_at < ? GROUP BY 1, 2"
+    )
+    started = time.perf_counter()
+    raw.execute(query, (start, end)).fetchall()
+    print(f"{'per category, daily, raw GROUP BY':<38}{(time.perf_counter() - started) * 1000:>10.2f}")
+    raw.close()
+
+
+def main(purchases: int, events: int) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        without = purchase_cost(workdir, purchases, rollups=False)
+        with_rollups = purchase_cost(workdir, purchases, rollups=True)
+        print(f"purchase without rollups  {without:8.1f} us")
+        print(f"purchase with rollups     {with_rollups:8.1f} us  (+{with_rollups - without:.1f} us)")
+        print()
+        reports(workdir, events)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, int(sys.argv[2]) if len(sys.argv) > 2 else 10_000_000)
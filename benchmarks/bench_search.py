@@ -0,0 +1,87 @@
+"""Name search latency: ILIKE table scan versus the FTS5 name index.
+
+Usage:
+    python benchmarks/bench_search.py [rows ...]   # default: 100000 1000000
+"""
+
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import models
+from database import Base
+
+FLAVOURS = ["Chocolate", "Caramel", "Vanilla", "Strawberry", "Mint", "Hazelnut", "Lemon", "Toffee", "Coconut", "Pistachio"]
+KINDS = ["Eclair", "Tart", "Mousse", "Fudge", "Truffle", "Cupcake", "Macaron", "Brownie", "Praline", "Nougat"]
+QUERIES = {"common word": "Chocolate", "prefix pair": "pist mac", "rare word": "Zanzibar"}
+REPEATS = 10
+
+
+def seed(db, rows: int) -> None:
+    rng = random.Random(42)
+    owner = models.User(email="bench@example.com", hashed_password="x", role="admin")
+    db.add(owner)
+    db.flush()
+    batch = []
+    for index in range(rows):
+        name = f"{rng.choice(FLAVOURS)} {rng.choice(KINDS)} {index}"
+        if index == rows // 2:
+            name = "Zanzibar Spice Drop"
+        batch.append({"name": name, "category": "Bench", "price": 1.0, "quantity": 1, "owner_id": owner.id})
+        if len(batch) == 50_000:
+            db.execute(insert(models.Sweet), batch)
+            batch = []
+    if batch:
+        db.execute(insert(models.Sweet), batch)
+    db.commit()
+
+
+def ilike_search(db, name: str) -> list[models.Sweet]:
+    """The pre-index implementation: a substring ILIKE over every row."""
+
+    return db.query(models.Sweet).filter(models.Sweet.name.ilike(f"%{name}%")).order_by(models.Sweet.id).limit(100).all()
+
+
+def timed(fn) -> float:
+    samples = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def run(rows: int) -> None:
+    workdir = tempfile.mkdtemp(prefix="bench_search_")
+    engine = create_engine(f"sqlite:///{workdir}/bench.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with SessionLocal() as db:
+        seed(db, rows)
+        print(f"{rows} rows, first page of 100, median of {REPEATS} runs (ms)")
+        for label, name in QUERIES.items():
+            scan = timed(lambda: ilike_search(db, name.split()[0]))
+            ranked = timed(lambda: crud.search_sweets(db, name=name, limit=100, sort="relevance"))
+            by_id = timed(lambda: crud.search_sweets(db, name=name, limit=100, sort="id"))
+            print(f"  {label:12} ilike {scan:9.2f}  fts5 by relevance {ranked:9.2f}  fts5 by id {by_id:9.2f}")
+    engine.dispose()
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    for rows in sizes:
+        run(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Import-to-ready latency on an empty database and on a large one.
+
+For each database size, times a fresh interpreter that imports ``main`` and
+runs the FastAPI lifespan startup with ``DATABASE_URL`` pointing at the
+database. It also times, in-process, the schema work each startup path does:
+- the old path ran ``drop_all``/``create_all`` twice (at import and in the
+  lifespan), wiping the data;
+- the new path is ``migrations.migrate`` on an up-to-date schema.
+
+Usage:
+    python benchmarks/bench_startup.py [rows]
+"""
+
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from sqlalchemy import create_engine
+
+import migrations
+import models  # noqa: F401  # register models with metadata
+from database import Base
+
+READY_SCRIPT = """
+import asyncio, time
+started = time.perf_counter()
+import main
+async def ready():
+    async with main.app.router.lifespan_context(main.app):
+        print(f"{(time.perf_counter() - started) * 1000:.1f}")
+asyncio.run(ready())
+"""
+
+
+def build(path: str, rows: int) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    migrations.migrate(engine)
+    engine.dispose()
+    connection = sqlite3.connect(path)
+    connection.execute("INSERT INTO users (email, hashed_password, role) VALUES ('bench@example.com', 'x', 'admin')")
+    connection.executemany(
+        "INSERT INTO sweets (name, category, price, quantity, owner_id) VALUES (?, ?, ?, ?, 1)",
+        ((f"Sweet {n}", f"Category {n % 50}", 1.0 + n % 100, n % 500) for n in range(rows)),
+    )
+    connection.commit()
+    connection.close()
+
+
+def import_to_ready(path: str) -> float:
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{path}", "ADMIN_EMAIL": "", "ADMIN_PASSWORD": ""}
+    output = subprocess.run(
+        [sys.executable, "-c", READY_SCRIPT], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def legacy_schema_work(path: str) -> float:
+    engine = create_engine(f"sqlite:///{path}")
+    started = time.perf_counter()
+    for _ in range(2):
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    return (time.perf_counter() - started) * 1000
+
+
+def migrate_work(path: str) -> float:
+    engine = create_engine(f"sqlite:///{path}")
+    started = time.perf_counter()
+    migrations.migrate(engine)
+    elapsed = (time.perf_counter() - started) * 1000
+    engine.dispose()
+    return elapsed
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    for label, count in (("empty", 0), (f"{rows:,} rows", rows)):
+        path = os.path.join(workdir, f"{count}.db")
+        build(path, count)
+        ready_ms = import_to_ready(path)
+        migrate_ms = migrate_work(path)
+        legacy_copy = path + ".legacy"
+        shutil.copy(path, legacy_copy)
+        legacy_ms = legacy_schema_work(legacy_copy)
+        print(
+            f"{label:<16} import-to-ready {ready_ms:8.1f} ms  "
+            f"schema work: migrate {migrate_ms:7.2f} ms vs drop/create x2 {legacy_ms:9.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
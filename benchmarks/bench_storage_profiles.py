@@ -0,0 +1,113 @@
+"""Mixed read/write throughput across storage profiles.
+
+For each profile, runs reader threads listing sweets and writer threads
+purchasing them, all against a fresh database file, for a fixed duration.
+Reports reads/s, writes/s and how many operations failed with
+``database is locked``.
+
+Usage:
+    python benchmarks/bench_storage_profiles.py [seconds] [readers] [writers]
+"""
+
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import models
+from database import Base
+from storage import StorageSettings, apply_pragmas
+
+SWEETS = 500
+
+PROFILES = {
+    # SQLite defaults with no busy timeout: what database.py used to do.
+    "legacy": dict(journal_mode="DELETE", synchronous="FULL", cache_size=-2000, mmap_size=0, busy_timeout_ms=0),
+    "delete+busy": dict(journal_mode="DELETE", synchronous="FULL", cache_size=-2000, mmap_size=0, busy_timeout_ms=5000),
+    "wal+full": dict(journal_mode="WAL", synchronous="FULL", busy_timeout_ms=5000),
+    "wal+normal": dict(journal_mode="WAL", synchronous="NORMAL", busy_timeout_ms=5000),
+    "wal+normal+mmap": dict(journal_mode="WAL", synchronous="NORMAL", busy_timeout_ms=5000, mmap_size=256 * 1024 * 1024, cache_size=-64000),
+}
+
+
+def run(name: str, overrides: dict, seconds: float, readers: int, writers: int) -> dict[str, float]:
+    workdir = tempfile.mkdtemp(prefix="bench_storage_")
+    settings = StorageSettings(
+        url=f"sqlite:///{workdir}/{name}.db",
+        pool_size=readers + writers,
+        max_overflow=0,
+        **overrides,
+    )
+    engine = create_engine(settings.url, **settings.engine_options())
+    apply_pragmas(engine, settings)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with SessionLocal() as db:
+        owner = models.User(email="bench@example.com", hashed_password="x", role="admin")
+        db.add(owner)
+        db.flush()
+        db.add_all(
+            models.Sweet(name=f"Sweet {n}", category=f"Category {n % 10}", price=1.0 + n % 50, quantity=10**6, owner_id=owner.id)
+            for n in range(SWEETS)
+        )
+        db.commit()
+
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    start_barrier = threading.Barrier(readers + writers)
+
+    def loop(operation, key: str) -> None:
+        done = locked = 0
+        start_barrier.wait()
+        with SessionLocal() as db:
+            n = 0
+            while time.perf_counter() < deadline:
+                n += 1
+                try:
+                    operation(db, n)
+                    done += 1
+                except OperationalError:
+                    db.rollback()
+                    locked += 1
+        with lock:
+            counts[key] += done
+            counts["locked"] += locked
+
+    def read(db, n: int) -> None:
+        crud.get_sweets(db, limit=50, after=None)
+        db.rollback()
+
+    def write(db, n: int) -> None:
+        crud.purchase_sweet(db, n % SWEETS + 1)
+
+    threads = [threading.Thread(target=loop, args=(read, "reads")) for _ in range(readers)]
+    threads += [threading.Thread(target=loop, args=(write, "writes")) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return {"reads/s": counts["reads"] / seconds, "writes/s": counts["writes"] / seconds, "locked": counts["locked"]}
+
+
+def main() -> None:
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    writers = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    print(f"{readers} readers + {writers} writers for {seconds:.0f} s per profile")
+    for name, overrides in PROFILES.items():
+        result = run(name, overrides, seconds, readers, writers)
+        print(f"{name:<16} reads/s {result['reads/s']:9.0f}  writes/s {result['writes/s']:8.0f}  locked errors {result['locked']:6.0f}")
+
+
+if __name__ == "__main__":
+    main()
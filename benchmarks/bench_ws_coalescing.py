@@ -0,0 +1,81 @@
+"""Messages and bytes sent to clients during a purchase storm.
+
+Feeds a burst of ``sweet_purchased`` events, spread over a handful of hot
+sweets, into a ``ConnectionManager`` with coalescing off and with a 50 ms
+window. Reports events in, messages and bytes out per client, and the
+reduction.
+
+Usage:
+    python benchmarks/bench_ws_coalescing.py [events_per_second] [seconds] [hot_sweets]
+"""
+
+import asyncio
+import random
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from websocket_manager import ConnectionManager
+
+
+class CountingSocket:
+    def __init__(self) -> None:
+        self.messages = 0
+        self.bytes = 0
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        self.messages += 1
+        self.bytes += len(data.encode())
+
+
+async def storm(window_ms: float, rate: int, seconds: float, hot_sweets: int) -> CountingSocket:
+    manager = ConnectionManager(queue_size=rate * int(seconds) + 1, coalesce_window_ms=window_ms)
+    socket = CountingSocket()
+    await manager.connect(socket)
+    rng = random.Random(7)
+    quantities = {sweet_id: 10_000 for sweet_id in range(1, hot_sweets + 1)}
+    tick = 0.01
+    per_tick = max(1, int(rate * tick))
+    for _ in range(int(seconds / tick)):
+        for _ in range(per_tick):
+            sweet_id = rng.randint(1, hot_sweets)
+            quantities[sweet_id] -= 1
+            await manager.broadcast({
+                "type": "sweet_purchased",
+                "data": {
+                    "id": sweet_id,
+                    "name": f"Flash Sale Fudge {sweet_id}",
+                    "category": "Fudge",
+                    "price": 3.75,
+                    "quantity": quantities[sweet_id],
+                    "owner_id": 1,
+                },
+            })
+        await asyncio.sleep(tick)
+    await manager.stop()
+    await asyncio.sleep(0.01)
+    stats = manager.stats()
+    print(
+        f"window {window_ms:>4.0f} ms  events in {stats['events_in']:>6}  "
+        f"messages out {socket.messages:>6}  bytes out {socket.bytes:>9,}"
+    )
+    manager.disconnect(socket)
+    return socket
+
+
+def main() -> None:
+    rate = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    hot_sweets = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    print(f"{rate} purchases/s for {seconds:.0f} s across {hot_sweets} sweets, per client:")
+    before = asyncio.run(storm(0, rate, seconds, hot_sweets))
+    after = asyncio.run(storm(50, rate, seconds, hot_sweets))
+    print(f"reduction: {before.messages / after.messages:.1f}x messages, {before.bytes / after.bytes:.1f}x bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""CPU time per broadcast as the number of WebSocket connections grows.
+
+Compares serializing the event once per connection (``send_json`` on every
+socket, as before) with encoding it once into an ``EncodedMessage`` and
+sending the same text frame to every connection. Simulated sockets do no
+I/O, so the numbers are the serialization and queueing cost alone.
+
+Usage:
+    python benchmarks/bench_ws_encoding.py [broadcasts]
+"""
+
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from websocket_manager import ConnectionManager
+
+EVENT = {
+    "type": "sweet_purchased",
+    "data": {"id": 42, "name": "Dark Chocolate Truffle", "category": "Chocolate", "price": 2.5, "quantity": 117, "owner_id": 1},
+}
+
+
+class SimulatedSocket:
+    async def accept(self) -> None:
+        pass
+
+    async def send_json(self, message: dict) -> None:
+        # Starlette's WebSocket.send_json serializes like this for every socket.
+        await self.send_text(json.dumps(message, separators=(",", ":"), ensure_ascii=False))
+
+    async def send_text(self, data: str) -> None:
+        pass
+
+
+async def per_connection(connections: int, broadcasts: int) -> float:
+    sockets = [SimulatedSocket() for _ in range(connections)]
+    started = time.process_time()
+    for _ in range(broadcasts):
+        for socket in sockets:
+            await socket.send_json(EVENT)
+    return (time.process_time() - started) / broadcasts * 1000
+
+
+async def encoded_once(connections: int, broadcasts: int) -> float:
+    manager = ConnectionManager(queue_size=broadcasts + 1)
+    for _ in range(connections):
+        await manager.connect(SimulatedSocket())
+    started = time.process_time()
+    for _ in range(broadcasts):
+        await manager.broadcast(EVENT)
+    while any(not client.queue.empty() for client in manager.active_connections.values()):
+        await asyncio.sleep(0)
+    elapsed = time.process_time() - started
+    for websocket in list(manager.active_connections):
+        manager.disconnect(websocket)
+    return elapsed / broadcasts * 1000
+
+
+def main() -> None:
+    broadcasts = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(f"CPU ms per broadcast, average over {broadcasts} broadcasts")
+    print(f"{'connections':>11}  {'json per socket':>15}  {'encoded once':>12}")
+    for connections in (100, 1_000, 10_000):
+        before = asyncio.run(per_connection(connections, broadcasts))
+        after = asyncio.run(encoded_once(connections, broadcasts))
+        print(f"{connections:>11}  {before:>15.2f}  {after:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Purchase latency with thousands of WebSocket clients attached.
+
+Connects N simulated clients, some of which are deliberately slow to send,
+then runs purchases through ``crud.purchase_sweet`` followed by a
+broadcast, the way the purchase endpoint does. This runs once with the
+original sequential ``send_json`` loop and once with the queued
+``ConnectionManager``. Reports the broadcast call latency, the p99 of the
+whole handler, and how long fast clients waited for the event.
+
+Usage:
+    python benchmarks/bench_ws_fanout.py [clients] [slow_fraction] [purchases]
+"""
+
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import models
+import schemas
+from database import Base
+from websocket_manager import ConnectionManager
+
+SLOW_SEND_SECONDS = 0.02
+PURCHASE_INTERVAL = 0.05
+
+
+class SimulatedClient:
+    def __init__(self, slow: bool) -> None:
+        self.slow = slow
+        self.last_received = 0.0
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_json(self, message: dict) -> None:
+        await self.send_text(json.dumps(message))
+
+    async def send_text(self, data: str) -> None:
+        if self.slow:
+            await asyncio.sleep(SLOW_SEND_SECONDS)
+        self.last_received = time.perf_counter()
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+class SequentialManager:
+    """The original manager: one awaited send per client, in turn."""
+
+    def __init__(self) -> None:
+        self.active_connections: list = []
+
+    async def connect(self, websocket) -> None:
+        await websocket.accept()
+        self.active_connections.append(websocket)
+
+    async def broadcast(self, message: dict) -> None:
+        for connection in self.active_connections:
+            await connection.send_json(message)
+
+
+def p99(values: list[float]) -> float:
+    return statistics.quantiles(values, n=100)[98] if len(values) > 1 else values[0]
+
+
+async def run(manager, clients: list[SimulatedClient], SessionLocal, sweet_id: int, purchases: int) -> dict[str, float]:
+    for client in clients:
+        await manager.connect(client)
+    fast = [client for client in clients if not client.slow]
+
+    broadcast_ms: list[float] = []
+    handler_ms: list[float] = []
+    delivery_ms: list[float] = []
+    for _ in range(purchases):
+        started = time.perf_counter()
+        with SessionLocal() as db:
+            row = crud.purchase_sweet(db, sweet_id)
+            payload = {"type": "sweet_purchased", "data": schemas.Sweet.model_validate(row).model_dump()}
+        broadcast_started = time.perf_counter()
+        await manager.broadcast(payload)
+        finished = time.perf_counter()
+        broadcast_ms.append((finished - broadcast_started) * 1000)
+        handler_ms.append((finished - started) * 1000)
+
+        await asyncio.sleep(PURCHASE_INTERVAL)
+        delivery_ms.append((max(client.last_received for client in fast) - started) * 1000)
+
+    if isinstance(manager, ConnectionManager):
+        for websocket in list(manager.active_connections):
+            manager.disconnect(websocket)
+    return {
+        "broadcast p50": statistics.median(broadcast_ms),
+        "handler p99": p99(handler_ms),
+        "fast delivery p99": p99(delivery_ms),
+    }
+
+
+def main() -> None:
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    slow_fraction = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+    purchases = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    slow_every = max(1, round(1 / slow_fraction)) if slow_fraction else 0
+
+    workdir = tempfile.mkdtemp(prefix="bench_ws_")
+    engine = create_engine(f"sqlite:///{workdir}/bench.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with SessionLocal() as db:
+        owner = models.User(email="bench@example.com", hashed_password="x", role="admin")
+        db.add(owner)
+        db.flush()
+        sweet = models.Sweet(name="Bench Toffee", category="Candy", price=1.0, quantity=10**6, owner_id=owner.id)
+        db.add(sweet)
+        db.commit()
+        sweet_id = sweet.id
+
+    print(f"{clients} clients, every {slow_every or 'no'}th slow ({SLOW_SEND_SECONDS * 1000:.0f} ms/send), {purchases} purchases")
+    for label, manager in (("sequential", SequentialManager()), ("queued", ConnectionManager())):
+        simulated = [SimulatedClient(slow=bool(slow_every) and n % slow_every == 0) for n in range(clients)]
+        result = asyncio.run(run(manager, simulated, SessionLocal, sweet_id, purchases))
+        print(f"{label:<11} " + "  ".join(f"{name} {value:9.2f} ms" for name, value in result.items()))
+        if isinstance(manager, ConnectionManager):
+            print(f"{'':<11} dropped {manager.dropped_messages} queued messages for slow clients")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Per-event cost of publishing a broadcast and routing it to local clients.
+
+Times ``ConnectionManager.broadcast`` for events built the way the routes
+build them (pydantic models inside the event dict) with a handful of
+connections on the default "all" topic, so the cost measured is encoding,
+topic routing and queueing rather than per-socket sends. Queues are drained
+between rounds and their draining is not timed.
+
+Usage:
+    python benchmarks/bench_ws_publish.py [broadcasts] [connections]
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import schemas
+from websocket_manager import ConnectionManager
+
+
+class SimulatedSocket:
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        pass
+
+
+def sweet(sweet_id: int) -> schemas.Sweet:
+    return schemas.Sweet(
+        id=sweet_id,
+        name=f"Dark Chocolate Truffle {sweet_id}",
+        category="Chocolate",
+        price=2.5,
+        quantity=117,
+        owner_id=1,
+        version=3,
+    )
+
+
+EVENTS = {
+    "sweet_purchased": {"type": "sweet_purchased", "data": sweet(42)},
+    "order_placed, 20 sweets": {"type": "order_placed", "data": {"order_id": 7, "sweets": [sweet(n) for n in range(20)]}},
+}
+
+
+async def time_broadcasts(event: dict, broadcasts: int, connections: int) -> float:
+    manager = ConnectionManager(queue_size=broadcasts + 1)
+    for _ in range(connections):
+        await manager.connect(SimulatedSocket())
+    started = time.perf_counter()
+    for _ in range(broadcasts):
+        await manager.broadcast(event)
+    elapsed = time.perf_counter() - started
+    for websocket in list(manager.active_connections):
+        manager.disconnect(websocket)
+    return elapsed / broadcasts * 1_000_000
+
+
+def main() -> None:
+    broadcasts = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    connections = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    print(f"{broadcasts} broadcasts, {connections} connections")
+    print(f"{'event':<26}{'us/broadcast':>14}")
+    for label, event in EVENTS.items():
+        print(f"{label:<26}{asyncio.run(time_broadcasts(event, broadcasts, connections)):>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Fan-out cost per event with topic subscriptions versus the "all" firehose.
+
+Connects N simulated clients. In the first run every client stays on the
+default "all" topic. In the second, each client watches one of S sweets,
+with or without a field projection. Reports fan-out time per event and
+frames sent per event.
+
+Usage:
+    python benchmarks/bench_ws_topics.py [clients] [sweets] [events]
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from websocket_manager import ConnectionManager
+
+
+class NullSocket:
+    sent = 0
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        NullSocket.sent += 1
+
+
+async def run(clients: int, sweets: int, events: int, mode: str) -> tuple[float, float]:
+    manager = ConnectionManager(queue_size=events + 1)
+    sockets = [NullSocket() for _ in range(clients)]
+    for n, socket in enumerate(sockets):
+        await manager.connect(socket)
+        if mode != "all":
+            fields = ["quantity"] if mode == "projected" else None
+            manager.subscribe(socket, [f"sweet:{n % sweets + 1}"], fields)
+    NullSocket.sent = 0
+    elapsed = 0.0
+    for n in range(events):
+        message = {
+            "type": "sweet_purchased",
+            "data": {"id": n % sweets + 1, "name": "Sea Salt Caramel", "category": "Caramel", "price": 1.5, "quantity": 99, "owner_id": 1},
+        }
+        started = time.perf_counter()
+        await manager.broadcast(message)
+        elapsed += time.perf_counter() - started
+        await asyncio.sleep(0)
+    while any(not client.queue.empty() for client in manager.active_connections.values()):
+        await asyncio.sleep(0)
+    for socket in sockets:
+        manager.disconnect(socket)
+    return elapsed / events * 1_000_000, NullSocket.sent / events
+
+
+def main() -> None:
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    sweets = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    events = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    print(f"{clients} clients, {sweets} sweets, {events} events")
+    for mode in ("all", "per-sweet", "projected"):
+        per_event_us, fan_out = asyncio.run(run(clients, sweets, events, mode))
+        print(f"{mode:<10} fan-out {per_event_us:9.1f} us/event  ~{fan_out:8.1f} frames sent/event")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Streaming parsing and validation for bulk catalog imports."""
+
+import csv
+import json
+from collections.abc import AsyncIterator
+
+from pydantic import ValidationError
+
+from schemas import SweetImportRow
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+# Longest line buffered; anything longer is reported as a failed row
+MAX_LINE_BYTES = 64 * 1024
+
+
+def detect_format(content_type: str | None) -> str:
+    """Pick the import format from a request's Content-Type header.
+
+    Args:
+        content_type: Raw Content-Type header value, if any.
+
+    Returns:
+        "csv" for CSV uploads; otherwise "ndjson".
+    """
+
+    if content_type and "csv" in content_type.lower():
+        return "csv"
+    return "ndjson"
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a stream of byte chunks into lines without buffering the whole body.
+
+    Lines are left undecoded, so :func:`iter_rows` can report invalid UTF-8
+    against the row it belongs to. A line is never buffered past
+    ``MAX_LINE_BYTES``: once it grows longer, only its first
+    ``MAX_LINE_BYTES + 1`` bytes are yielded, for :func:`iter_rows` to reject,
+    and the rest is discarded up to the next newline.
+
+    Args:
+        chunks: Asynchronous iterator of raw body chunks.
+
+    Yields:
+        Each line of the body with its line terminator stripped.
+    """
+
+    pending = b""
+    # Inside an over-long line whose start has already been yielded
+    discarding = False
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if discarding:
+                discarding = False
+                continue
+            yield line.rstrip(b"\r")
+        if len(pending) > MAX_LINE_BYTES:
+            if not discarding:
+                yield pending[: MAX_LINE_BYTES + 1]
+                discarding = True
+            pending = b""
+    if pending and not discarding:
+        yield pending.rstrip(b"\r")
+
+
+def _format_errors(exc: ValidationError) -> list[str]:
+    return [f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in exc.errors()]
+
+
+async def iter_rows(
+    lines: AsyncIterator[bytes],
+    fmt: str,
+) -> AsyncIterator[tuple[int, SweetImportRow | None, list[str]]]:
+    """Parse and validate import rows one at a time.
+
+    NDJSON rows are one JSON object per line. CSV rows must start with a header
+    line naming the columns; quoted values spanning several lines are not
+    supported. Blank lines are skipped in both formats. A line that is not
+    valid UTF-8 or is longer than ``MAX_LINE_BYTES`` is reported as a failed
+    row; if that is the CSV header, the import stops after reporting it as
+    row 0.
+
+    Args:
+        lines: Asynchronous iterator of undecoded body lines.
+        fmt: Either "ndjson" or "csv".
+
+    Yields:
+        Tuples of (row number, validated row or None, error messages). Row
+        numbers are 1-based and count data rows only.
+    """
+
+    header: list[str] | None = None
+    row_number = 0
+    async for raw in lines:
+        if not raw.strip():
+            continue
+        reason = None
+        if len(raw) > MAX_LINE_BYTES:
+            reason = f"longer than {MAX_LINE_BYTES} bytes"
+        else:
+            try:
+                line = raw.decode("utf-8")
+            except UnicodeDecodeError as exc:
+                reason = f"invalid UTF-8 at byte {exc.start}"
+        if reason is not None:
+            if fmt == "csv" and header is None:
+                yield 0, None, [f"header: {reason}"]
+                return
+            row_number += 1
+            yield row_number, None, [f"row: {reason}"]
+            continue
+
+        if fmt == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            row_number += 1
+            if len(values) != len(header):
+                yield row_number, None, [f"row: expected {len(header)} columns, got {len(values)}"]
+                continue
+            payload = {name: value for name, value in zip(header, values) if value != ""}
+        else:
+            row_number += 1
+            try:
+                payload = json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield row_number, None, [f"row: invalid JSON ({exc.msg})"]
+                continue
+            if not isinstance(payload, dict):
+                yield row_number, None, ["row: expected a JSON object"]
+                continue
+
+        try:
+            yield row_number, SweetImportRow.model_validate(payload), []
+        except ValidationError as exc:
+            yield row_number, None, _format_errors(exc)
@@ -0,0 +1,106 @@
+"""Bounded in-process caches shared by the read paths."""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a time-to-live.
+
+    Once ``maxsize`` entries are stored, inserting another evicts the least
+    recently used one. Expired entries are dropped lazily when they are read.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        """Create an empty cache.
+
+        Args:
+            maxsize: Maximum number of entries held at once.
+            ttl: Default lifetime of an entry in seconds.
+            clock: Monotonic time source, overridable for tests.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the live value stored under ``key``, or ``default``.
+
+        Args:
+            key: Cache key to look up.
+            default: Value returned when the key is absent or expired.
+
+        Returns:
+            The cached value or ``default``.
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """Store ``value`` under ``key``, evicting the LRU entry when full.
+
+        Args:
+            key: Cache key to store the value under.
+            value: Value to cache.
+            ttl: Optional lifetime in seconds overriding the cache default.
+        """
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        """Drop ``key`` from the cache if present.
+
+        Args:
+            key: Cache key to remove.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def purge_expired(self) -> int:
+        """Drop every expired entry now rather than when it is next read.
+
+        Returns:
+            The number of entries dropped.
+        """
+        now = self._clock()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+    def clear(self) -> None:
+        """Drop every entry, keeping the counters."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, int]:
+        """Return the hit, miss and eviction counters and the current size."""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._entries)}
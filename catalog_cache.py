@@ -0,0 +1,196 @@
+"""Read-through cache in front of the catalog reads in crud.
+
+Single sweets and list/search pages are cached as validated response schemas,
+keyed by their normalized query parameters. Every write path in ``main``
+calls :func:`invalidate`, which drops the affected sweets and every cached
+page, so readers in this process never see data older than the last write.
+Entries also expire after a TTL, which bounds staleness from writes made by
+other processes. Callers that have already read the catalog or row version
+(to build an ETag) pass it in. Pages are then keyed by that version and
+items are checked against it, so a write from another process is never
+served under a newer ETag.
+"""
+
+import os
+import threading
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+import crud
+import pagination
+import schemas
+from cache import TTLCache
+
+ENABLED = os.getenv("CATALOG_CACHE_ENABLED", "1") != "0"
+MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_SIZE", "1024"))
+TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "30"))
+
+Page = tuple[list[schemas.Sweet], str | None]
+
+_items = TTLCache(maxsize=MAX_ENTRIES, ttl=TTL_SECONDS)
+_pages = TTLCache(maxsize=MAX_ENTRIES, ttl=TTL_SECONDS)
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def _read_through(cache: TTLCache, key: Hashable, load: Callable[[], Any]) -> Any:
+    """Return a cached value or load and cache it.
+
+    A value loaded while a write invalidated the cache is returned but not
+    stored, so a slow reader cannot put pre-write data back into the cache.
+    """
+
+    if not ENABLED:
+        return load()
+    value = cache.get(key)
+    if value is not None:
+        return value
+    generation = _generation
+    value = load()
+    if value is not None and generation == _generation:
+        cache.set(key, value)
+    return value
+
+
+def _page(rows: list, sort: str, limit: int) -> Page:
+    return [schemas.Sweet.model_validate(row) for row in rows], pagination.next_cursor(rows, sort, limit)
+
+
+def get_sweet(db: Session, sweet_id: int, version: int | None = None) -> schemas.Sweet | None:
+    """Cached version of crud.get_sweet.
+
+    Args:
+        db: Active SQLAlchemy session, used only on a cache miss.
+        sweet_id: Identifier of the sweet to fetch.
+        version: Optional current row version; a cached copy of an older
+            version is reloaded.
+
+    Returns:
+        The sweet as a response schema, or None if it does not exist.
+    """
+
+    def load() -> schemas.Sweet | None:
+        sweet = crud.get_sweet(db, sweet_id)
+        return None if sweet is None else schemas.Sweet.model_validate(sweet)
+
+    sweet = _read_through(_items, sweet_id, load)
+    if sweet is not None and version is not None and sweet.version != version:
+        # Written by another process since it was cached
+        _items.pop(sweet_id)
+        sweet = _read_through(_items, sweet_id, load)
+    return sweet
+
+
+def get_sweets(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    owner_id: int | None = None,
+    sort: str = "id",
+    after: tuple[Any, int] | None = None,
+    version: int | None = None,
+) -> Page:
+    """Cached version of crud.get_sweets that also computes the next cursor.
+
+    Args:
+        db: Active SQLAlchemy session, used only on a cache miss.
+        skip: Number of records to skip when no cursor is given.
+        limit: Maximum number of records to return.
+        owner_id: Optional user identifier to filter sweets by owner.
+        sort: Sort key name.
+        after: Optional (sort key value, id) of the last row already served.
+        version: Optional catalog version the page must reflect.
+
+    Returns:
+        The page of sweets and the cursor for the following page, if any.
+    """
+
+    key = ("list", skip if after is None else 0, limit, owner_id, sort, after, version)
+    return _read_through(
+        _pages,
+        key,
+        lambda: _page(crud.get_sweets(db, skip=skip, limit=limit, owner_id=owner_id, sort=sort, after=after), sort, limit),
+    )
+
+
+def search_sweets(
+    db: Session,
+    name: str | None = None,
+    category: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    owner_id: int | None = None,
+    limit: int = 100,
+    sort: str = "id",
+    after: tuple[Any, int] | None = None,
+    version: int | None = None,
+) -> Page:
+    """Cached version of crud.search_sweets that also computes the next cursor.
+
+    Name fragments are normalized to lower-case, single-spaced words, matching
+    the case-insensitive full-text search.
+
+    Args:
+        db: Active SQLAlchemy session, used only on a cache miss.
+        name: Optional name words to match as prefixes.
+        category: Optional category to filter by.
+        min_price: Optional lower bound for the sweet price.
+        max_price: Optional upper bound for the sweet price.
+        owner_id: Optional user identifier to filter sweets by owner.
+        limit: Maximum number of records to return.
+        sort: Sort key name.
+        after: Optional (sort key value, id) of the last row already served.
+        version: Optional catalog version the page must reflect.
+
+    Returns:
+        The page of sweets and the cursor for the following page, if any.
+    """
+
+    name = " ".join(name.lower().split()) if name else None
+    key = ("search", name, category or None, min_price, max_price, owner_id, limit, sort, after, version)
+    return _read_through(
+        _pages,
+        key,
+        lambda: _page(
+            crud.search_sweets(
+                db,
+                name=name,
+                category=category,
+                min_price=min_price,
+                max_price=max_price,
+                owner_id=owner_id,
+                limit=limit,
+                sort=sort,
+                after=after,
+            ),
+            sort,
+            limit,
+        ),
+    )
+
+
+def invalidate(*sweet_ids: int) -> None:
+    """Drop cached data made stale by a write.
+
+    Args:
+        *sweet_ids: Sweets changed by the write. With no ids every cached
+            sweet is dropped, for writes that touch an unknown set of rows.
+    """
+
+    global _generation
+    with _generation_lock:
+        _generation += 1
+    if sweet_ids:
+        for sweet_id in sweet_ids:
+            _items.pop(sweet_id)
+    else:
+        _items.clear()
+    _pages.clear()
+
+
+def stats() -> dict[str, dict[str, int]]:
+    """Return hit, miss and eviction counters for the item and page caches."""
+
+    return {"items": _items.stats(), "pages": _pages.stats()}
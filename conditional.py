@@ -0,0 +1,88 @@
+"""Validators for conditional requests on the catalog.
+
+List and search responses are tagged with the catalog version and single
+sweets with their row version. Both are cheap primary-key reads, so a request
+whose ``If-None-Match`` still matches is answered 304 without running the
+catalog query or serializing a body. A sweet's ETag sent back in
+``If-Match`` makes an update conditional on that version.
+"""
+
+from email.utils import formatdate
+
+# Browsers may store the response but must revalidate it on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+def catalog_etag(version: int) -> str:
+    """ETag for list and search responses at a catalog version."""
+
+    return f'"c{version}"'
+
+
+def sweet_etag(sweet_id: int, version: int) -> str:
+    """ETag for a single sweet at a row version."""
+
+    return f'"s{sweet_id}-{version}"'
+
+
+def validators(etag: str, updated_at: float) -> dict[str, str]:
+    """Build the caching headers sent with a catalog response.
+
+    Args:
+        etag: The entity tag of the response.
+        updated_at: Time of the last catalog write, in seconds since the epoch.
+
+    Returns:
+        ``ETag``, ``Last-Modified`` and ``Cache-Control`` headers.
+    """
+
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(int(updated_at), usegmt=True),
+        "Cache-Control": CACHE_CONTROL,
+    }
+
+
+def is_fresh(if_none_match: str | None, etag: str) -> bool:
+    """Check an ``If-None-Match`` header against the current ETag.
+
+    Uses the weak comparison required for ``If-None-Match``: ``W/`` prefixes
+    are ignored, and ``*`` matches any current representation.
+
+    Args:
+        if_none_match: The request header, if present.
+        etag: The current entity tag.
+
+    Returns:
+        True if the client's copy is current and a 304 can be sent.
+    """
+
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == current for tag in if_none_match.split(","))
+
+
+def parse_sweet_etag(if_match: str, sweet_id: int) -> int | None:
+    """Extract the version from an ``If-Match`` header naming one sweet.
+
+    Args:
+        if_match: The request header.
+        sweet_id: The sweet the request targets.
+
+    Returns:
+        The version the client expects, or None for ``*`` (any version).
+
+    Raises:
+        ValueError: If the header is not a single ETag for this sweet.
+    """
+
+    tag = if_match.strip()
+    if tag == "*":
+        return None
+    prefix = f'"s{sweet_id}-'
+    if tag.startswith(prefix) and tag.endswith('"') and tag[len(prefix):-1].isdigit():
+        return int(tag[len(prefix):-1])
+    raise ValueError(f"If-Match must be the ETag of sweet {sweet_id}")
@@ -1,14 +1,31 @@
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+import re
+from typing import Any
 
-from models import Sweet, User
-from schemas import SweetCreate, SweetUpdate, UserCreate
+from sqlalchemy import Row, bindparam, exists, insert, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, selectinload, with_expression
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+import analytics
+import hashing
+from models import CatalogState, CategoryThreshold, Order, OrderLine, Sweet, User, sweets_fts
+from schemas import OrderCreate, SweetCreate, SweetImportRow, SweetUpdate, UserCreate
+
+OUT_OF_STOCK = "out_of_stock"
+VERSION_CONFLICT = "version_conflict"
+
+# Threshold crossings reported by stock_crossings, also the event types
+STOCK_LOW = "stock_low"
+STOCK_OUT = "stock_out"
+
+_SWEET_COLUMNS = tuple(Sweet.__table__.columns)
+
+SWEET_SORT_KEYS = {"id": Sweet.id, "name": Sweet.name, "price": Sweet.price, "relevance": sweets_fts.c.rank}
+
+_SEARCH_TOKEN = re.compile(r"\w+")
 
 
 def _hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return hashing.hash_password(password)
 
 
 def get_user_by_email(db: Session, email: str) -> User | None:
@@ -25,13 +42,20 @@ def get_user_by_email(db: Session, email: str) -> User | None:
     return db.query(User).filter(User.email == email).first()
 
 
-def create_user(db: Session, user_in: UserCreate, role: str = "customer") -> User:
+def create_user(
+    db: Session,
+    user_in: UserCreate,
+    role: str = "customer",
+    hashed_password: str | None = None,
+) -> User:
     """Persist a new user in the database.
 
     Args:
         db: Active SQLAlchemy session.
         user_in: Validated payload containing email and password.
         role: User role, defaults to "customer". Can be "admin" or "customer".
+        hashed_password: Optional precomputed hash of ``user_in.password``, so
+            callers can hash off the request thread; hashed here when omitted.
 
     Returns:
         The newly created user record.
@@ -45,7 +69,7 @@ def create_user(db: Session, user_in: UserCreate, role: str = "customer") -> Use
 
     user = User(
         email=user_in.email,
-        hashed_password=_hash_password(user_in.password),
+        hashed_password=hashed_password or _hash_password(user_in.password),
         role=role,
     )
     db.add(user)
@@ -72,6 +96,7 @@ def create_sweet(db: Session, sweet_in: SweetCreate, owner_id: int) -> Sweet:
         price=sweet_in.price,
         quantity=sweet_in.quantity,
         owner_id=owner_id,
+        reorder_threshold=sweet_in.reorder_threshold,
     )
     db.add(sweet)
     db.commit()
@@ -79,23 +104,148 @@ def create_sweet(db: Session, sweet_in: SweetCreate, owner_id: int) -> Sweet:
     return sweet
 
 
-def get_sweets(db: Session, skip: int = 0, limit: int = 100, owner_id: int | None = None) -> list[Sweet]:
+def upsert_sweets(db: Session, rows: list[SweetImportRow], owner_id: int) -> tuple[int, set[int]]:
+    """Insert or update a batch of sweets with one executemany round trip per kind.
+
+    Rows without an id are inserted and get a fresh id. Rows whose id exists
+    overwrite that sweet's catalog fields while keeping its original owner.
+    Rows whose id matches no sweet are skipped: inserting them would revive
+    the id of a deleted sweet, which ids, ETags and cached entries assume is
+    never reused. The batch is committed on success.
+
+    Args:
+        db: Active SQLAlchemy session.
+        rows: Validated import rows making up one batch.
+        owner_id: Identifier of the user assigned as owner of inserted sweets.
+
+    Returns:
+        The number of rows written, and the ids of the skipped rows.
+    """
+
+    if not rows:
+        return 0, set()
+
+    table = Sweet.__table__
+    keyed = [row for row in rows if row.id is not None]
+    existing = set(db.scalars(select(Sweet.id).where(Sweet.id.in_({row.id for row in keyed})))) if keyed else set()
+    updates = [row for row in keyed if row.id in existing]
+    inserts = [row for row in rows if row.id is None]
+
+    if updates:
+        db.execute(
+            # The remaining SET columns come from the parameter keys
+            update(table).where(table.c.id == bindparam("sweet_id")).values(version=table.c.version + 1),
+            [
+                {
+                    "sweet_id": row.id,
+                    "name": row.name,
+                    "category": row.category,
+                    "price": row.price,
+                    "quantity": row.quantity,
+                    "reorder_threshold": row.reorder_threshold,
+                }
+                for row in updates
+            ],
+        )
+    if inserts:
+        db.execute(
+            insert(table),
+            [
+                {
+                    "name": row.name,
+                    "category": row.category,
+                    "price": row.price,
+                    "quantity": row.quantity,
+                    "owner_id": owner_id,
+                    "reorder_threshold": row.reorder_threshold,
+                }
+                for row in inserts
+            ],
+        )
+    db.commit()
+    return len(updates) + len(inserts), {row.id for row in keyed} - existing
+
+
+def _name_match_query(name: str) -> str | None:
+    """Translate a free-text name fragment into an FTS5 prefix query.
+
+    Every word becomes a quoted prefix term, so "choc ecl" matches names with
+    words starting with "choc" and "ecl". Quoting keeps user input from being
+    parsed as FTS5 operators.
+
+    Args:
+        name: Raw name fragment supplied by the client.
+
+    Returns:
+        The FTS5 MATCH expression, or None if the fragment contains no words.
+    """
+
+    tokens = _SEARCH_TOKEN.findall(name)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def _paginate(query, sort: str, after: tuple[Any, int] | None, limit: int):
+    """Apply a stable keyset ordering and page window to a sweets query.
+
+    Args:
+        query: Query over sweets with all filters already applied.
+        sort: Sort key name from SWEET_SORT_KEYS.
+        after: Optional (sort key value, id) of the last row already served.
+        limit: Maximum number of rows to return.
+
+    Returns:
+        The query ordered by (sort key, id) and restricted to the next page.
+    """
+
+    column = SWEET_SORT_KEYS[sort]
+    if after is not None:
+        key, last_id = after
+        if column is Sweet.id:
+            query = query.filter(Sweet.id > last_id)
+        else:
+            query = query.filter(tuple_(column, Sweet.id) > tuple_(key, last_id))
+    if column is Sweet.id:
+        query = query.order_by(Sweet.id)
+    else:
+        query = query.order_by(column, Sweet.id)
+    return query.limit(limit)
+
+
+def get_sweets(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    owner_id: int | None = None,
+    sort: str = "id",
+    after: tuple[Any, int] | None = None,
+) -> list[Sweet]:
     """Retrieve sweets from the database with optional pagination controls.
 
+    Pages are ordered by (sort key, id). Passing ``after`` continues from a
+    previous page with a keyset predicate, which stays constant-time however
+    deep the page is; ``skip`` remains for offset-based callers.
+
     Args:
         db: Active SQLAlchemy session.
         skip: Number of records to skip from the beginning of the result set.
         limit: Maximum number of records to return.
         owner_id: Optional user identifier to filter sweets by owner.
+        sort: Sort key name, one of "id", "name" or "price".
+        after: Optional (sort key value, id) of the last row already served.
 
     Returns:
-        A list of sweets ordered by insertion sequence.
+        A list of sweets ordered by the sort key and then by id.
     """
 
     query = db.query(Sweet)
     if owner_id is not None:
         query = query.filter(Sweet.owner_id == owner_id)
-    return query.offset(skip).limit(limit).all()
+    query = _paginate(query, sort, after, limit)
+    if after is None and skip:
+        query = query.offset(skip)
+    return query.all()
 
 
 def search_sweets(
@@ -105,19 +255,30 @@ def search_sweets(
     min_price: float | None = None,
     max_price: float | None = None,
     owner_id: int | None = None,
+    limit: int = 100,
+    sort: str = "id",
+    after: tuple[Any, int] | None = None,
 ) -> list[Sweet]:
     """Search sweets using optional filters for name, category, price range, and owner.
 
+    Name searches go through the ``sweets_fts`` full-text index: each word in
+    ``name`` is matched as a case-insensitive word prefix, and "relevance"
+    orders results by FTS5's bm25 rank, best match first.
+
     Args:
         db: Active SQLAlchemy session.
-        name: Optional name fragment to match (case-insensitive).
+        name: Optional name words to match as prefixes (case-insensitive).
         category: Optional category to filter by.
         min_price: Optional lower bound for the sweet price.
         max_price: Optional upper bound for the sweet price.
         owner_id: Optional user identifier to filter sweets by owner.
+        limit: Maximum number of records to return.
+        sort: Sort key name, one of "id", "name", "price" or "relevance";
+            "relevance" requires ``name``.
+        after: Optional (sort key value, id) of the last row already served.
 
     Returns:
-        A list of sweets satisfying the supplied filters.
+        A page of sweets satisfying the supplied filters.
     """
 
     query = db.query(Sweet)
@@ -126,7 +287,14 @@ def search_sweets(
         query = query.filter(Sweet.owner_id == owner_id)
 
     if name:
-        query = query.filter(Sweet.name.ilike(f"%{name}%"))
+        match = _name_match_query(name)
+        if match is None:
+            return []
+        query = (
+            query.join(sweets_fts, sweets_fts.c.rowid == Sweet.id)
+            .filter(sweets_fts.c.name.match(match))
+            .options(with_expression(Sweet.relevance, sweets_fts.c.rank))
+        )
 
     if category:
         query = query.filter(Sweet.category == category)
@@ -137,7 +305,30 @@ def search_sweets(
     if max_price is not None:
         query = query.filter(Sweet.price <= max_price)
 
-    return query.all()
+    return _paginate(query, sort, after, limit).all()
+
+
+def get_low_stock(db: Session, limit: int = 100) -> list[Sweet]:
+    """Retrieve the sweets at or below their reorder threshold, emptiest first.
+
+    The filter is exactly the predicate of the partial index
+    ``ix_sweets_low_stock``, so only low-stock rows are read.
+
+    Args:
+        db: Active SQLAlchemy session.
+        limit: Maximum number of sweets to return.
+
+    Returns:
+        Low-stock sweets ordered by quantity, then id.
+    """
+
+    return (
+        db.query(Sweet)
+        .filter(Sweet.quantity <= Sweet.effective_reorder_threshold)
+        .order_by(Sweet.quantity, Sweet.id)
+        .limit(limit)
+        .all()
+    )
 
 
 def get_sweet(db: Session, sweet_id: int) -> Sweet | None:
@@ -154,29 +345,85 @@ def get_sweet(db: Session, sweet_id: int) -> Sweet | None:
     return db.query(Sweet).filter(Sweet.id == sweet_id).first()
 
 
-def update_sweet(db: Session, sweet_id: int, sweet_update: SweetUpdate) -> Sweet | None:
-    """Apply partial updates to a sweet record.
+def get_sweet_state(db: Session, sweet_id: int) -> Row | None:
+    """Read a sweet's version and the catalog's last write time.
+
+    Used to answer conditional requests without loading the sweet.
 
     Args:
         db: Active SQLAlchemy session.
-        sweet_id: Identifier of the sweet to update.
-        sweet_update: Payload containing the fields to modify.
+        sweet_id: Identifier of the sweet.
 
     Returns:
-        The updated sweet instance, or None if no matching record exists.
+        A row with ``version`` and ``updated_at``, or None if the sweet does
+        not exist.
     """
 
-    sweet = get_sweet(db, sweet_id)
-    if sweet is None:
-        return None
+    return db.execute(
+        select(Sweet.version, CatalogState.updated_at)
+        .join(CatalogState, CatalogState.id == 1)
+        .where(Sweet.id == sweet_id)
+    ).first()
+
+
+def get_catalog_state(db: Session) -> Row:
+    """Read the catalog version and the time of the last sweets write.
 
-    update_data = sweet_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(sweet, field, value)
+    Triggers on ``sweets`` bump both in the writing transaction, so every
+    write path is covered, including bulk upserts.
 
+    Args:
+        db: Active SQLAlchemy session.
+
+    Returns:
+        A row with ``version`` and ``updated_at`` (seconds since the epoch).
+    """
+
+    return db.execute(select(CatalogState.version, CatalogState.updated_at).where(CatalogState.id == 1)).one()
+
+
+def update_sweet(
+    db: Session, sweet_id: int, sweet_update: SweetUpdate, expected_version: int | None = None
+) -> Row | str | None:
+    """Apply partial updates to a sweet record with optimistic concurrency.
+
+    The update is a single ``UPDATE ... WHERE id = :id [AND version = :v]
+    RETURNING ...`` that also bumps the version. No row is read first and no
+    lock is held between a client's read and its write. A lost race shows
+    up as a version mismatch instead of a silent overwrite.
+
+    Args:
+        db: Active SQLAlchemy session.
+        sweet_id: Identifier of the sweet to update.
+        sweet_update: Payload containing the fields to modify.
+        expected_version: Version the client last saw, or None to update
+            whatever version is current.
+
+    Returns:
+        The updated sweet row if the update succeeds.
+        The string "version_conflict" if the sweet is no longer at ``expected_version``.
+        None if the sweet does not exist.
+    """
+
+    changes = sweet_update.model_dump(exclude_unset=True)
+    stmt = update(Sweet).where(Sweet.id == sweet_id)
+    if expected_version is not None:
+        stmt = stmt.where(Sweet.version == expected_version)
+    stmt = (
+        stmt.values(**changes, version=Sweet.version + 1)
+        .returning(*_SWEET_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    row = db.execute(stmt).first()
+    if row is None:
+        db.rollback()
+        return VERSION_CONFLICT if _sweet_exists(db, sweet_id) else None
+
+    if changes.keys() & {"category", "reorder_threshold"}:
+        # RETURNING predates the trigger that recomputes the effective threshold
+        row = db.execute(select(*_SWEET_COLUMNS).where(Sweet.id == sweet_id)).first()
     db.commit()
-    db.refresh(sweet)
-    return sweet
+    return row
 
 
 def delete_sweet(db: Session, sweet_id: int) -> Sweet | None:
@@ -199,30 +446,98 @@ def delete_sweet(db: Session, sweet_id: int) -> Sweet | None:
     return sweet
 
 
-def purchase_sweet(db: Session, sweet_id: int) -> Sweet | str | None:
+def _reserve_stock(db: Session, sweet_id: int, quantity: int) -> Row | None:
+    """Atomically decrement a sweet's stock inside the current transaction.
+
+    The decrement is a single conditional ``UPDATE ... WHERE quantity >= :n
+    RETURNING ...`` so concurrent buyers can never drive the stock negative and
+    no row is read before it is written. The caller owns the commit.
+
+    Args:
+        db: Active SQLAlchemy session.
+        sweet_id: Identifier of the sweet to reserve stock for.
+        quantity: Number of units to take from stock.
+
+    Returns:
+        The updated sweet row if enough stock was available; otherwise None.
+    """
+
+    stmt = (
+        update(Sweet)
+        .where(Sweet.id == sweet_id, Sweet.quantity >= quantity)
+        .values(quantity=Sweet.quantity - quantity, version=Sweet.version + 1)
+        .returning(*_SWEET_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).first()
+
+
+def _sweet_exists(db: Session, sweet_id: int) -> bool:
+    """Check whether a sweet with the given identifier exists.
+
+    Args:
+        db: Active SQLAlchemy session.
+        sweet_id: Identifier of the sweet to look up.
+
+    Returns:
+        True if the sweet exists; otherwise False.
+    """
+
+    return db.query(exists().where(Sweet.id == sweet_id)).scalar()
+
+
+def purchase_sweet(db: Session, sweet_id: int, quantity: int = 1) -> Row | str | None:
     """Handle the purchase of a sweet by decrementing its quantity.
 
+    The successful path is a single conditional UPDATE, plus the sales rollup
+    upserts in the same transaction. Only when the UPDATE matches no row is the
+    primary key probed, to tell a missing sweet apart from one that does not
+    have enough stock.
+
     Args:
         db: Active SQLAlchemy session.
         sweet_id: Identifier of the sweet to purchase.
+        quantity: Number of units to purchase, defaults to one.
 
     Returns:
-        The updated sweet instance if the purchase succeeds.
-        The string "out_of_stock" if the sweet has no remaining quantity.
+        The updated sweet row if the purchase succeeds.
+        The string "out_of_stock" if the sweet does not have enough quantity left.
         None if the sweet does not exist.
     """
 
-    sweet = get_sweet(db, sweet_id)
-    if sweet is None:
-        return None
+    row = _reserve_stock(db, sweet_id, quantity)
+    if row is None:
+        db.rollback()
+        return OUT_OF_STOCK if _sweet_exists(db, sweet_id) else None
 
-    if sweet.quantity <= 0:
-        return "out_of_stock"
-
-    sweet.quantity -= 1
+    analytics.record_sale(db, row.category, row.id, quantity, row.price * quantity)
     db.commit()
-    db.refresh(sweet)
-    return sweet
+    return row
+
+
+def stock_crossings(row: Row, quantity: int) -> list[str]:
+    """List the thresholds a sale of ``quantity`` crossed to leave ``row``.
+
+    Stock is taken by an atomic conditional UPDATE, so every sale sees a
+    distinct before/after pair. However many buyers race, exactly one sale
+    crosses each threshold until a restock lifts the stock back above it.
+
+    Args:
+        row: The sweet row returned by the sale.
+        quantity: Number of units the sale took.
+
+    Returns:
+        "stock_low" if the sale took the sweet to or below its reorder
+        threshold, and "stock_out" if it emptied it, in that order.
+    """
+
+    before = row.quantity + quantity
+    crossed = []
+    if before > row.effective_reorder_threshold >= row.quantity:
+        crossed.append(STOCK_LOW)
+    if before > 0 and row.quantity == 0:
+        crossed.append(STOCK_OUT)
+    return crossed
 
 
 def restock_sweet(db: Session, sweet_id: int, quantity_to_add: int) -> Sweet | None:
@@ -242,6 +557,114 @@ def restock_sweet(db: Session, sweet_id: int, quantity_to_add: int) -> Sweet | N
         return None
 
     sweet.quantity += quantity_to_add
+    sweet.version = Sweet.version + 1
     db.commit()
     db.refresh(sweet)
     return sweet
+
+
+def set_category_threshold(db: Session, category: str, threshold: int) -> CategoryThreshold:
+    """Set the default reorder threshold of a category.
+
+    Triggers apply it to every sweet of the category without its own
+    override, in the same transaction.
+
+    Args:
+        db: Active SQLAlchemy session.
+        category: Category to configure.
+        threshold: Stock level at or below which its sweets are low on stock.
+
+    Returns:
+        The stored category threshold.
+    """
+
+    stmt = sqlite_insert(CategoryThreshold).values(category=category, reorder_threshold=threshold)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[CategoryThreshold.category],
+            set_={"reorder_threshold": stmt.excluded.reorder_threshold},
+        )
+    )
+    db.commit()
+    return db.get(CategoryThreshold, category)
+
+
+def delete_category_threshold(db: Session, category: str) -> bool:
+    """Remove a category's default, reverting its sweets to the global default.
+
+    Args:
+        db: Active SQLAlchemy session.
+        category: Category whose default to remove.
+
+    Returns:
+        True if the category had a default; otherwise False.
+    """
+
+    deleted = db.query(CategoryThreshold).filter(CategoryThreshold.category == category).delete()
+    db.commit()
+    return deleted > 0
+
+
+def create_order(db: Session, order_in: OrderCreate, user_id: int) -> tuple[Order, list[Row]]:
+    """Reserve stock for every line of a cart and persist the order atomically.
+
+    All lines are reserved with the same conditional UPDATE used for single
+    purchases inside one transaction; if any line cannot be satisfied the whole
+    transaction is rolled back and no stock is taken.
+
+    Args:
+        db: Active SQLAlchemy session.
+        order_in: Validated cart payload with one line per sweet.
+        user_id: Identifier of the user placing the order.
+
+    Returns:
+        A tuple of the persisted order and the updated sweet rows, in cart order.
+
+    Raises:
+        LookupError: If a sweet referenced by the cart does not exist.
+        ValueError: If a sweet does not have enough stock for its line.
+    """
+
+    order = Order(user_id=user_id, total=0.0)
+    updated: list[Row] = []
+    for line in order_in.lines:
+        sweet_id, quantity = line.sweet_id, line.quantity
+        row = _reserve_stock(db, sweet_id, quantity)
+        if row is None:
+            db.rollback()
+            if not _sweet_exists(db, sweet_id):
+                raise LookupError(f"Sweet {sweet_id} not found")
+            raise ValueError(f"Sweet {sweet_id} is out of stock")
+        order.lines.append(OrderLine(sweet_id=sweet_id, quantity=quantity, unit_price=row.price))
+        order.total += row.price * quantity
+        analytics.record_sale(db, row.category, row.id, quantity, row.price * quantity)
+        updated.append(row)
+
+    db.add(order)
+    db.commit()
+    db.refresh(order)
+    return order, updated
+
+
+def get_orders(db: Session, user_id: int, skip: int = 0, limit: int = 20) -> list[Order]:
+    """Retrieve a user's order history, most recent first.
+
+    Args:
+        db: Active SQLAlchemy session.
+        user_id: Identifier of the user whose orders to fetch.
+        skip: Number of orders to skip from the most recent one.
+        limit: Maximum number of orders to return.
+
+    Returns:
+        A list of orders with their lines eagerly loaded.
+    """
+
+    return (
+        db.query(Order)
+        .options(selectinload(Order.lines))
+        .filter(Order.user_id == user_id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
@@ -1,30 +1,49 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
 import os
 from dotenv import load_dotenv
 
-from sqlalchemy import create_engine
+from sqlalchemy import AsyncAdaptedQueuePool, create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
+from storage import StorageSettings, apply_pragmas
+
 # Load environment variables
 load_dotenv()
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sweetshop.db"
+settings = StorageSettings.from_env()
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-)
+engine = create_engine(settings.url, **settings.engine_options())
+apply_pragmas(engine, settings)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Same database through the aiosqlite driver, for async def routes. Connections
+# are pooled (aiosqlite defaults to NullPool, which starts a thread per
+# session), and objects stay loaded after commit so responses can be built
+# without awaiting a refresh.
+async_engine = create_async_engine(
+    settings.resolved_async_url,
+    poolclass=AsyncAdaptedQueuePool,
+    **settings.engine_options(),
+)
+apply_pragmas(async_engine.sync_engine, settings)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def init_db() -> None:
+    """Migrate the schema to the latest version and seed the default admin.
+
+    Safe to run on every start: an up-to-date schema is only version-checked,
+    and the admin is created only if missing.
+    """
     import models  # noqa: F401  # register models with metadata
     import crud
+    import migrations
     import security
 
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    migrations.migrate(engine)
     
     # Create default admin user from environment variables
     admin_email = os.getenv("ADMIN_EMAIL")
@@ -44,7 +63,13 @@ def init_db() -> None:
                     role="admin"
                 )
                 db.add(admin_user)
-                db.commit()
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # Another worker seeded the admin between our check and insert
+                    db.rollback()
+                    print(f"ℹ️  Admin already exists: {admin_email}")
+                    return
                 print(f"✅ Default admin created: {admin_email}")
             else:
                 print(f"ℹ️  Admin already exists: {admin_email}")
@@ -58,3 +83,8 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
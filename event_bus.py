@@ -0,0 +1,189 @@
+"""Pub/sub backends that carry WebSocket events between worker processes.
+
+``ConnectionManager`` publishes each encoded event to a bus once, with the
+topics it is routed to. The bus hands both back to every worker's manager,
+which fans the event out to that worker's own clients only, without having
+to decode it to find them. :class:`InProcessEventBus` is the single-process default.
+:class:`SQLiteEventBus` lets several uvicorn workers on one host share
+events through a small WAL-mode SQLite log that each worker polls.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Callable
+
+# Called with an event's JSON text and its topics, or None if they are unknown
+Deliver = Callable[[str, frozenset[str] | None], None]
+
+logger = logging.getLogger(__name__)
+
+
+class EventBus:
+    """Base class for event bus backends.
+
+    Subclasses implement :meth:`publish`, which must deliver the event to the
+    local process through the bound callback as well as to other workers.
+    """
+
+    def __init__(self):
+        self._deliver: Deliver | None = None
+
+    def bind(self, deliver: Deliver) -> None:
+        """Register the callback that fans an encoded event out locally.
+
+        Args:
+            deliver: Called with each event's JSON text and topics, once per event.
+        """
+        self._deliver = deliver
+
+    async def start(self) -> None:
+        """Open connections or background tasks the backend needs."""
+
+    async def stop(self) -> None:
+        """Release anything opened by :meth:`start`."""
+
+    async def publish(self, text: str, topics: frozenset[str] | None = None) -> None:
+        """Send an encoded event to every worker, including this one.
+
+        Args:
+            text: The event serialized as JSON.
+            topics: Topics the event is routed to, or None to have each
+                worker decode the event to find them.
+        """
+        raise NotImplementedError
+
+
+class InProcessEventBus(EventBus):
+    """Delivers events straight back to the local manager."""
+
+    async def publish(self, text: str, topics: frozenset[str] | None = None) -> None:
+        self._deliver(text, topics)
+
+
+class SQLiteEventBus(EventBus):
+    """Shares events between processes through an append-only SQLite table.
+
+    ``publish`` delivers locally right away and appends the event to the log.
+    A background task polls for rows from other workers. Rows older than
+    ``retention_seconds`` are pruned as the log is polled.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.05, retention_seconds: float = 60.0):
+        """Configure the bus; the database is opened by :meth:`start`.
+
+        Args:
+            path: SQLite file shared by every worker on the host.
+            poll_interval: Seconds between polls for events from other workers.
+            retention_seconds: How long published events are kept in the log.
+        """
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.origin = uuid.uuid4().hex
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._last_prune = 0.0
+        self._poller: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            # Workers start together; wait out each other's schema setup
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ws_events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "origin TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "payload TEXT NOT NULL, "
+                "topics TEXT)"
+            )
+            # Logs created before topics were recorded; their rows get decoded instead
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(ws_events)")}
+            if "topics" not in columns:
+                try:
+                    self._conn.execute("ALTER TABLE ws_events ADD COLUMN topics TEXT")
+                except sqlite3.OperationalError:
+                    pass  # another worker added it first
+            self._last_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM ws_events").fetchone()[0]
+        self._poller = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+            self._poller = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _append(self, text: str, topics: frozenset[str] | None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ws_events (origin, created_at, payload, topics) VALUES (?, ?, ?, ?)",
+                (self.origin, time.time(), text, None if topics is None else json.dumps(sorted(topics))),
+            )
+
+    def _fetch(self) -> list[tuple[str, str | None]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, origin, payload, topics FROM ws_events WHERE id > ? ORDER BY id",
+                (self._last_id,),
+            ).fetchall()
+            now = time.time()
+            if now - self._last_prune >= self.retention_seconds:
+                self._conn.execute("DELETE FROM ws_events WHERE created_at < ?", (now - self.retention_seconds,))
+                self._last_prune = now
+        if rows:
+            self._last_id = rows[-1][0]
+        return [(payload, topics) for _, origin, payload, topics in rows if origin != self.origin]
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                payloads = await asyncio.to_thread(self._fetch)
+            except sqlite3.OperationalError:
+                continue
+            for text, topics in payloads:
+                # One bad event must not stop this worker hearing the others
+                try:
+                    self._deliver(text, None if topics is None else frozenset(json.loads(topics)))
+                except Exception:
+                    logger.exception("Dropped an event from another worker")
+
+    async def publish(self, text: str, topics: frozenset[str] | None = None) -> None:
+        self._deliver(text, topics)
+        await asyncio.to_thread(self._append, text, topics)
+
+
+def create_event_bus() -> EventBus:
+    """Build the bus selected by the EVENT_BUS environment variable.
+
+    ``EVENT_BUS=sqlite`` shares events through ``EVENT_BUS_PATH`` (default
+    ``./sweetshop_events.db``), polled every ``EVENT_BUS_POLL_MS`` (default
+    50). Anything else keeps events in-process.
+
+    Returns:
+        The configured event bus.
+    """
+
+    if os.getenv("EVENT_BUS", "inprocess") == "sqlite":
+        return SQLiteEventBus(
+            os.getenv("EVENT_BUS_PATH", "./sweetshop_events.db"),
+            poll_interval=float(os.getenv("EVENT_BUS_POLL_MS", "50")) / 1000,
+        )
+    return InProcessEventBus()
@@ -0,0 +1,58 @@
+"""JSON responses encoded by pydantic's Rust serializer.
+
+FastAPI validates whatever a route returns against its ``response_model``
+and then encodes the result with the standard ``json`` module. The sweets
+routes already hold validated ``schemas.Sweet`` objects, because they
+validated them for the WebSocket broadcast or read them from
+``catalog_cache``. These routes return a :class:`FastJSONResponse` built from
+those objects instead, which FastAPI passes through untouched. Each model is
+then validated once and encoded once.
+"""
+
+from functools import lru_cache
+from typing import Any
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model])
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` encoded by pydantic instead of the ``json`` module.
+
+    Models and homogeneous lists of models use their schema's compiled
+    serializer. Anything else goes through ``to_json``, which infers types
+    per value and is somewhat slower.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        if isinstance(content, list) and content and isinstance(content[0], BaseModel):
+            return _list_adapter(type(content[0])).dump_json(content)
+        return to_json(content)
+
+
+def respond(content: Any, response: Response | None = None, status_code: int = 200) -> FastJSONResponse:
+    """Build the response for a route that already holds validated models.
+
+    Args:
+        content: Pydantic models, or lists and dicts of them.
+        response: The route's injected response, whose headers (pagination
+            cursors, ETags) are carried over.
+        status_code: HTTP status of the response.
+
+    Returns:
+        The encoded response.
+    """
+
+    encoded = FastJSONResponse(content, status_code=status_code)
+    if response is not None:
+        encoded.headers.raw.extend(response.headers.raw)
+    return encoded
@@ -53,6 +53,10 @@ const AdminPage = () => {
         setSweets(prev => prev.map(s => s.id === message.data.id ? message.data : s))
         toast.success('Sweet updated!')
         break
+      case 'catalog_bulk_changed':
+        sweetsAPI.getAll().then(setSweets).catch(() => toast.error('Failed to refresh'))
+        toast.success(`${message.data.imported} sweets imported!`)
+        break
       case 'sweet_deleted':
         setSweets(prev => prev.filter(s => s.id !== message.data.id))
         toast.success('Sweet deleted!')
@@ -61,6 +65,17 @@ const AdminPage = () => {
         setSweets(prev => prev.map(s => s.id === message.data.id ? message.data : s))
         toast.info('Sweet purchased by customer!')
         break
+      case 'order_placed': {
+        const updated = new Map(message.data.sweets.map(s => [s.id, s]))
+        setSweets(prev => prev.map(s => updated.get(s.id) ?? s))
+        toast.success('Order placed by customer!')
+        break
+      }
+      case 'inventory_batch': {
+        const changes = new Map(message.data.map(({ id, quantity, version }) => [id, { quantity, version }]))
+        setSweets(prev => prev.map(s => changes.has(s.id) ? { ...s, ...changes.get(s.id) } : s))
+        break
+      }
       case 'sweet_restocked':
         setSweets(prev => prev.map(s => s.id === message.data.id ? message.data : s))
         toast.success('Sweet restocked!')
@@ -85,12 +100,17 @@ const AdminPage = () => {
 
   const handleUpdate = async (sweetData) => {
     try {
-      const updated = await sweetsAPI.update(formModal.sweet.id, sweetData)
+      const updated = await sweetsAPI.update(formModal.sweet.id, sweetData, formModal.sweet.version)
       setSweets(sweets.map(s => s.id === updated.id ? updated : s))
       setFormModal({ isOpen: false, mode: 'create', sweet: null })
       toast.success('Sweet updated successfully!')
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Failed to update sweet')
+      if (error.response?.status === 409) {
+        // Someone else changed the sweet; show the current values before retrying
+        setFormModal({ isOpen: false, mode: 'create', sweet: null })
+        fetchSweets()
+      }
     }
   }
 
@@ -34,7 +34,25 @@ const DashboardPage = () => {
           )
         )
         break
-      
+
+      case 'order_placed': {
+        const updated = new Map(message.data.sweets.map((sweet) => [sweet.id, sweet]))
+        setSweets((prev) => prev.map((sweet) => updated.get(sweet.id) ?? sweet))
+        break
+      }
+
+      case 'inventory_batch': {
+        const changes = new Map(message.data.map(({ id, quantity, version }) => [id, { quantity, version }]))
+        setSweets((prev) =>
+          prev.map((sweet) => (changes.has(sweet.id) ? { ...sweet, ...changes.get(sweet.id) } : sweet))
+        )
+        break
+      }
+
+      case 'catalog_bulk_changed':
+        sweetsAPI.getAll().then(setSweets).catch(() => toast.error('Failed to load sweets'))
+        break
+
       case 'sweet_deleted':
         setSweets((prev) => prev.filter((sweet) => sweet.id !== message.data.id))
         toast.success('Sweet removed!')
@@ -51,8 +51,10 @@ export const sweetsAPI = {
     const response = await api.post('/sweets', sweetData)
     return response.data
   },
-  update: async (id, sweetData) => {
-    const response = await api.put(`/sweets/${id}`, sweetData)
+  update: async (id, sweetData, expectedVersion) => {
+    const response = await api.put(`/sweets/${id}`, sweetData, {
+      params: expectedVersion === undefined ? {} : { expected_version: expectedVersion },
+    })
     return response.data
   },
   delete: async (id) => {
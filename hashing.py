@@ -0,0 +1,168 @@
+"""Password hashing on a dedicated, bounded worker pool.
+
+bcrypt is deliberately slow. Running it on the default AnyIO threadpool lets
+a burst of logins take every thread and stall all other sync endpoints, so
+hashes and verifications go through :data:`hasher` instead. The hasher has
+its own small pool of workers and refuses new work with
+:class:`HasherBusyError` once its queue is full.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+DEFAULT_ROUNDS = 12
+
+
+class HasherBusyError(RuntimeError):
+    """Raised when the hashing queue is full and the caller should retry later."""
+
+    retry_after_seconds = 1
+
+
+def calibrate_rounds(target_ms: float, probe_rounds: int = 8) -> int:
+    """Pick the bcrypt cost factor whose hash time is closest to a target.
+
+    Each extra round doubles the work, so one probe hash is enough to
+    extrapolate.
+
+    Args:
+        target_ms: Desired time per hash on this machine, in milliseconds.
+        probe_rounds: Cost factor used for the timing probe.
+
+    Returns:
+        A cost factor clamped between MIN_ROUNDS and MAX_ROUNDS.
+    """
+
+    probe = CryptContext(schemes=["bcrypt"], bcrypt__rounds=probe_rounds)
+    started = time.perf_counter()
+    probe.hash("calibration-probe")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    rounds = probe_rounds + round(math.log2(target_ms / max(elapsed_ms, 0.001)))
+    return max(MIN_ROUNDS, min(MAX_ROUNDS, rounds))
+
+
+_target_ms = os.getenv("PASSWORD_HASH_TARGET_MS")
+ROUNDS = calibrate_rounds(float(_target_ms)) if _target_ms else int(os.getenv("PASSWORD_HASH_ROUNDS", DEFAULT_ROUNDS))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=ROUNDS)
+
+
+def hash_password(password: str) -> str:
+    """Hash a plaintext password on the calling thread.
+
+    Args:
+        password: The plaintext password to hash.
+
+    Returns:
+        The bcrypt hash of the password.
+    """
+
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Check a plaintext password against a bcrypt hash on the calling thread.
+
+    Args:
+        plain_password: The candidate password.
+        hashed_password: The stored password hash.
+
+    Returns:
+        True if the password matches the hash; otherwise False.
+    """
+
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs password hashing on its own executor behind a bounded queue."""
+
+    def __init__(self, workers: int, queue_size: int, kind: str = "thread"):
+        """Configure the hasher; the executor is created on first use.
+
+        Args:
+            workers: Number of threads or processes hashing concurrently.
+            queue_size: Number of requests allowed to wait for a free worker.
+            kind: "thread" for a thread pool or "process" for a process pool.
+        """
+        if kind not in {"thread", "process"}:
+            raise ValueError(f"Unknown hasher executor kind: {kind}")
+        self.workers = workers
+        self.queue_size = queue_size
+        self.kind = kind
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor: Executor | None = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        with self._executor_lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hasher")
+            return self._executor
+
+    async def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusyError("Password hashing queue is full")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Free the slot when the pool is done with the job, not when the caller
+        # stops waiting: a cancelled request's hash keeps running.
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password on the worker pool.
+
+        Args:
+            password: The plaintext password to hash.
+
+        Returns:
+            The bcrypt hash of the password.
+
+        Raises:
+            HasherBusyError: If the queue is full.
+        """
+        return await self._submit(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password on the worker pool.
+
+        Args:
+            plain_password: The candidate password.
+            hashed_password: The stored password hash.
+
+        Returns:
+            True if the password matches the hash; otherwise False.
+
+        Raises:
+            HasherBusyError: If the queue is full.
+        """
+        return await self._submit(verify_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        """Stop the executor, waiting for in-flight hashes to finish."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+hasher = PasswordHasher(
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", "4")),
+    queue_size=int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "64")),
+    kind=os.getenv("PASSWORD_HASH_EXECUTOR", "thread"),
+)
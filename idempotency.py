@@ -0,0 +1,298 @@
+"""Idempotency-Key support for retried mutating requests.
+
+A client that retries a purchase, restock or order with the same
+``Idempotency-Key`` header gets the first attempt's response back. The
+replay does not touch ``sweets`` and does not broadcast again. Keys are
+scoped to the user, method and path, and bound to a fingerprint of the
+request body.
+
+Completed responses live in an in-memory TTL cache. With
+``IDEMPOTENCY_STORE=sqlite`` they are also recorded in the
+``idempotency_keys`` table, so a retry that lands on another worker, or
+arrives after a restart, is still recognised, and a key evicted from the
+cache is looked up there. Without the table nothing is evicted before its
+TTL: once ``IDEMPOTENCY_CACHE_SIZE`` live keys are held, new keys are
+refused instead of forgetting old ones. A claim in the table that is still
+without a response after ``IDEMPOTENCY_LEASE_SECONDS`` is taken over by the
+next retry, since its worker is presumed to have died. Only successful
+responses are stored. When an attempt fails, its key is released and the
+retry runs again.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from fastapi import Request, Response
+from pydantic_core import to_json
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+
+import database
+from cache import TTLCache
+from models import IdempotencyKey
+
+TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 60 * 60)))
+# How long a persistent claim without a response blocks retries; past it the
+# holder is presumed dead and a retry takes the key over
+LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "30"))
+MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "100000"))
+PERSIST = os.getenv("IDEMPOTENCY_STORE", "memory") == "sqlite"
+MAX_KEY_LENGTH = 255
+
+
+class InvalidIdempotencyKey(ValueError):
+    """The Idempotency-Key header is empty or too long."""
+
+
+class IdempotencyKeyReused(ValueError):
+    """The key was already used with a different request body."""
+
+
+class IdempotencyInProgress(RuntimeError):
+    """Another worker is still processing a request with this key."""
+
+
+class IdempotencyStoreFull(RuntimeError):
+    """The in-memory store holds as many live keys as it may."""
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    status_code: int
+    body: str
+
+
+class IdempotencyStore:
+    """Tracks in-flight and completed keyed requests.
+
+    Duplicates that arrive while the first attempt is still running in this
+    process wait for it and replay its response.
+    """
+
+    def __init__(
+        self,
+        ttl: float = TTL_SECONDS,
+        maxsize: int = MAX_ENTRIES,
+        engine: Engine | None = None,
+        lease: float = LEASE_SECONDS,
+    ):
+        """Create an empty store.
+
+        Args:
+            ttl: How long completed responses are replayed, in seconds.
+            maxsize: Maximum number of keys kept in memory. Without an
+                engine this caps the live keys and new ones are refused
+                past it; with one, older keys are evicted to the table.
+            engine: Engine for the persistent ``idempotency_keys`` table, or
+                None to keep keys in memory only.
+            lease: Seconds after which a persistent claim that never
+                recorded a response may be taken over by a retry.
+        """
+        self.ttl = ttl
+        self.lease = lease
+        self.maxsize = maxsize
+        self.engine = engine
+        self._completed = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._in_flight: dict[str, tuple[str, asyncio.Future]] = {}
+
+    def clear(self) -> None:
+        """Forget every in-memory key."""
+        self._completed.clear()
+        self._in_flight.clear()
+
+    async def begin(self, scope: str, fingerprint: str) -> StoredResponse | None:
+        """Claim a key, or return the response to replay for it.
+
+        Args:
+            scope: The key qualified by user, method and path.
+            fingerprint: Digest of the request body.
+
+        Returns:
+            The stored response for a duplicate, or None if the caller now
+            owns the key and must call :meth:`complete` or :meth:`abandon`.
+
+        Raises:
+            IdempotencyKeyReused: If the key was used with a different body.
+            IdempotencyInProgress: If another worker holds the key.
+            IdempotencyStoreFull: If the key is new and there is no room to
+                remember it for its full TTL.
+        """
+        while True:
+            completed = self._completed.get(scope)
+            if completed is not None:
+                stored_fingerprint, response = completed
+                if stored_fingerprint != fingerprint:
+                    raise IdempotencyKeyReused("Idempotency-Key was already used with a different request")
+                return response
+            in_flight = self._in_flight.get(scope)
+            if in_flight is None:
+                break
+            if in_flight[0] != fingerprint:
+                raise IdempotencyKeyReused("Idempotency-Key was already used with a different request")
+            # Wait for the first attempt; loop to replay it or, if it failed, take over.
+            await asyncio.shield(in_flight[1])
+
+        if self.engine is None and not self._has_room():
+            raise IdempotencyStoreFull("Too many Idempotency-Keys are being remembered; retry later")
+        self._in_flight[scope] = (fingerprint, asyncio.get_running_loop().create_future())
+        if self.engine is not None:
+            try:
+                response = await asyncio.to_thread(self._claim_persistent, scope, fingerprint)
+            except BaseException:
+                self._release(scope)
+                raise
+            if response is not None:
+                self._completed.set(scope, (fingerprint, response))
+                self._release(scope)
+                return response
+        return None
+
+    async def complete(self, scope: str, response: StoredResponse) -> None:
+        """Record the response of a claimed key and wake waiting duplicates."""
+        fingerprint = self._in_flight[scope][0]
+        self._completed.set(scope, (fingerprint, response))
+        try:
+            if self.engine is not None:
+                await asyncio.to_thread(self._record_persistent, scope, response)
+        finally:
+            self._release(scope)
+
+    async def abandon(self, scope: str) -> None:
+        """Release a claimed key after a failed attempt so a retry runs again."""
+        try:
+            if self.engine is not None:
+                await asyncio.to_thread(self._delete_persistent, scope)
+        finally:
+            self._release(scope)
+
+    def _has_room(self) -> bool:
+        # Claims count too, so completing one never evicts a live key
+        if len(self._completed) + len(self._in_flight) < self.maxsize:
+            return True
+        self._completed.purge_expired()
+        return len(self._completed) + len(self._in_flight) < self.maxsize
+
+    def _release(self, scope: str) -> None:
+        _, done = self._in_flight.pop(scope)
+        done.set_result(None)
+
+    def _claim_persistent(self, scope: str, fingerprint: str) -> StoredResponse | None:
+        now = time.time()
+        with self.engine.begin() as connection:
+            connection.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.scope == scope, IdempotencyKey.created_at < now - self.ttl)
+            )
+            # A claim still without a response past its lease belongs to a
+            # worker that died mid-request; take it over rather than answer 409
+            # until the TTL runs out.
+            claimed = connection.execute(
+                sqlite_insert(IdempotencyKey)
+                .values(scope=scope, fingerprint=fingerprint, created_at=now)
+                .on_conflict_do_update(
+                    index_elements=["scope"],
+                    set_={"fingerprint": fingerprint, "created_at": now},
+                    where=IdempotencyKey.status_code.is_(None) & (IdempotencyKey.created_at < now - self.lease),
+                )
+            ).rowcount
+            if claimed:
+                return None
+            row = connection.execute(select(IdempotencyKey.__table__).where(IdempotencyKey.scope == scope)).one()
+        if row.fingerprint != fingerprint:
+            raise IdempotencyKeyReused("Idempotency-Key was already used with a different request")
+        if row.status_code is None:
+            raise IdempotencyInProgress("A request with this Idempotency-Key is still in progress")
+        return StoredResponse(row.status_code, row.body)
+
+    def _record_persistent(self, scope: str, response: StoredResponse) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.scope == scope)
+                .values(status_code=response.status_code, body=response.body)
+            )
+
+    def _delete_persistent(self, scope: str) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(delete(IdempotencyKey).where(IdempotencyKey.scope == scope))
+
+
+class Attempt:
+    """Handle for one keyed request inside :func:`guard`."""
+
+    def __init__(self, replay: Response | None):
+        self.replay = replay
+        self.response: StoredResponse | None = None
+
+    def save(self, body: object, status_code: int = 200) -> None:
+        """Remember the response body (models or plain JSON data) for replays."""
+        self.response = StoredResponse(status_code, to_json(body).decode())
+
+
+@asynccontextmanager
+async def guard(request: Request, user_id: int, key: str | None) -> AsyncIterator[Attempt]:
+    """Make a route body idempotent for an optional Idempotency-Key.
+
+    The route returns ``attempt.replay`` when it is set. Otherwise it does
+    its work and calls ``attempt.save`` with the response body as soon as
+    the write has committed; from then on the key is completed even if the
+    rest of the route fails. Without a key this is a no-op wrapper.
+
+    Args:
+        request: The incoming request; its method, path and body scope the key.
+        user_id: The authenticated user, so keys never collide across users.
+        key: The Idempotency-Key header value, if any.
+
+    Yields:
+        The attempt handle.
+
+    Raises:
+        IdempotencyKeyReused: If the key was used with a different body.
+        IdempotencyInProgress: If another worker holds the key.
+        IdempotencyStoreFull: If the key cannot be remembered for its TTL.
+        InvalidIdempotencyKey: If the key is empty or too long.
+    """
+
+    if key is None:
+        yield Attempt(None)
+        return
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise InvalidIdempotencyKey(f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+    scope = f"{user_id}:{request.method}:{request.url.path}:{key}"
+    fingerprint = hashlib.sha256(await request.body()).hexdigest()
+    replayed = await store.begin(scope, fingerprint)
+    if replayed is not None:
+        yield Attempt(
+            Response(
+                content=replayed.body,
+                status_code=replayed.status_code,
+                media_type="application/json",
+                headers={"Idempotent-Replayed": "true"},
+            )
+        )
+        return
+
+    attempt = Attempt(None)
+    try:
+        yield attempt
+    except BaseException:
+        # Once a response is saved the write has committed, so a failure
+        # afterwards (a broadcast, a disconnect) must not let a retry run it again.
+        if attempt.response is None:
+            await store.abandon(scope)
+        else:
+            await asyncio.shield(store.complete(scope, attempt.response))
+        raise
+    if attempt.response is None:
+        await store.abandon(scope)
+    else:
+        await store.complete(scope, attempt.response)
+
+
+store = IdempotencyStore(engine=database.engine if PERSIST else None)
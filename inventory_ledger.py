@@ -0,0 +1,245 @@
+"""Stock history from the append-only inventory ledger.
+
+Triggers on ``sweets`` append an ``inventory_movements`` row (a signed
+quantity delta) in the same transaction as every stock change. Snapshots in
+``inventory_snapshots`` record a sweet's stock as of a given movement. The
+stock at any time is therefore the latest snapshot before that time plus the
+sum of the short tail of movements after it.
+
+:func:`compact` folds movements older than the retention window into
+snapshots and deletes them, so the ledger stays bounded. The API process
+runs it periodically (see :func:`run_periodic_compaction`). Before the
+retention window, history is only as fine-grained as the compaction
+interval.
+
+Within the retention window, :func:`snapshot_busy` snapshots each sweet once
+``SNAPSHOT_EVERY`` movements have piled up since its latest snapshot, so a
+read never replays more than about that many rows. The API process runs it
+every ``SNAPSHOT_INTERVAL_SECONDS`` (see :func:`run_periodic_snapshots`).
+"""
+
+import asyncio
+import os
+import time
+from collections.abc import Callable
+
+from sqlalchemy import exists, func, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from models import InventoryMovement, InventorySnapshot
+
+RETENTION_SECONDS = float(os.getenv("LEDGER_RETENTION_SECONDS", str(7 * 24 * 60 * 60)))
+COMPACT_INTERVAL_SECONDS = float(os.getenv("LEDGER_COMPACT_INTERVAL_SECONDS", "3600"))
+SNAPSHOT_EVERY = int(os.getenv("LEDGER_SNAPSHOT_EVERY", "1000"))
+SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("LEDGER_SNAPSHOT_INTERVAL_SECONDS", "60"))
+
+# One snapshot per sweet that moved since its latest snapshot up to
+# :through_id, folding in every movement up to :through_id. Snapshots past
+# :through_id (written by snapshot_busy) are ignored, so compaction still
+# records the stock at its cutoff. SQLite returns the quantity of the row
+# holding MAX(movement_id) for the bare column in ``latest``.
+_SNAPSHOT_SQL = text(
+    "INSERT INTO inventory_snapshots (sweet_id, quantity, movement_id, as_of) "
+    "WITH latest AS ("
+    "SELECT sweet_id, quantity, MAX(movement_id) AS movement_id FROM inventory_snapshots "
+    "WHERE movement_id <= :through_id GROUP BY sweet_id) "
+    "SELECT m.sweet_id, COALESCE(latest.quantity, 0) + SUM(m.delta), MAX(m.id), MAX(m.created_at) "
+    "FROM inventory_movements AS m LEFT JOIN latest ON latest.sweet_id = m.sweet_id "
+    "WHERE m.id <= :through_id AND m.id > COALESCE(latest.movement_id, 0) "
+    "GROUP BY m.sweet_id"
+)
+
+# Snapshot the sweets that moved after :since_id and have at least
+# :min_movements movements since their latest snapshot. CROSS JOIN fixes the
+# join order, so only those sweets' snapshots and ledger tails are read, each
+# through its per-sweet index.
+_BUSY_SNAPSHOT_SQL = text(
+    "INSERT INTO inventory_snapshots (sweet_id, quantity, movement_id, as_of) "
+    "WITH moved AS ("
+    "SELECT DISTINCT sweet_id FROM inventory_movements WHERE id > :since_id AND id <= :through_id), "
+    "latest AS ("
+    "SELECT moved.sweet_id, s.quantity, MAX(s.movement_id) AS movement_id, s.as_of "
+    "FROM moved CROSS JOIN inventory_snapshots AS s ON s.sweet_id = moved.sweet_id GROUP BY moved.sweet_id) "
+    "SELECT moved.sweet_id, COALESCE(latest.quantity, 0) + SUM(m.delta), MAX(m.id), MAX(m.created_at) "
+    "FROM moved LEFT JOIN latest ON latest.sweet_id = moved.sweet_id "
+    "CROSS JOIN inventory_movements AS m ON m.sweet_id = moved.sweet_id "
+    "AND m.created_at >= COALESCE(latest.as_of, 0) AND m.id > COALESCE(latest.movement_id, 0) "
+    "AND m.id <= :through_id "
+    "GROUP BY moved.sweet_id HAVING COUNT(*) >= :min_movements"
+)
+
+
+def stock_at(db: Session, sweet_id: int, at: float | None = None) -> int | None:
+    """Reconstruct a sweet's stock from the ledger.
+
+    Args:
+        db: Active SQLAlchemy session.
+        sweet_id: Identifier of the sweet.
+        at: Point in time in seconds since the epoch, or None for now.
+
+    Returns:
+        The stock level, or None if the ledger has no record of the sweet.
+
+    Raises:
+        ValueError: If ``at`` precedes the sweet's oldest retained snapshot.
+    """
+
+    snapshot_query = select(
+        InventorySnapshot.quantity, InventorySnapshot.movement_id, InventorySnapshot.as_of
+    ).where(InventorySnapshot.sweet_id == sweet_id)
+    tail_query = select(func.sum(InventoryMovement.delta), func.count()).where(InventoryMovement.sweet_id == sweet_id)
+    if at is not None:
+        snapshot_query = snapshot_query.where(InventorySnapshot.as_of <= at)
+        tail_query = tail_query.where(InventoryMovement.created_at <= at)
+    snapshot = db.execute(snapshot_query.order_by(InventorySnapshot.movement_id.desc()).limit(1)).first()
+
+    if snapshot is None:
+        if at is not None:
+            # Every snapshot is later. Replaying from the start is only possible
+            # if the movements up to the earliest one have not been compacted.
+            earliest = db.execute(
+                select(func.min(InventorySnapshot.movement_id)).where(InventorySnapshot.sweet_id == sweet_id)
+            ).scalar()
+            if earliest is not None and not db.query(
+                exists().where(InventoryMovement.sweet_id == sweet_id, InventoryMovement.id <= earliest)
+            ).scalar():
+                raise ValueError(f"Stock history of sweet {sweet_id} before that time has been compacted")
+        quantity = 0
+    else:
+        quantity, after_id, as_of = snapshot
+        # The movement the snapshot ends at has created_at == as_of, so the
+        # time bound keeps the index range to the tail; the id filter then
+        # drops movements already folded in at the same timestamp.
+        tail_query = tail_query.where(InventoryMovement.created_at >= as_of, InventoryMovement.id > after_id)
+    delta, movements = db.execute(tail_query).one()
+    if snapshot is None and movements == 0:
+        return None
+    return quantity + (delta or 0)
+
+
+def snapshot(db: Session, through_id: int | None = None) -> int:
+    """Snapshot every sweet whose stock moved since its latest snapshot.
+
+    The caller owns the commit.
+
+    Args:
+        db: Active SQLAlchemy session.
+        through_id: Last movement to fold in, or None for all of them.
+
+    Returns:
+        The number of snapshots written.
+    """
+
+    if through_id is None:
+        through_id = db.execute(select(func.max(InventoryMovement.id))).scalar()
+        if through_id is None:
+            return 0
+    return db.execute(_SNAPSHOT_SQL, {"through_id": through_id}).rowcount
+
+
+def snapshot_busy(db: Session, min_movements: int = SNAPSHOT_EVERY, since_id: int = 0) -> tuple[int, int]:
+    """Snapshot every sweet with a long ledger tail, and commit.
+
+    A sweet's tail only grows when it moves, so a periodic caller passes the
+    ``through_id`` of its previous pass as ``since_id`` and only the sweets
+    that moved since then are looked at.
+
+    Args:
+        db: Active SQLAlchemy session.
+        min_movements: Tail length, in movements since the sweet's latest
+            snapshot, from which the sweet is snapshotted.
+        since_id: Only consider sweets with a movement after this one.
+
+    Returns:
+        The number of snapshots written, and the last movement considered.
+    """
+
+    through_id = db.execute(select(func.max(InventoryMovement.id))).scalar()
+    if through_id is None or through_id <= since_id:
+        return 0, since_id
+    written = db.execute(
+        _BUSY_SNAPSHOT_SQL, {"since_id": since_id, "through_id": through_id, "min_movements": min_movements}
+    ).rowcount
+    db.commit()
+    return written, through_id
+
+
+def compact(db: Session, retention_seconds: float = RETENTION_SECONDS, now: float | None = None) -> dict[str, int]:
+    """Fold movements older than the retention window into snapshots.
+
+    Snapshotting and deleting happen in one transaction, which is committed.
+
+    Args:
+        db: Active SQLAlchemy session.
+        retention_seconds: Age after which movements are folded away.
+        now: Current time in seconds since the epoch, overridable for tests.
+
+    Returns:
+        The number of snapshots written and movements deleted.
+    """
+
+    cutoff = (time.time() if now is None else now) - retention_seconds
+    through_id = db.execute(
+        select(func.max(InventoryMovement.id)).where(InventoryMovement.created_at < cutoff)
+    ).scalar()
+    if through_id is None:
+        return {"snapshots": 0, "deleted": 0}
+    written = snapshot(db, through_id)
+    deleted = db.query(InventoryMovement).filter(InventoryMovement.id <= through_id).delete(synchronize_session=False)
+    db.commit()
+    return {"snapshots": written, "deleted": deleted}
+
+
+async def run_periodic_compaction(
+    session_factory: Callable[[], Session],
+    interval: float = COMPACT_INTERVAL_SECONDS,
+    retention_seconds: float = RETENTION_SECONDS,
+) -> None:
+    """Compact the ledger every ``interval`` seconds until cancelled.
+
+    Args:
+        session_factory: Creates the session each compaction runs in.
+        interval: Seconds between compactions.
+        retention_seconds: Age after which movements are folded away.
+    """
+
+    def run() -> None:
+        with session_factory() as db:
+            compact(db, retention_seconds)
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(run)
+        except OperationalError:
+            # Database busy; the next run folds in the same movements
+            continue
+
+
+async def run_periodic_snapshots(
+    session_factory: Callable[[], Session],
+    interval: float = SNAPSHOT_INTERVAL_SECONDS,
+    min_movements: int = SNAPSHOT_EVERY,
+) -> None:
+    """Snapshot sweets with long ledger tails every ``interval`` seconds until cancelled.
+
+    Args:
+        session_factory: Creates the session each pass runs in.
+        interval: Seconds between passes.
+        min_movements: Tail length from which a sweet is snapshotted.
+    """
+
+    since_id = 0
+
+    def run() -> int:
+        with session_factory() as db:
+            return snapshot_busy(db, min_movements, since_id)[1]
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            since_id = await asyncio.to_thread(run)
+        except OperationalError:
+            # Database busy; the next pass looks at the same sweets
+            continue
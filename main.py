@@ -1,15 +1,32 @@
+import asyncio
+import json
 from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Literal
 
-from fastapi import Depends, FastAPI, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+import analytics
+import async_crud
+import bulk_import
+import catalog_cache
+import conditional
 import crud
+import fast_json
+import hashing
+import idempotency
+import inventory_ledger
 import models
+import pagination
+import rate_limit
 import schemas
 import security
-from database import get_db, init_db
+from database import SessionLocal, get_async_db, get_db, init_db
 from websocket_manager import manager
 
 
@@ -25,11 +42,29 @@ async def lifespan(_: FastAPI):
 	"""
 
 	init_db()
+	await manager.start()
+	ledger_jobs = []
+	if inventory_ledger.COMPACT_INTERVAL_SECONDS > 0:
+		ledger_jobs.append(asyncio.create_task(inventory_ledger.run_periodic_compaction(SessionLocal)))
+	if inventory_ledger.SNAPSHOT_INTERVAL_SECONDS > 0:
+		ledger_jobs.append(asyncio.create_task(inventory_ledger.run_periodic_snapshots(SessionLocal)))
 	yield
+	for job in ledger_jobs:
+		job.cancel()
+		try:
+			await job
+		except asyncio.CancelledError:
+			pass
+	await manager.stop()
+	rate_limit.store.close()
+	hashing.hasher.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
 
+# Throttle logins and purchases; added before CORS so 429s still carry CORS headers
+app.add_middleware(rate_limit.RateLimitMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -37,43 +72,148 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination cursor
 )
 
-init_db()
+SweetSort = Literal["id", "name", "price"]
+SearchSort = Literal["id", "name", "price", "relevance"]
+
+
+def _decode_cursor(cursor: str | None, sort: str) -> tuple[Any, int] | None:
+	"""Decode an optional pagination cursor, rejecting malformed ones.
+
+	Args:
+		cursor: Cursor supplied by the client, if any.
+		sort: Sort key the client is paginating by.
+
+	Returns:
+		The (sort key value, id) pair to continue after, or None for the first page.
+
+	Raises:
+		HTTPException: If the cursor is invalid for the requested sort order.
+	"""
+
+	if cursor is None:
+		return None
+	try:
+		return pagination.decode_cursor(cursor, sort)
+	except pagination.InvalidCursorError as exc:
+		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+
+def _not_modified(request: Request, response: Response, etag: str, updated_at: float) -> Response | None:
+	"""Attach caching validators, or answer 304 if the client's copy is current.
+
+	Args:
+		request: The incoming request, checked for ``If-None-Match``.
+		response: Outgoing response that receives the validators.
+		etag: Current entity tag of the requested resource.
+		updated_at: Time of the last catalog write, in seconds since the epoch.
+
+	Returns:
+		A 304 response to return as-is, or None to build the full response.
+	"""
+
+	headers = conditional.validators(etag, updated_at)
+	if conditional.is_fresh(request.headers.get("if-none-match"), etag):
+		return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+	response.headers.update(headers)
+	return None
+
+
+@app.exception_handler(hashing.HasherBusyError)
+async def hasher_busy_handler(_: Request, exc: hashing.HasherBusyError) -> JSONResponse:
+	"""Shed auth requests while the password hashing queue is full.
+
+	Args:
+		_: The request that could not be admitted.
+		exc: The busy error raised by the hasher.
+
+	Returns:
+		A 503 response telling the client when to retry.
+	"""
+
+	return JSONResponse(
+		status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+		content={"detail": str(exc)},
+		headers={"Retry-After": str(exc.retry_after_seconds)},
+	)
+
+
+@app.exception_handler(idempotency.InvalidIdempotencyKey)
+@app.exception_handler(idempotency.IdempotencyKeyReused)
+@app.exception_handler(idempotency.IdempotencyInProgress)
+@app.exception_handler(idempotency.IdempotencyStoreFull)
+async def idempotency_error_handler(_: Request, exc: Exception) -> JSONResponse:
+	"""Reject keyed requests that cannot be executed or replayed.
+
+	Args:
+		_: The rejected request.
+		exc: The error raised while claiming the Idempotency-Key.
+
+	Returns:
+		400 for a malformed key, 422 for a key reused with a different body,
+		503 while the store has no room for a new key and 409 while another
+		worker still holds the key.
+	"""
+
+	if isinstance(exc, idempotency.InvalidIdempotencyKey):
+		status_code = status.HTTP_400_BAD_REQUEST
+	elif isinstance(exc, idempotency.IdempotencyKeyReused):
+		status_code = status.HTTP_422_UNPROCESSABLE_CONTENT
+	elif isinstance(exc, idempotency.IdempotencyStoreFull):
+		status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+	else:
+		status_code = status.HTTP_409_CONFLICT
+	return JSONResponse(status_code=status_code, content={"detail": str(exc)})
 
 
 @app.post("/api/auth/register", response_model=schemas.UserOut, status_code=status.HTTP_201_CREATED)
-def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)) -> schemas.UserOut:
+async def register_user(user_in: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)) -> schemas.UserOut:
 	"""Persist a new user account and return its public representation.
 
+	The password is hashed on the dedicated hashing pool so a burst of
+	registrations cannot starve the request threadpool.
+
 	Args:
 		user_in: Incoming registration payload containing email and password.
-		db: Database session provided by FastAPI's dependency system.
+		db: Async database session provided by FastAPI's dependency system.
 
 	Returns:
 		The newly created user model serialized as a response schema.
 
 	Raises:
 		HTTPException: If the email is already registered.
+		hashing.HasherBusyError: If the hashing queue is full (served as 503).
 	"""
 
+	if await async_crud.get_user_by_email(db, user_in.email) is not None:
+		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+	hashed_password = await hashing.hasher.hash(user_in.password)
 	try:
-		user = crud.create_user(db, user_in, role=user_in.role)
+		user = await async_crud.create_user(db, user_in, role=user_in.role, hashed_password=hashed_password)
 	except ValueError as exc:
 		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 	return user
 
 
 @app.post("/api/auth/login")
-def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)) -> dict[str, str]:
+async def login_user(
+	form_data: OAuth2PasswordRequestForm = Depends(),
+	db: AsyncSession = Depends(get_async_db),
+) -> dict[str, str]:
 	"""Authenticate a user and issue a JWT access token.
 
 	Args:
 		form_data: OAuth2-compatible form containing username and password.
-		db: Database session injected by FastAPI.
+		db: Async database session injected by FastAPI.
 
 	Returns:
 		A dictionary containing the access token and token type for the client.
+
+	Raises:
+		HTTPException: If the credentials are invalid.
+		hashing.HasherBusyError: If the hashing queue is full (served as 503).
 	"""
 
 	credentials_error = HTTPException(
@@ -81,10 +221,10 @@ def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = D
 		detail="Invalid credentials",
 		headers={"WWW-Authenticate": "Bearer"},
 	)
-	user = crud.get_user_by_email(db, form_data.username)
+	user = await async_crud.get_user_by_email(db, form_data.username)
 	if user is None:
 		raise credentials_error
-	if not security.verify_password(form_data.password, user.hashed_password):
+	if not await hashing.hasher.verify(form_data.password, user.hashed_password):
 		raise credentials_error
 
 	token = security.create_access_token({"sub": user.email})
@@ -106,18 +246,60 @@ def get_current_user_info(
 	return current_user
 
 
+def _is_admin_token(token: str | None, db: Session) -> bool:
+	"""Check whether a WebSocket client's token belongs to an admin.
+
+	Runs on a worker thread, since resolving the principal may query the
+	database through the sync session, which is closed afterwards.
+
+	Args:
+		token: Bearer token from the ``token`` query parameter, if any.
+		db: Database session used to resolve the user.
+
+	Returns:
+		True if the token is valid and its user is an admin.
+	"""
+
+	try:
+		return token is not None and security.get_current_user(token, db).role == "admin"
+	except HTTPException:
+		return False
+	finally:
+		db.close()
+
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, token: str | None = None, db: Session = Depends(get_db)):
 	"""WebSocket endpoint for real-time updates.
 	
 	Clients connect to this endpoint to receive real-time notifications
 	about changes to sweets (create, update, delete, purchase, restock).
+	Until a client subscribes it receives every public event. Clients can
+	narrow that by sending JSON such as
+	``{"action": "subscribe", "topics": ["sweet:3", "category:Fudge"], "fields": ["quantity"]}``
+	or ``{"action": "unsubscribe", "topics": [...]}``. The "admin" topic
+	requires an admin bearer token passed as the ``token`` query parameter.
 	"""
+	is_admin = await asyncio.to_thread(_is_admin_token, token, db)
+
 	await manager.connect(websocket)
 	try:
 		while True:
-			# Keep connection alive and wait for messages
-			await websocket.receive_text()
+			try:
+				request = json.loads(await websocket.receive_text())
+				action, topics = request["action"], request.get("topics", [])
+				if action == "subscribe":
+					if "admin" in topics and not is_admin:
+						raise ValueError("The admin topic requires an admin token")
+					subscribed = manager.subscribe(websocket, topics, request.get("fields"))
+				elif action == "unsubscribe":
+					subscribed = manager.unsubscribe(websocket, topics)
+				else:
+					raise ValueError(f"Unknown action: {action!r}")
+			except (ValueError, KeyError, TypeError) as exc:
+				manager.send(websocket, {"type": "error", "detail": str(exc)})
+			else:
+				manager.send(websocket, {"type": "subscriptions", "topics": subscribed})
 	except WebSocketDisconnect:
 		manager.disconnect(websocket)
 
@@ -139,131 +321,326 @@ def read_current_user(current_user: models.User = Depends(security.get_current_u
 @app.post("/api/sweets", response_model=schemas.Sweet, status_code=status.HTTP_201_CREATED)
 async def create_sweet(
 	sweet_in: schemas.SweetCreate,
-	db: Session = Depends(get_db),
+	db: AsyncSession = Depends(get_async_db),
 	current_user: models.User = Depends(security.require_admin),
-) -> models.Sweet:
+) -> Response:
 	"""Persist a new sweet and associate it with the authenticated user.
 	
 	Admin access required.
 
 	Args:
 		sweet_in: Validated payload describing the sweet to create.
-		db: Database session injected by FastAPI.
+		db: Async database session injected by FastAPI.
 		current_user: The authenticated admin user initiating the request.
 
 	Returns:
 		The persisted sweet model serialized via response schema.
 	"""
 
-	sweet = crud.create_sweet(db, sweet_in, owner_id=current_user.id)
+	created = await async_crud.create_sweet(db, sweet_in, owner_id=current_user.id)
+	catalog_cache.invalidate(created.id)
+	sweet = schemas.Sweet.model_validate(created)
 	
 	# Broadcast the new sweet to all connected clients
 	await manager.broadcast({
 		"type": "sweet_created",
-		"data": schemas.Sweet.model_validate(sweet).model_dump()
+		"data": sweet
 	})
 	
-	return sweet
+	return fast_json.respond(sweet, status_code=status.HTTP_201_CREATED)
+
+
+def _report_unknown_ids(
+	batch: list[tuple[int, schemas.SweetImportRow]],
+	unknown: set[int],
+	errors: list[schemas.BulkImportError],
+) -> int:
+	"""Record an error for every imported row whose id matched no sweet.
+
+	Args:
+		batch: The batch's rows with their row numbers.
+		unknown: Ids the batch's upsert skipped.
+		errors: Report being built, appended to up to its cap.
+
+	Returns:
+		The number of rows that failed.
+	"""
+
+	failed = 0
+	for row_number, row in batch:
+		if row.id in unknown:
+			failed += 1
+			if len(errors) < bulk_import.MAX_REPORTED_ERRORS:
+				errors.append(schemas.BulkImportError(row=row_number, errors=[f"id: no sweet with id {row.id}"]))
+	return failed
+
+
+@app.post("/api/sweets/bulk", response_model=schemas.BulkImportResult)
+async def bulk_import_sweets(
+	request: Request,
+	db: AsyncSession = Depends(get_async_db),
+	current_user: models.User = Depends(security.require_admin),
+) -> schemas.BulkImportResult:
+	"""Import many sweets from an NDJSON or CSV request body.
 
+	Admin access required. Rows are validated as they stream in and written in
+	batched upserts; invalid rows, and rows naming an id that matches no
+	sweet, are reported without aborting the import.
+
+	Args:
+		request: Incoming request whose body holds the rows to import.
+		db: Async database session injected by FastAPI.
+		current_user: The authenticated admin user performing the import.
+
+	Returns:
+		Counts of received, imported and failed rows plus per-row errors.
+	"""
+
+	fmt = bulk_import.detect_format(request.headers.get("content-type"))
+	received = imported = failed = 0
+	errors: list[schemas.BulkImportError] = []
+	batch: list[tuple[int, schemas.SweetImportRow]] = []
+
+	async for row_number, row, row_errors in bulk_import.iter_rows(bulk_import.iter_lines(request.stream()), fmt):
+		received += 1
+		if row is None:
+			failed += 1
+			if len(errors) < bulk_import.MAX_REPORTED_ERRORS:
+				errors.append(schemas.BulkImportError(row=row_number, errors=row_errors))
+			continue
+		batch.append((row_number, row))
+		if len(batch) >= bulk_import.BATCH_SIZE:
+			written, unknown = await async_crud.upsert_sweets(db, [row for _, row in batch], owner_id=current_user.id)
+			imported += written
+			failed += _report_unknown_ids(batch, unknown, errors)
+			batch = []
+	written, unknown = await async_crud.upsert_sweets(db, [row for _, row in batch], owner_id=current_user.id)
+	imported += written
+	failed += _report_unknown_ids(batch, unknown, errors)
+	errors.sort(key=lambda error: error.row)
+	catalog_cache.invalidate()
+
+	# Broadcast one summary instead of a message per imported row
+	if imported:
+		await manager.broadcast({
+			"type": "catalog_bulk_changed",
+			"data": {"imported": imported}
+		})
+
+	return schemas.BulkImportResult(received=received, imported=imported, failed=failed, errors=errors)
 
 
 @app.get("/api/sweets", response_model=list[schemas.Sweet])
 def list_sweets(
+	request: Request,
+	response: Response,
 	skip: int = 0,
 	limit: int = 100,
+	cursor: str | None = None,
+	sort: SweetSort = "id",
 	db: Session = Depends(get_db),
 	current_user: models.User = Depends(security.get_current_user),
-) -> list[models.Sweet]:
+) -> Response:
 	"""Return all sweets in the system with optional pagination.
 
+	When another page is available its cursor is returned in the
+	``X-Next-Cursor`` response header. Responses carry an ETag for the
+	catalog version; a matching ``If-None-Match`` gets a 304.
+
 	Args:
+		request: The incoming request, checked for ``If-None-Match``.
+		response: Outgoing response used to carry the next-page cursor.
 		skip: Number of records to omit from the start of the result set.
-		limit: Maximum number of sweets to return.
+		limit: Maximum number of sweets to return, capped at 100.
+		cursor: Opaque cursor from a previous page's ``X-Next-Cursor`` header.
+		sort: Sort key, one of "id", "name" or "price".
 		db: Database session supplied by FastAPI's dependency injection.
 		current_user: The authenticated user initiating the request.
 
 	Returns:
-		A list of all sweets persisted in the system.
+		A page of sweets ordered by the sort key and then by id.
 	"""
 
-	return crud.get_sweets(db, skip=skip, limit=limit)
+	state = crud.get_catalog_state(db)
+	not_modified = _not_modified(request, response, conditional.catalog_etag(state.version), state.updated_at)
+	if not_modified is not None:
+		return not_modified
+
+	limit = pagination.clamp_limit(limit)
+	sweets, next_cursor = catalog_cache.get_sweets(
+		db, skip=skip, limit=limit, sort=sort, after=_decode_cursor(cursor, sort), version=state.version
+	)
+	if next_cursor is not None:
+		response.headers["X-Next-Cursor"] = next_cursor
+	return fast_json.respond(sweets, response)
 
 
 @app.get("/api/sweets/search", response_model=list[schemas.Sweet])
 def search_sweets(
+	request: Request,
+	response: Response,
 	name: str | None = None,
 	category: str | None = None,
 	min_price: float | None = None,
 	max_price: float | None = None,
+	limit: int = 100,
+	cursor: str | None = None,
+	sort: SearchSort | None = None,
 	db: Session = Depends(get_db),
 	current_user: models.User = Depends(security.get_current_user),
-) -> list[models.Sweet]:
+) -> Response:
 	"""Search sweets using optional filters for name, category, or price range.
 
+	Results are paginated and revalidated like ``GET /api/sweets``. Name
+	searches match word prefixes through the full-text index and default to
+	relevance order. Relevance cursors carry the last row's bm25 score, which
+	depends on the whole catalog: pages stay consistent while the catalog is
+	unchanged, but after a write the next page may repeat or skip rows.
+
 	Args:
-		name: Optional name fragment to match (case-insensitive).
+		request: The incoming request, checked for ``If-None-Match``.
+		response: Outgoing response used to carry the next-page cursor.
+		name: Optional name words to match as prefixes (case-insensitive).
 		category: Optional category to filter by.
 		min_price: Optional lower bound for the sweet price.
 		max_price: Optional upper bound for the sweet price.
+		limit: Maximum number of sweets to return, capped at 100.
+		cursor: Opaque cursor from a previous page's ``X-Next-Cursor`` header.
+		sort: Sort key, one of "id", "name", "price" or "relevance". Defaults to
+			"relevance" when a name is given and "id" otherwise.
 		db: Database session injected via dependency.
 		current_user: The authenticated user initiating the request.
 
 	Returns:
-		A list of sweets that satisfy the supplied filters.
+		A page of sweets that satisfy the supplied filters.
 	"""
 
-	return crud.search_sweets(
+	state = crud.get_catalog_state(db)
+	not_modified = _not_modified(request, response, conditional.catalog_etag(state.version), state.updated_at)
+	if not_modified is not None:
+		return not_modified
+
+	if sort is None or (sort == "relevance" and not name):
+		sort = "relevance" if name else "id"
+	limit = pagination.clamp_limit(limit)
+	sweets, next_cursor = catalog_cache.search_sweets(
 		db,
 		name=name,
 		category=category,
 		min_price=min_price,
 		max_price=max_price,
+		limit=limit,
+		sort=sort,
+		after=_decode_cursor(cursor, sort),
+		version=state.version,
 	)
+	if next_cursor is not None:
+		response.headers["X-Next-Cursor"] = next_cursor
+	return fast_json.respond(sweets, response)
+
+
+@app.get("/api/sweets/low-stock", response_model=list[schemas.Sweet])
+def list_low_stock(
+	request: Request,
+	response: Response,
+	limit: int = 100,
+	db: Session = Depends(get_db),
+	current_user: models.User = Depends(security.require_admin),
+) -> Response:
+	"""List the sweets at or below their reorder threshold, emptiest first.
+
+	Admin access required. Revalidated with the catalog ETag like
+	``GET /api/sweets``. Registered before ``/api/sweets/{sweet_id}`` so the
+	path is not parsed as an id.
+
+	Args:
+		request: The incoming request, checked for ``If-None-Match``.
+		response: Outgoing response carrying the validators.
+		limit: Maximum number of sweets to return, capped at 100.
+		db: Database session injected via dependency.
+		current_user: The authenticated admin user requesting the list.
+
+	Returns:
+		The low-stock sweets.
+	"""
+
+	state = crud.get_catalog_state(db)
+	not_modified = _not_modified(request, response, conditional.catalog_etag(state.version), state.updated_at)
+	if not_modified is not None:
+		return not_modified
+
+	sweets = crud.get_low_stock(db, limit=pagination.clamp_limit(limit))
+	return fast_json.respond([schemas.Sweet.model_validate(sweet) for sweet in sweets], response)
 
 
 @app.put("/api/sweets/{sweet_id}", response_model=schemas.Sweet)
 async def update_sweet(
 	sweet_id: int,
 	sweet_update: schemas.SweetUpdate,
-	db: Session = Depends(get_db),
+	response: Response,
+	expected_version: int | None = None,
+	if_match: str | None = Header(default=None),
+	db: AsyncSession = Depends(get_async_db),
 	current_user: models.User = Depends(security.require_admin),
-) -> schemas.Sweet:
+) -> Response:
 	"""Update an existing sweet.
 	
-	Admin access required.
+	Admin access required. Pass the version last read, either as
+	``expected_version`` or as the sweet's ETag in ``If-Match``. The update
+	then only applies if nobody else changed the sweet in the meantime.
 
 	Args:
 		sweet_id: Identifier of the sweet to modify.
 		sweet_update: Payload specifying fields and values to update.
-		db: Database session injected by FastAPI.
+		response: Outgoing response that receives the new ETag.
+		expected_version: Optional version the client expects to overwrite.
+		if_match: Optional ETag the client expects to overwrite.
+		db: Async database session injected by FastAPI.
 		current_user: The authenticated admin user performing the update.
 
 	Returns:
 		The updated sweet serialized via the response schema.
 
 	Raises:
-		HTTPException: If the sweet does not exist.
+		HTTPException: If the sweet does not exist, if the preconditions are
+			malformed or disagree, or if the sweet's version has moved on.
 	"""
 
-	sweet = crud.get_sweet(db, sweet_id)
-	if sweet is None:
+	if if_match is not None:
+		try:
+			header_version = conditional.parse_sweet_etag(if_match, sweet_id)
+		except ValueError as exc:
+			raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+		if expected_version is not None and header_version not in (None, expected_version):
+			raise HTTPException(
+				status_code=status.HTTP_400_BAD_REQUEST, detail="If-Match and expected_version disagree"
+			)
+		expected_version = expected_version if header_version is None else header_version
+
+	updated = await async_crud.update_sweet(db, sweet_id, sweet_update, expected_version)
+	if updated is None:
 		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sweet not found")
-
-	updated = crud.update_sweet(db, sweet_id, sweet_update)
-	assert updated is not None
+	if updated == crud.VERSION_CONFLICT:
+		raise HTTPException(
+			status_code=status.HTTP_409_CONFLICT,
+			detail="Sweet was modified by another request; reload it and retry",
+		)
+	catalog_cache.invalidate(sweet_id)
+	response.headers["ETag"] = conditional.sweet_etag(sweet_id, updated.version)
+	sweet = schemas.Sweet.model_validate(updated)
 	
 	# Broadcast the updated sweet to all connected clients
 	await manager.broadcast({
 		"type": "sweet_updated",
-		"data": schemas.Sweet.model_validate(updated).model_dump()
+		"data": sweet
 	})
 	
-	return updated
+	return fast_json.respond(sweet, response)
 
 @app.delete("/api/sweets/{sweet_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_sweet(
 	sweet_id: int,
-	db: Session = Depends(get_db),
+	db: AsyncSession = Depends(get_async_db),
 	current_user: models.User = Depends(security.require_admin),
 ) -> None:
 	"""Delete a sweet from the system.
@@ -272,18 +649,19 @@ async def delete_sweet(
 
 	Args:
 		sweet_id: Identifier of the sweet to remove.
-		db: Database session injected by FastAPI.
+		db: Async database session injected by FastAPI.
 		current_user: The authenticated admin user performing the deletion.
 
 	Raises:
 		HTTPException: If the sweet does not exist.
 	"""
 
-	sweet = crud.get_sweet(db, sweet_id)
+	sweet = await async_crud.get_sweet(db, sweet_id)
 	if sweet is None:
 		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sweet not found")
 
-	crud.delete_sweet(db, sweet_id)
+	await async_crud.delete_sweet(db, sweet_id)
+	catalog_cache.invalidate(sweet_id)
 	
 	# Broadcast the deletion to all connected clients
 	await manager.broadcast({
@@ -295,13 +673,20 @@ async def delete_sweet(
 @app.get("/api/sweets/{sweet_id}", response_model=schemas.Sweet)
 def get_sweet(
 	sweet_id: int,
+	request: Request,
+	response: Response,
 	db: Session = Depends(get_db),
 	current_user: models.User = Depends(security.get_current_user),
-) -> schemas.Sweet:
+) -> Response:
 	"""Retrieve a sweet by its ID.
 
+	The response carries an ETag for the sweet's row version; a matching
+	``If-None-Match`` gets a 304.
+
 	Args:
 		sweet_id: Identifier of the sweet to fetch.
+		request: The incoming request, checked for ``If-None-Match``.
+		response: Outgoing response that receives the caching headers.
 		db: Database session supplied by FastAPI.
 		current_user: The authenticated user requesting the sweet.
 
@@ -312,24 +697,51 @@ def get_sweet(
 		HTTPException: If the sweet does not exist.
 	"""
 
-	sweet = crud.get_sweet(db, sweet_id)
+	state = crud.get_sweet_state(db, sweet_id)
+	if state is None:
+		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sweet not found")
+	not_modified = _not_modified(request, response, conditional.sweet_etag(sweet_id, state.version), state.updated_at)
+	if not_modified is not None:
+		return not_modified
+
+	sweet = catalog_cache.get_sweet(db, sweet_id, version=state.version)
 	if sweet is None:
 		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sweet not found")
 
-	return sweet
+	return fast_json.respond(sweet, response)
+
+
+async def _broadcast_stock_crossings(row: Any, quantity: int, sweet: schemas.Sweet) -> None:
+	"""Notify admins of the stock thresholds a sale crossed.
+
+	Args:
+		row: The sweet row returned by the sale.
+		quantity: Number of units the sale took.
+		sweet: The validated sweet to send as the event's data.
+	"""
+
+	for crossing in crud.stock_crossings(row, quantity):
+		await manager.broadcast({"type": crossing, "data": sweet})
 
 
 @app.post("/api/sweets/{sweet_id}/purchase", response_model=schemas.Sweet)
 async def purchase_sweet(
 	sweet_id: int,
-	db: Session = Depends(get_db),
+	request: Request,
+	idempotency_key: str | None = Header(default=None),
+	db: AsyncSession = Depends(get_async_db),
 	current_user: models.User = Depends(security.get_current_user),
-) -> schemas.Sweet:
+) -> Response:
 	"""Purchase a sweet by reducing its quantity by one.
 
+	A retry carrying the same ``Idempotency-Key`` header replays the first
+	response instead of buying again.
+
 	Args:
 		sweet_id: Identifier of the sweet to purchase.
-		db: Database session provided by FastAPI.
+		request: The incoming request, used to scope the idempotency key.
+		idempotency_key: Optional client-chosen key that makes retries safe.
+		db: Async database session provided by FastAPI.
 		current_user: The authenticated user executing the purchase.
 
 	Returns:
@@ -339,40 +751,49 @@ async def purchase_sweet(
 		HTTPException: If the sweet is not found or if it is out of stock.
 	"""
 
-	sweet = crud.get_sweet(db, sweet_id)
-	if sweet is None:
-		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sweet not found")
+	async with idempotency.guard(request, current_user.id, idempotency_key) as attempt:
+		if attempt.replay is not None:
+			return attempt.replay
 
-	result = crud.purchase_sweet(db, sweet_id)
-	if result is None:
-		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sweet not found")
-	if result == "out_of_stock":
-		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Sweet is out of stock")
+		result = await async_crud.purchase_sweet(db, sweet_id)
+		if result is None:
+			raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sweet not found")
+		if result == crud.OUT_OF_STOCK:
+			raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Sweet is out of stock")
+		catalog_cache.invalidate(sweet_id)
+		sweet = schemas.Sweet.model_validate(result)
+		attempt.save(sweet)
 
-	# Broadcast the purchase to all connected clients
-	await manager.broadcast({
-		"type": "sweet_purchased",
-		"data": schemas.Sweet.model_validate(result).model_dump()
-	})
+		# Broadcast the purchase to all connected clients
+		await manager.broadcast({
+			"type": "sweet_purchased",
+			"data": sweet
+		})
+		await _broadcast_stock_crossings(result, 1, sweet)
 
-	return result
+		return fast_json.respond(sweet)
 
 
 @app.post("/api/sweets/{sweet_id}/restock", response_model=schemas.Sweet)
 async def restock_sweet(
 	sweet_id: int,
 	restock_request: schemas.RestockRequest,
-	db: Session = Depends(get_db),
+	request: Request,
+	idempotency_key: str | None = Header(default=None),
+	db: AsyncSession = Depends(get_async_db),
 	current_user: models.User = Depends(security.require_admin),
-) -> schemas.Sweet:
+) -> Response:
 	"""Restock a sweet in the system.
 	
-	Admin access required.
+	Admin access required. A retry carrying the same ``Idempotency-Key``
+	header replays the first response instead of adding stock twice.
 
 	Args:
 		sweet_id: Identifier of the sweet to restock.
 		restock_request: Payload containing the quantity to add.
-		db: Database session injected by FastAPI.
+		request: The incoming request, used to scope the idempotency key.
+		idempotency_key: Optional client-chosen key that makes retries safe.
+		db: Async database session injected by FastAPI.
 		current_user: The authenticated admin user performing the restock.
 
 	Returns:
@@ -382,18 +803,329 @@ async def restock_sweet(
 		HTTPException: If the sweet does not exist.
 	"""
 
-	sweet = crud.get_sweet(db, sweet_id)
-	if sweet is None:
-		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sweet not found")
+	async with idempotency.guard(request, current_user.id, idempotency_key) as attempt:
+		if attempt.replay is not None:
+			return attempt.replay
 
-	updated = crud.restock_sweet(db, sweet_id, restock_request.quantity)
-	if updated is None:
+		sweet = await async_crud.get_sweet(db, sweet_id)
+		if sweet is None:
+			raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sweet not found")
+
+		updated = await async_crud.restock_sweet(db, sweet_id, restock_request.quantity)
+		if updated is None:
+			raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sweet not found")
+		catalog_cache.invalidate(sweet_id)
+		sweet = schemas.Sweet.model_validate(updated)
+		attempt.save(sweet)
+
+		# Broadcast the restock to all connected clients
+		await manager.broadcast({
+			"type": "sweet_restocked",
+			"data": sweet
+		})
+
+		return fast_json.respond(sweet)
+
+
+@app.post("/api/orders", response_model=schemas.Order, status_code=status.HTTP_201_CREATED)
+async def create_order(
+	order_in: schemas.OrderCreate,
+	request: Request,
+	idempotency_key: str | None = Header(default=None),
+	db: AsyncSession = Depends(get_async_db),
+	current_user: models.User = Depends(security.get_current_user),
+) -> Response:
+	"""Place a multi-item order, reserving stock for every line in one transaction.
+
+	A retry carrying the same ``Idempotency-Key`` header replays the first
+	response instead of placing a second order.
+
+	Args:
+		order_in: Cart of sweet identifiers and quantities to purchase.
+		request: The incoming request, used to scope the idempotency key.
+		idempotency_key: Optional client-chosen key that makes retries safe.
+		db: Async database session provided by FastAPI.
+		current_user: The authenticated user placing the order.
+
+	Returns:
+		The persisted order with its lines.
+
+	Raises:
+		HTTPException: If a sweet is not found or does not have enough stock.
+	"""
+
+	async with idempotency.guard(request, current_user.id, idempotency_key) as attempt:
+		if attempt.replay is not None:
+			return attempt.replay
+
+		try:
+			order, updated = await async_crud.create_order(db, order_in, user_id=current_user.id)
+		except LookupError as exc:
+			raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+		except ValueError as exc:
+			raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+		catalog_cache.invalidate(*(row.id for row in updated))
+		placed = schemas.Order.model_validate(order)
+		attempt.save(placed, status_code=status.HTTP_201_CREATED)
+
+		# Broadcast every affected sweet in a single message
+		sweets = [schemas.Sweet.model_validate(row) for row in updated]
+		await manager.broadcast({
+			"type": "order_placed",
+			"data": {
+				"order_id": order.id,
+				"sweets": sweets,
+			}
+		})
+		# Lines are in the same order as the rows they reserved
+		for line, row, sweet in zip(order.lines, updated, sweets):
+			await _broadcast_stock_crossings(row, line.quantity, sweet)
+
+		return fast_json.respond(placed, status_code=status.HTTP_201_CREATED)
+
+
+@app.get("/api/orders", response_model=list[schemas.Order])
+def list_orders(
+	skip: int = 0,
+	limit: int = 20,
+	db: Session = Depends(get_db),
+	current_user: models.User = Depends(security.get_current_user),
+) -> list[models.Order]:
+	"""Return the authenticated user's order history, most recent first.
+
+	Args:
+		skip: Number of orders to omit from the most recent one.
+		limit: Maximum number of orders to return, capped at 100.
+		db: Database session supplied by FastAPI's dependency injection.
+		current_user: The authenticated user whose orders are listed.
+
+	Returns:
+		A page of the user's orders.
+	"""
+
+	return crud.get_orders(db, current_user.id, skip=skip, limit=min(limit, 100))
+
+
+@app.get("/api/admin/cache")
+def read_cache_stats(
+	current_user: models.User = Depends(security.require_admin),
+) -> dict[str, dict[str, int]]:
+	"""Report hit, miss and eviction counters of the catalog cache.
+
+	Admin access required.
+
+	Args:
+		current_user: The authenticated admin user requesting the stats.
+
+	Returns:
+		Counters for the single-sweet and list/search page caches.
+	"""
+
+	return catalog_cache.stats()
+
+
+@app.get("/api/admin/ws")
+def read_broadcast_stats(
+	current_user: models.User = Depends(security.require_admin),
+) -> dict[str, int]:
+	"""Report this worker's WebSocket broadcast counters.
+
+	Admin access required.
+
+	Args:
+		current_user: The authenticated admin user requesting the stats.
+
+	Returns:
+		Events in, messages and bytes out after coalescing, and connection counts.
+	"""
+
+	return manager.stats()
+
+
+@app.put("/api/admin/categories/{category}/reorder-threshold", response_model=schemas.CategoryThreshold)
+def set_category_threshold(
+	category: str,
+	threshold: schemas.ReorderThresholdUpdate,
+	db: Session = Depends(get_db),
+	current_user: models.User = Depends(security.require_admin),
+) -> models.CategoryThreshold:
+	"""Set the default reorder threshold of a category.
+
+	Admin access required. Sweets of the category without their own
+	threshold use it from now on.
+
+	Args:
+		category: Category to configure.
+		threshold: Payload carrying the new default.
+		db: Database session supplied by FastAPI.
+		current_user: The authenticated admin user making the change.
+
+	Returns:
+		The stored category threshold.
+	"""
+
+	stored = crud.set_category_threshold(db, category, threshold.reorder_threshold)
+	catalog_cache.invalidate()
+	return stored
+
+
+@app.delete("/api/admin/categories/{category}/reorder-threshold", status_code=status.HTTP_204_NO_CONTENT)
+def delete_category_threshold(
+	category: str,
+	db: Session = Depends(get_db),
+	current_user: models.User = Depends(security.require_admin),
+) -> None:
+	"""Remove a category's default reorder threshold.
+
+	Admin access required. Sweets of the category without their own
+	threshold revert to the global default.
+
+	Args:
+		category: Category whose default to remove.
+		db: Database session supplied by FastAPI.
+		current_user: The authenticated admin user making the change.
+
+	Raises:
+		HTTPException: If the category has no default threshold.
+	"""
+
+	if not crud.delete_category_threshold(db, category):
+		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category has no reorder threshold")
+	catalog_cache.invalidate()
+
+
+def _as_utc(moment: datetime) -> datetime:
+	"""Treat a naive datetime from a query parameter as UTC."""
+
+	return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment
+
+
+@app.get("/api/admin/inventory/{sweet_id}", response_model=schemas.StockLevel)
+def read_stock_level(
+	sweet_id: int,
+	at: datetime | None = None,
+	db: Session = Depends(get_db),
+	current_user: models.User = Depends(security.require_admin),
+) -> schemas.StockLevel:
+	"""Reconstruct a sweet's stock at a point in time from the inventory ledger.
+
+	Admin access required.
+
+	Args:
+		sweet_id: Identifier of the sweet to audit.
+		at: Point in time to reconstruct; naive values are UTC. Defaults to now.
+		db: Database session supplied by FastAPI.
+		current_user: The authenticated admin user requesting the audit.
+
+	Returns:
+		The sweet's stock level at the requested time.
+
+	Raises:
+		HTTPException: If the ledger has no record of the sweet, or if the
+			requested time precedes the retained history.
+	"""
+
+	at = datetime.now(timezone.utc) if at is None else _as_utc(at)
+	try:
+		quantity = inventory_ledger.stock_at(db, sweet_id, at.timestamp())
+	except ValueError as exc:
+		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+	if quantity is None:
 		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sweet not found")
+	return schemas.StockLevel(sweet_id=sweet_id, quantity=quantity, at=at)
 
-	# Broadcast the restock to all connected clients
-	await manager.broadcast({
-		"type": "sweet_restocked",
-		"data": schemas.Sweet.model_validate(updated).model_dump()
-	})
 
-	return updated
+SalesGranularity = Literal["hour", "day"]
+# Range of a sales report when the client gives no start
+DEFAULT_REPORT_DAYS = 30
+
+
+def _sales_report(
+	db: Session,
+	group_by: str,
+	start: datetime | None,
+	end: datetime | None,
+	granularity: str,
+	key: str | int | None,
+) -> Response:
+	"""Build a sales report response for the analytics routes.
+
+	Args:
+		db: Database session supplied by FastAPI.
+		group_by: "category" or "sweet".
+		start: Start of the range; naive values are UTC. Defaults to
+			``DEFAULT_REPORT_DAYS`` before ``end``.
+		end: End of the range; naive values are UTC. Defaults to now.
+		granularity: "hour" or "day".
+		key: Restrict the report to one category or sweet.
+
+	Returns:
+		The encoded report.
+
+	Raises:
+		HTTPException: If the range is empty or too long for the granularity.
+	"""
+
+	end = datetime.now(timezone.utc) if end is None else _as_utc(end)
+	start = end - timedelta(days=DEFAULT_REPORT_DAYS) if start is None else _as_utc(start)
+	try:
+		report = analytics.sales_report(db, group_by, start.timestamp(), end.timestamp(), granularity, key)
+	except ValueError as exc:
+		raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+	return fast_json.respond(report)
+
+
+@app.get("/api/admin/analytics/sales/categories", response_model=schemas.SalesReport)
+def read_category_sales(
+	start: datetime | None = None,
+	end: datetime | None = None,
+	granularity: SalesGranularity = "day",
+	category: str | None = None,
+	db: Session = Depends(get_db),
+	current_user: models.User = Depends(security.require_admin),
+) -> Response:
+	"""Report units sold and revenue per category over a time range.
+
+	Admin access required.
+
+	Args:
+		start: Start of the range; defaults to 30 days before ``end``.
+		end: End of the range (exclusive); defaults to now.
+		granularity: Bucket size, "hour" or "day" (UTC days).
+		category: Restrict the report to one category.
+		db: Database session supplied by FastAPI.
+		current_user: The authenticated admin user requesting the report.
+
+	Returns:
+		One series of per-bucket sales for each category that sold in the range.
+	"""
+
+	return _sales_report(db, "category", start, end, granularity, category)
+
+
+@app.get("/api/admin/analytics/sales/sweets", response_model=schemas.SalesReport)
+def read_sweet_sales(
+	start: datetime | None = None,
+	end: datetime | None = None,
+	granularity: SalesGranularity = "day",
+	sweet_id: int | None = None,
+	db: Session = Depends(get_db),
+	current_user: models.User = Depends(security.require_admin),
+) -> Response:
+	"""Report units sold and revenue per sweet over a time range.
+
+	Admin access required.
+
+	Args:
+		start: Start of the range; defaults to 30 days before ``end``.
+		end: End of the range (exclusive); defaults to now.
+		granularity: Bucket size, "hour" or "day" (UTC days).
+		sweet_id: Restrict the report to one sweet.
+		db: Database session supplied by FastAPI.
+		current_user: The authenticated admin user requesting the report.
+
+	Returns:
+		One series of per-bucket sales for each sweet that sold in the range.
+	"""
+
+	return _sales_report(db, "sweet", start, end, granularity, sweet_id)
@@ -0,0 +1,359 @@
+"""Versioned schema migrations tracked in SQLite's ``PRAGMA user_version``.
+
+Each :class:`Migration` is a frozen list of explicit DDL statements. Never
+edit one that has shipped; append a new migration instead. :func:`migrate`
+applies the pending ones in order, one transaction per migration, and bumps
+``user_version`` inside that transaction. A database that is already up to
+date costs a single PRAGMA read at startup.
+
+The baseline uses ``IF NOT EXISTS`` throughout, so databases created by the
+old ``drop_all``/``create_all`` startup (user_version 0) are adopted in place.
+``Base.metadata.create_all`` now stamps the latest version itself.
+"""
+
+from dataclasses import dataclass
+
+from sqlalchemy.engine import Engine
+
+
+@dataclass(frozen=True)
+class Migration:
+    """One schema version: the statements that take the previous version to it."""
+
+    version: int
+    description: str
+    statements: tuple[str, ...]
+
+
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(
+        1,
+        "baseline schema: users, sweets with FTS5 name index, orders",
+        (
+            "CREATE TABLE IF NOT EXISTS users ("
+            "id INTEGER NOT NULL, "
+            "email VARCHAR NOT NULL, "
+            "hashed_password VARCHAR NOT NULL, "
+            "role VARCHAR NOT NULL, "
+            "PRIMARY KEY (id))",
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)",
+            "CREATE INDEX IF NOT EXISTS ix_users_id ON users (id)",
+            "CREATE TABLE IF NOT EXISTS sweets ("
+            "id INTEGER NOT NULL, "
+            "name VARCHAR NOT NULL, "
+            "category VARCHAR NOT NULL, "
+            "price FLOAT NOT NULL, "
+            "quantity INTEGER NOT NULL, "
+            "owner_id INTEGER NOT NULL, "
+            "PRIMARY KEY (id), "
+            "FOREIGN KEY(owner_id) REFERENCES users (id))",
+            "CREATE INDEX IF NOT EXISTS ix_sweets_id ON sweets (id)",
+            "CREATE INDEX IF NOT EXISTS ix_sweets_name ON sweets (name)",
+            "CREATE INDEX IF NOT EXISTS ix_sweets_price ON sweets (price)",
+            "CREATE INDEX IF NOT EXISTS ix_sweets_quantity ON sweets (quantity)",
+            "CREATE INDEX IF NOT EXISTS ix_sweets_owner_id ON sweets (owner_id)",
+            "CREATE INDEX IF NOT EXISTS ix_sweets_category_price ON sweets (category, price)",
+            "CREATE VIRTUAL TABLE IF NOT EXISTS sweets_fts USING fts5("
+            "name, content='sweets', content_rowid='id', tokenize='unicode61', prefix='2 3')",
+            "CREATE TRIGGER IF NOT EXISTS sweets_fts_ai AFTER INSERT ON sweets BEGIN "
+            "INSERT INTO sweets_fts(rowid, name) VALUES (new.id, new.name); END",
+            "CREATE TRIGGER IF NOT EXISTS sweets_fts_ad AFTER DELETE ON sweets BEGIN "
+            "INSERT INTO sweets_fts(sweets_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+            "CREATE TRIGGER IF NOT EXISTS sweets_fts_au AFTER UPDATE OF name ON sweets BEGIN "
+            "INSERT INTO sweets_fts(sweets_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+            "INSERT INTO sweets_fts(rowid, name) VALUES (new.id, new.name); END",
+            # Index the sweets of an adopted database, which predate the triggers
+            "INSERT INTO sweets_fts(sweets_fts) VALUES ('rebuild')",
+            "CREATE TABLE IF NOT EXISTS orders ("
+            "id INTEGER NOT NULL, "
+            "user_id INTEGER NOT NULL, "
+            "created_at DATETIME NOT NULL, "
+            "total FLOAT NOT NULL, "
+            "PRIMARY KEY (id), "
+            "FOREIGN KEY(user_id) REFERENCES users (id))",
+            "CREATE INDEX IF NOT EXISTS ix_orders_id ON orders (id)",
+            "CREATE INDEX IF NOT EXISTS ix_orders_user_id_created_at ON orders (user_id, created_at)",
+            "CREATE TABLE IF NOT EXISTS order_lines ("
+            "id INTEGER NOT NULL, "
+            "order_id INTEGER NOT NULL, "
+            "sweet_id INTEGER NOT NULL, "
+            "quantity INTEGER NOT NULL, "
+            "unit_price FLOAT NOT NULL, "
+            "PRIMARY KEY (id), "
+            "FOREIGN KEY(order_id) REFERENCES orders (id), "
+            "FOREIGN KEY(sweet_id) REFERENCES sweets (id))",
+            "CREATE INDEX IF NOT EXISTS ix_order_lines_id ON order_lines (id)",
+            "CREATE INDEX IF NOT EXISTS ix_order_lines_order_id ON order_lines (order_id)",
+        ),
+    ),
+    Migration(
+        2,
+        "idempotency_keys for replaying retried purchases, restocks and orders",
+        (
+            "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+            "scope VARCHAR NOT NULL, "
+            "fingerprint VARCHAR NOT NULL, "
+            "status_code INTEGER, "
+            "body VARCHAR, "
+            "created_at FLOAT NOT NULL, "
+            "PRIMARY KEY (scope))",
+            "CREATE INDEX IF NOT EXISTS ix_idempotency_keys_created_at ON idempotency_keys (created_at)",
+        ),
+    ),
+    Migration(
+        3,
+        "per-row sweet versions and the catalog_state version for ETags",
+        (
+            "ALTER TABLE sweets ADD COLUMN version INTEGER DEFAULT 1 NOT NULL",
+            "CREATE TABLE IF NOT EXISTS catalog_state ("
+            "id INTEGER NOT NULL, "
+            "version INTEGER NOT NULL, "
+            "updated_at FLOAT NOT NULL, "
+            "PRIMARY KEY (id))",
+            "INSERT OR IGNORE INTO catalog_state (id, version, updated_at) "
+            "VALUES (1, 1, (julianday('now') - 2440587.5) * 86400.0)",
+            *(
+                f"CREATE TRIGGER IF NOT EXISTS sweets_catalog_{suffix} AFTER {operation} ON sweets BEGIN "
+                "UPDATE catalog_state SET version = version + 1, "
+                "updated_at = (julianday('now') - 2440587.5) * 86400.0 WHERE id = 1; END"
+                for suffix, operation in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE"))
+            ),
+        ),
+    ),
+    Migration(
+        4,
+        "append-only inventory_movements ledger with inventory_snapshots",
+        (
+            "CREATE TABLE IF NOT EXISTS inventory_movements ("
+            "id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, "
+            "sweet_id INTEGER NOT NULL, "
+            "delta INTEGER NOT NULL, "
+            "created_at FLOAT NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS ix_inventory_movements_sweet_id_created_at "
+            "ON inventory_movements (sweet_id, created_at)",
+            "CREATE TABLE IF NOT EXISTS inventory_snapshots ("
+            "id INTEGER NOT NULL, "
+            "sweet_id INTEGER NOT NULL, "
+            "quantity INTEGER NOT NULL, "
+            "movement_id INTEGER NOT NULL, "
+            "as_of FLOAT NOT NULL, "
+            "PRIMARY KEY (id))",
+            "CREATE INDEX IF NOT EXISTS ix_inventory_snapshots_sweet_id_movement_id "
+            "ON inventory_snapshots (sweet_id, movement_id)",
+            # Existing stock becomes the opening snapshot of each sweet
+            "INSERT INTO inventory_snapshots (sweet_id, quantity, movement_id, as_of) "
+            "SELECT id, quantity, 0, (julianday('now') - 2440587.5) * 86400.0 FROM sweets",
+            "CREATE TRIGGER IF NOT EXISTS sweets_ledger_ai AFTER INSERT ON sweets BEGIN "
+            "INSERT INTO inventory_movements (sweet_id, delta, created_at) "
+            "VALUES (new.id, new.quantity, (julianday('now') - 2440587.5) * 86400.0); END",
+            "CREATE TRIGGER IF NOT EXISTS sweets_ledger_au AFTER UPDATE OF quantity ON sweets "
+            "WHEN new.quantity != old.quantity BEGIN "
+            "INSERT INTO inventory_movements (sweet_id, delta, created_at) "
+            "VALUES (new.id, new.quantity - old.quantity, (julianday('now') - 2440587.5) * 86400.0); END",
+            "CREATE TRIGGER IF NOT EXISTS sweets_ledger_ad AFTER DELETE ON sweets BEGIN "
+            "INSERT INTO inventory_movements (sweet_id, delta, created_at) "
+            "VALUES (old.id, -old.quantity, (julianday('now') - 2440587.5) * 86400.0); END",
+        ),
+    ),
+    Migration(
+        5,
+        "daily sales rollups by category and by sweet",
+        (
+            "CREATE TABLE IF NOT EXISTS sales_by_category ("
+            "day INTEGER NOT NULL, "
+            "category VARCHAR NOT NULL, "
+            "units BLOB NOT NULL, "
+            "revenue BLOB NOT NULL, "
+            "PRIMARY KEY (day, category)) WITHOUT ROWID",
+            "CREATE TABLE IF NOT EXISTS sales_by_sweet ("
+            "day INTEGER NOT NULL, "
+            "sweet_id INTEGER NOT NULL, "
+            "units BLOB NOT NULL, "
+            "revenue BLOB NOT NULL, "
+            "PRIMARY KEY (day, sweet_id)) WITHOUT ROWID",
+        ),
+    ),
+    Migration(
+        6,
+        "reorder thresholds per sweet and per category, partial low-stock index",
+        (
+            "ALTER TABLE sweets ADD COLUMN reorder_threshold INTEGER",
+            "ALTER TABLE sweets ADD COLUMN effective_reorder_threshold INTEGER DEFAULT 5 NOT NULL",
+            "CREATE TABLE IF NOT EXISTS category_thresholds ("
+            "category VARCHAR NOT NULL, "
+            "reorder_threshold INTEGER NOT NULL, "
+            "PRIMARY KEY (category))",
+            "CREATE INDEX IF NOT EXISTS ix_sweets_low_stock ON sweets (quantity) "
+            "WHERE quantity <= effective_reorder_threshold",
+            "CREATE TRIGGER IF NOT EXISTS sweets_threshold_ai AFTER INSERT ON sweets "
+            "WHEN new.effective_reorder_threshold IS NOT COALESCE(new.reorder_threshold, "
+            "(SELECT reorder_threshold FROM category_thresholds WHERE category = new.category), 5) BEGIN "
+            "UPDATE sweets SET effective_reorder_threshold = COALESCE(new.reorder_threshold, "
+            "(SELECT reorder_threshold FROM category_thresholds WHERE category = new.category), 5) "
+            "WHERE id = new.id; END",
+            "CREATE TRIGGER IF NOT EXISTS sweets_threshold_au AFTER UPDATE OF category, reorder_threshold ON sweets "
+            "WHEN new.effective_reorder_threshold IS NOT COALESCE(new.reorder_threshold, "
+            "(SELECT reorder_threshold FROM category_thresholds WHERE category = new.category), 5) BEGIN "
+            "UPDATE sweets SET effective_reorder_threshold = COALESCE(new.reorder_threshold, "
+            "(SELECT reorder_threshold FROM category_thresholds WHERE category = new.category), 5) "
+            "WHERE id = new.id; END",
+            "CREATE TRIGGER IF NOT EXISTS category_thresholds_ai AFTER INSERT ON category_thresholds BEGIN "
+            "UPDATE sweets SET effective_reorder_threshold = new.reorder_threshold, version = version + 1 "
+            "WHERE category = new.category AND reorder_threshold IS NULL "
+            "AND effective_reorder_threshold != new.reorder_threshold; END",
+            "CREATE TRIGGER IF NOT EXISTS category_thresholds_au AFTER UPDATE ON category_thresholds BEGIN "
+            "UPDATE sweets SET effective_reorder_threshold = new.reorder_threshold, version = version + 1 "
+            "WHERE category = new.category AND reorder_threshold IS NULL "
+            "AND effective_reorder_threshold != new.reorder_threshold; END",
+            "CREATE TRIGGER IF NOT EXISTS category_thresholds_ad AFTER DELETE ON category_thresholds BEGIN "
+            "UPDATE sweets SET effective_reorder_threshold = 5, version = version + 1 "
+            "WHERE category = old.category AND reorder_threshold IS NULL "
+            "AND effective_reorder_threshold != 5; END",
+        ),
+    ),
+    Migration(
+        7,
+        "rebuild sweets with AUTOINCREMENT so deleted ids, and their ETags, are never reused",
+        (
+            "CREATE TABLE sweets_autoincrement ("
+            "id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, "
+            "name VARCHAR NOT NULL, "
+            "category VARCHAR NOT NULL, "
+            "price FLOAT NOT NULL, "
+            "quantity INTEGER NOT NULL, "
+            "owner_id INTEGER NOT NULL, "
+            "version INTEGER DEFAULT 1 NOT NULL, "
+            "reorder_threshold INTEGER, "
+            "effective_reorder_threshold INTEGER DEFAULT 5 NOT NULL, "
+            "FOREIGN KEY(owner_id) REFERENCES users (id))",
+            "INSERT INTO sweets_autoincrement (id, name, category, price, quantity, owner_id, version, "
+            "reorder_threshold, effective_reorder_threshold) "
+            "SELECT id, name, category, price, quantity, owner_id, version, "
+            "reorder_threshold, effective_reorder_threshold FROM sweets",
+            # Dropping the table drops its indexes and triggers without firing
+            # any. The rename refuses while other triggers name a missing sweets.
+            *(f"DROP TRIGGER category_thresholds_{suffix}" for suffix in ("ai", "au", "ad")),
+            "DROP TABLE sweets",
+            "ALTER TABLE sweets_autoincrement RENAME TO sweets",
+            "CREATE INDEX IF NOT EXISTS ix_sweets_id ON sweets (id)",
+            "CREATE INDEX IF NOT EXISTS ix_sweets_name ON sweets (name)",
+            "CREATE INDEX IF NOT EXISTS ix_sweets_price ON sweets (price)",
+            "CREATE INDEX IF NOT EXISTS ix_sweets_quantity ON sweets (quantity)",
+            "CREATE INDEX IF NOT EXISTS ix_sweets_owner_id ON sweets (owner_id)",
+            "CREATE INDEX IF NOT EXISTS ix_sweets_category_price ON sweets (category, price)",
+            "CREATE INDEX IF NOT EXISTS ix_sweets_low_stock ON sweets (quantity) "
+            "WHERE quantity <= effective_reorder_threshold",
+            "CREATE TRIGGER IF NOT EXISTS sweets_fts_ai AFTER INSERT ON sweets BEGIN "
+            "INSERT INTO sweets_fts(rowid, name) VALUES (new.id, new.name); END",
+            "CREATE TRIGGER IF NOT EXISTS sweets_fts_ad AFTER DELETE ON sweets BEGIN "
+            "INSERT INTO sweets_fts(sweets_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+            "CREATE TRIGGER IF NOT EXISTS sweets_fts_au AFTER UPDATE OF name ON sweets BEGIN "
+            "INSERT INTO sweets_fts(sweets_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+            "INSERT INTO sweets_fts(rowid, name) VALUES (new.id, new.name); END",
+            *(
+                f"CREATE TRIGGER IF NOT EXISTS sweets_catalog_{suffix} AFTER {operation} ON sweets BEGIN "
+                "UPDATE catalog_state SET version = version + 1, "
+                "updated_at = (julianday('now') - 2440587.5) * 86400.0 WHERE id = 1; END"
+                for suffix, operation in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE"))
+            ),
+            "CREATE TRIGGER IF NOT EXISTS sweets_ledger_ai AFTER INSERT ON sweets BEGIN "
+            "INSERT INTO inventory_movements (sweet_id, delta, created_at) "
+            "VALUES (new.id, new.quantity, (julianday('now') - 2440587.5) * 86400.0); END",
+            "CREATE TRIGGER IF NOT EXISTS sweets_ledger_au AFTER UPDATE OF quantity ON sweets "
+            "WHEN new.quantity != old.quantity BEGIN "
+            "INSERT INTO inventory_movements (sweet_id, delta, created_at) "
+            "VALUES (new.id, new.quantity - old.quantity, (julianday('now') - 2440587.5) * 86400.0); END",
+            "CREATE TRIGGER IF NOT EXISTS sweets_ledger_ad AFTER DELETE ON sweets BEGIN "
+            "INSERT INTO inventory_movements (sweet_id, delta, created_at) "
+            "VALUES (old.id, -old.quantity, (julianday('now') - 2440587.5) * 86400.0); END",
+            "CREATE TRIGGER IF NOT EXISTS sweets_threshold_ai AFTER INSERT ON sweets "
+            "WHEN new.effective_reorder_threshold IS NOT COALESCE(new.reorder_threshold, "
+            "(SELECT reorder_threshold FROM category_thresholds WHERE category = new.category), 5) BEGIN "
+            "UPDATE sweets SET effective_reorder_threshold = COALESCE(new.reorder_threshold, "
+            "(SELECT reorder_threshold FROM category_thresholds WHERE category = new.category), 5) "
+            "WHERE id = new.id; END",
+            "CREATE TRIGGER IF NOT EXISTS sweets_threshold_au AFTER UPDATE OF category, reorder_threshold ON sweets "
+            "WHEN new.effective_reorder_threshold IS NOT COALESCE(new.reorder_threshold, "
+            "(SELECT reorder_threshold FROM category_thresholds WHERE category = new.category), 5) BEGIN "
+            "UPDATE sweets SET effective_reorder_threshold = COALESCE(new.reorder_threshold, "
+            "(SELECT reorder_threshold FROM category_thresholds WHERE category = new.category), 5) "
+            "WHERE id = new.id; END",
+            "CREATE TRIGGER IF NOT EXISTS category_thresholds_ai AFTER INSERT ON category_thresholds BEGIN "
+            "UPDATE sweets SET effective_reorder_threshold = new.reorder_threshold, version = version + 1 "
+            "WHERE category = new.category AND reorder_threshold IS NULL "
+            "AND effective_reorder_threshold != new.reorder_threshold; END",
+            "CREATE TRIGGER IF NOT EXISTS category_thresholds_au AFTER UPDATE ON category_thresholds BEGIN "
+            "UPDATE sweets SET effective_reorder_threshold = new.reorder_threshold, version = version + 1 "
+            "WHERE category = new.category AND reorder_threshold IS NULL "
+            "AND effective_reorder_threshold != new.reorder_threshold; END",
+            "CREATE TRIGGER IF NOT EXISTS category_thresholds_ad AFTER DELETE ON category_thresholds BEGIN "
+            "UPDATE sweets SET effective_reorder_threshold = 5, version = version + 1 "
+            "WHERE category = old.category AND reorder_threshold IS NULL "
+            "AND effective_reorder_threshold != 5; END",
+        ),
+    ),
+    Migration(
+        8,
+        "drop ix_sweets_quantity, superseded by the partial ix_sweets_low_stock",
+        ("DROP INDEX IF EXISTS ix_sweets_quantity",),
+    ),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def _user_version(connection) -> int:
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(engine: Engine) -> int:
+    """Apply any pending migrations and return the resulting schema version.
+
+    Each migration runs in its own ``BEGIN IMMEDIATE`` transaction. Several
+    workers starting together therefore take turns, and each re-reads the
+    version once it holds the write lock.
+
+    Args:
+        engine: Engine bound to the SQLite database to migrate.
+
+    Returns:
+        The schema version after migrating.
+
+    Raises:
+        RuntimeError: If the database was migrated by newer code than this.
+    """
+
+    raw = engine.raw_connection()
+    try:
+        connection = raw.driver_connection
+        previous_isolation = connection.isolation_level
+        # Manage transactions explicitly; the driver would not wrap DDL in one.
+        connection.isolation_level = None
+        try:
+            version = _user_version(connection)
+            if version > LATEST_VERSION:
+                raise RuntimeError(
+                    f"Database schema version {version} is newer than this code supports ({LATEST_VERSION})"
+                )
+            for migration in MIGRATIONS:
+                if migration.version <= version:
+                    continue
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    version = _user_version(connection)
+                    if migration.version <= version:
+                        connection.execute("COMMIT")
+                        continue
+                    for statement in migration.statements:
+                        connection.execute(statement)
+                    connection.execute(f"PRAGMA user_version = {migration.version}")
+                    connection.execute("COMMIT")
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+                version = migration.version
+            return version
+        finally:
+            connection.isolation_level = previous_isolation
+    finally:
+        raw.close()
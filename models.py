@@ -1,6 +1,9 @@
-from sqlalchemy import Column, Float, ForeignKey, Integer, String
-from sqlalchemy.orm import relationship
+from datetime import datetime, timezone
 
+from sqlalchemy import DDL, Column, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, MetaData, String, Table, event, text
+from sqlalchemy.orm import query_expression, relationship
+
+import migrations
 from database import Base
 
 
@@ -12,16 +15,264 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     role = Column(String, default="customer", nullable=False)  # "customer" or "admin"
     sweets = relationship("Sweet", back_populates="owner", cascade="all, delete-orphan")
+    orders = relationship("Order", back_populates="user", cascade="all, delete-orphan")
 
 
 class Sweet(Base):
     __tablename__ = "sweets"
+    __table_args__ = (
+        Index("ix_sweets_category_price", "category", "price"),
+        # Holds only the sweets at or below their reorder threshold, so the
+        # low-stock view never visits well-stocked rows
+        Index("ix_sweets_low_stock", "quantity", sqlite_where=text("quantity <= effective_reorder_threshold")),
+        # Never reuse the id of a deleted sweet: (id, version) is its ETag
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True)
     category = Column(String, nullable=False)
-    price = Column(Float, nullable=False)
+    price = Column(Float, nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # Bumped by every write in crud; served as the sweet's ETag
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
+    # Per-sweet override; None falls back to the category default
+    reorder_threshold = Column(Integer)
+    # Maintained by triggers from the override and category_thresholds
+    effective_reorder_threshold = Column(Integer, nullable=False, server_default=text("5"))
+    relevance = query_expression()
 
     owner = relationship("User", back_populates="sweets")
+
+
+# Full-text index over sweet names. It is an external-content FTS5 table kept in
+# sync with ``sweets`` by triggers, so every write path (ORM, bulk upserts, raw
+# SQL) updates it in the same transaction. It lives in its own MetaData because
+# create_all cannot emit virtual tables; the DDL below is attached to ``sweets``.
+sweets_fts = Table(
+    "sweets_fts",
+    MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    Column("name", String),
+    Column("rank", Float),
+)
+
+SWEETS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS sweets_fts USING fts5("
+    "name, content='sweets', content_rowid='id', tokenize='unicode61', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS sweets_fts_ai AFTER INSERT ON sweets BEGIN "
+    "INSERT INTO sweets_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS sweets_fts_ad AFTER DELETE ON sweets BEGIN "
+    "INSERT INTO sweets_fts(sweets_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS sweets_fts_au AFTER UPDATE OF name ON sweets BEGIN "
+    "INSERT INTO sweets_fts(sweets_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO sweets_fts(rowid, name) VALUES (new.id, new.name); END",
+)
+
+for _statement in SWEETS_FTS_DDL:
+    event.listen(Sweet.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(Sweet.__table__, "after_drop", DDL("DROP TABLE IF EXISTS sweets_fts").execute_if(dialect="sqlite"))
+
+
+class CatalogState(Base):
+    """Single-row catalog version, bumped by triggers on every sweets write."""
+
+    __tablename__ = "catalog_state"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(Float, nullable=False)
+
+
+# Seconds since the epoch; SQLite 3.40 has no unixepoch('subsec')
+_NOW = "(julianday('now') - 2440587.5) * 86400.0"
+
+CATALOG_STATE_DDL = (
+    f"INSERT OR IGNORE INTO catalog_state (id, version, updated_at) VALUES (1, 1, {_NOW})",
+)
+
+# The triggers bump the catalog version in the same transaction as the write,
+# for ORM flushes, bulk upserts and raw SQL alike.
+CATALOG_VERSION_TRIGGERS = tuple(
+    f"CREATE TRIGGER IF NOT EXISTS sweets_catalog_{suffix} AFTER {operation} ON sweets BEGIN "
+    f"UPDATE catalog_state SET version = version + 1, updated_at = {_NOW} WHERE id = 1; END"
+    for suffix, operation in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE"))
+)
+
+for _statement in CATALOG_STATE_DDL:
+    event.listen(CatalogState.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in CATALOG_VERSION_TRIGGERS:
+    event.listen(Sweet.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+
+class InventoryMovement(Base):
+    """One stock change of a sweet; rows are only ever appended (or compacted)."""
+
+    __tablename__ = "inventory_movements"
+    # Ids must never be reused after compaction deletes the newest rows
+    __table_args__ = (
+        Index("ix_inventory_movements_sweet_id_created_at", "sweet_id", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    # No foreign key: the history of a deleted sweet is kept
+    sweet_id = Column(Integer, nullable=False)
+    delta = Column(Integer, nullable=False)
+    created_at = Column(Float, nullable=False)
+
+
+class InventorySnapshot(Base):
+    """A sweet's stock after every movement up to ``movement_id``."""
+
+    __tablename__ = "inventory_snapshots"
+    __table_args__ = (Index("ix_inventory_snapshots_sweet_id_movement_id", "sweet_id", "movement_id"),)
+
+    id = Column(Integer, primary_key=True)
+    sweet_id = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    movement_id = Column(Integer, nullable=False)
+    as_of = Column(Float, nullable=False)
+
+
+# Stock changes are appended to the ledger in the writing transaction by
+# triggers, so purchases, orders, restocks, edits, bulk upserts and deletes
+# are all recorded without each path having to remember to.
+INVENTORY_LEDGER_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS sweets_ledger_ai AFTER INSERT ON sweets BEGIN "
+    f"INSERT INTO inventory_movements (sweet_id, delta, created_at) VALUES (new.id, new.quantity, {_NOW}); END",
+    "CREATE TRIGGER IF NOT EXISTS sweets_ledger_au AFTER UPDATE OF quantity ON sweets "
+    "WHEN new.quantity != old.quantity BEGIN "
+    "INSERT INTO inventory_movements (sweet_id, delta, created_at) "
+    f"VALUES (new.id, new.quantity - old.quantity, {_NOW}); END",
+    "CREATE TRIGGER IF NOT EXISTS sweets_ledger_ad AFTER DELETE ON sweets BEGIN "
+    f"INSERT INTO inventory_movements (sweet_id, delta, created_at) VALUES (old.id, -old.quantity, {_NOW}); END",
+)
+
+for _statement in INVENTORY_LEDGER_TRIGGERS:
+    event.listen(Sweet.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+
+class CategoryThreshold(Base):
+    """Default reorder threshold for the sweets of one category."""
+
+    __tablename__ = "category_thresholds"
+
+    category = Column(String, primary_key=True)
+    reorder_threshold = Column(Integer, nullable=False)
+
+
+# Threshold of sweets with neither an override nor a category default; matches
+# the server default of ``effective_reorder_threshold``
+DEFAULT_REORDER_THRESHOLD = 5
+
+_EFFECTIVE_THRESHOLD = (
+    "COALESCE(new.reorder_threshold, "
+    "(SELECT reorder_threshold FROM category_thresholds WHERE category = new.category), "
+    f"{DEFAULT_REORDER_THRESHOLD})"
+)
+
+# Triggers keep ``effective_reorder_threshold`` in step with the override and
+# the category default on every write path, which the partial low-stock index
+# depends on. RETURNING clauses do not see the triggers' changes.
+SWEETS_THRESHOLD_TRIGGERS = tuple(
+    f"CREATE TRIGGER IF NOT EXISTS sweets_threshold_{suffix} AFTER {operation} ON sweets "
+    f"WHEN new.effective_reorder_threshold IS NOT {_EFFECTIVE_THRESHOLD} BEGIN "
+    f"UPDATE sweets SET effective_reorder_threshold = {_EFFECTIVE_THRESHOLD} WHERE id = new.id; END"
+    for suffix, operation in (("ai", "INSERT"), ("au", "UPDATE OF category, reorder_threshold"))
+)
+
+# A changed category default re-renders the sweets that use it, so their
+# versions are bumped too
+CATEGORY_THRESHOLD_TRIGGERS = tuple(
+    f"CREATE TRIGGER IF NOT EXISTS category_thresholds_{suffix} AFTER {operation} ON category_thresholds BEGIN "
+    f"UPDATE sweets SET effective_reorder_threshold = {threshold}, version = version + 1 "
+    f"WHERE category = {row}.category AND reorder_threshold IS NULL AND effective_reorder_threshold != {threshold}; END"
+    for suffix, operation, row, threshold in (
+        ("ai", "INSERT", "new", "new.reorder_threshold"),
+        ("au", "UPDATE", "new", "new.reorder_threshold"),
+        ("ad", "DELETE", "old", str(DEFAULT_REORDER_THRESHOLD)),
+    )
+)
+
+for _statement in SWEETS_THRESHOLD_TRIGGERS:
+    event.listen(Sweet.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in CATEGORY_THRESHOLD_TRIGGERS:
+    event.listen(CategoryThreshold.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+
+class SalesByCategory(Base):
+    """Units sold and revenue of one category on one UTC day, by hour.
+
+    ``units`` and ``revenue`` pack the day's 24 hourly values as little-endian
+    int64 and float64 arrays (see ``analytics``).
+    """
+
+    __tablename__ = "sales_by_category"
+    # Reports read a range of days across every category, so the day leads
+    # the clustered primary key
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    day = Column(Integer, primary_key=True)  # midnight UTC, seconds since the epoch
+    category = Column(String, primary_key=True)
+    units = Column(LargeBinary, nullable=False)
+    revenue = Column(LargeBinary, nullable=False)
+
+
+class SalesBySweet(Base):
+    """Units sold and revenue of one sweet on one UTC day, by hour."""
+
+    __tablename__ = "sales_by_sweet"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    day = Column(Integer, primary_key=True)
+    # No foreign key: the sales of a deleted sweet are kept
+    sweet_id = Column(Integer, primary_key=True)
+    units = Column(LargeBinary, nullable=False)
+    revenue = Column(LargeBinary, nullable=False)
+
+
+class Order(Base):
+    __tablename__ = "orders"
+    __table_args__ = (Index("ix_orders_user_id_created_at", "user_id", "created_at"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    total = Column(Float, nullable=False)
+
+    user = relationship("User", back_populates="orders")
+    lines = relationship("OrderLine", back_populates="order", cascade="all, delete-orphan")
+
+
+class OrderLine(Base):
+    __tablename__ = "order_lines"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
+    sweet_id = Column(Integer, ForeignKey("sweets.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Float, nullable=False)
+
+    order = relationship("Order", back_populates="lines")
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # "<user_id>:<method>:<path>:<key>"; status_code and body stay NULL while in flight
+    scope = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    status_code = Column(Integer)
+    body = Column(String)
+    created_at = Column(Float, nullable=False, index=True)
+
+
+# A schema built by create_all (tests, benchmarks) already matches the latest
+# migration, so stamp it; migrate() then has nothing left to apply.
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(f"PRAGMA user_version = {migrations.LATEST_VERSION}").execute_if(dialect="sqlite"),
+)
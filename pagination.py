@@ -0,0 +1,97 @@
+"""Opaque keyset cursors for paginated catalog reads."""
+
+import base64
+import binascii
+import json
+import math
+from collections.abc import Sequence
+from typing import Any
+
+MAX_PAGE_SIZE = 100
+
+# JSON types a cursor's sort key may have, per sort order
+_KEY_TYPES = {"id": (int,), "name": (str,), "price": (int, float), "relevance": (int, float)}
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client supplies a cursor that cannot be decoded."""
+
+
+def clamp_limit(limit: int) -> int:
+    """Bound a requested page size to the server-side page cap.
+
+    Args:
+        limit: Page size requested by the client.
+
+    Returns:
+        The page size actually served, between 1 and MAX_PAGE_SIZE.
+    """
+
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(sort: str, key: Any, last_id: int) -> str:
+    """Encode the position after the last row of a page as an opaque token.
+
+    Args:
+        sort: Name of the sort key the page was ordered by.
+        key: Value of the sort key on the last row of the page.
+        last_id: Identifier of the last row of the page, used as a tiebreaker.
+
+    Returns:
+        A URL-safe cursor string.
+    """
+
+    raw = json.dumps([sort, key, last_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple[Any, int]:
+    """Decode a cursor produced by encode_cursor for the given sort order.
+
+    Args:
+        cursor: Cursor string supplied by the client.
+        sort: Sort key the client is paginating by.
+
+    Returns:
+        The (sort key value, id) pair of the last row already served.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed or was issued for another sort order.
+    """
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, key, last_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError) as exc:
+        raise InvalidCursorError("Invalid cursor") from exc
+    if cursor_sort != sort or not _is_json_type(last_id, (int,)):
+        raise InvalidCursorError("Cursor does not match the requested sort order")
+    if not _is_json_type(key, _KEY_TYPES.get(sort, (int, float, str))):
+        raise InvalidCursorError("Cursor key does not match the requested sort order")
+    return key, last_id
+
+
+def _is_json_type(value: Any, types: tuple[type, ...]) -> bool:
+    # bool is an int subclass, and NaN or infinities never compare usefully
+    if isinstance(value, bool) or not isinstance(value, types):
+        return False
+    return not isinstance(value, float) or math.isfinite(value)
+
+
+def next_cursor(rows: Sequence[Any], sort: str, limit: int) -> str | None:
+    """Build the cursor for the page following ``rows``.
+
+    Args:
+        rows: Rows served on the current page, in order.
+        sort: Name of the sort key the page was ordered by.
+        limit: Page size used for the query.
+
+    Returns:
+        A cursor for the next page, or None when this page was the last one.
+    """
+
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(sort, getattr(last, sort), last.id)
@@ -0,0 +1,353 @@
+"""Token-bucket rate limiting for abuse-prone routes.
+
+:class:`RateLimitMiddleware` matches each request against ``ROUTES``. A
+matching request takes one token from the bucket of its client: the user
+named by a valid bearer token's ``sub`` for user-keyed policies, otherwise
+the client's IP address. An empty bucket answers ``429 Too Many Requests``
+with ``Retry-After`` before the request reaches routing, authentication or
+password hashing.
+
+Buckets refill lazily. Each one stores its token count and when that was
+last updated, and a take first adds what has accrued since. Nothing runs
+in the background. :class:`MemoryBucketStore` keeps the buckets in
+lock-sharded LRU maps of bounded size. ``RATE_LIMIT_BACKEND=sqlite`` shares
+them between the workers on a host through a small WAL-mode SQLite file
+instead (see :class:`SQLiteBucketStore`).
+"""
+
+import asyncio
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from jose import JWTError, jwt
+
+import security
+from cache import TTLCache
+
+MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+SHARDS = int(os.getenv("RATE_LIMIT_SHARDS", "16"))
+
+
+@dataclass(frozen=True)
+class Policy:
+    """A token bucket of ``capacity`` tokens that refills fully every ``period`` seconds."""
+
+    name: str
+    capacity: int
+    period: float
+    by_user: bool = False
+
+    @property
+    def rate(self) -> float:
+        """Tokens added per second."""
+        return self.capacity / self.period
+
+
+def parse_policy(name: str, spec: str, by_user: bool = False) -> Policy:
+    """Build a policy from a ``"<requests>/<seconds>"`` spec such as ``"10/60"``.
+
+    Args:
+        name: Name of the policy, part of every bucket key.
+        spec: Burst size and the seconds it takes to refill.
+        by_user: Key buckets by authenticated user rather than client IP.
+
+    Returns:
+        The parsed policy.
+
+    Raises:
+        ValueError: If the spec is malformed or not positive.
+    """
+
+    requests, _, seconds = spec.partition("/")
+    policy = Policy(name, int(requests), float(seconds), by_user)
+    if policy.capacity < 1 or policy.period <= 0:
+        raise ValueError(f"Rate limit {spec!r} must allow at least one request per positive period")
+    return policy
+
+
+LOGIN_POLICY = parse_policy("login", os.getenv("RATE_LIMIT_LOGIN", "10/60"))
+PURCHASE_POLICY = parse_policy("purchase", os.getenv("RATE_LIMIT_PURCHASE", "30/10"), by_user=True)
+
+# (method, path pattern, policy); the first match applies
+ROUTES = (
+    ("POST", re.compile(r"/api/auth/login"), LOGIN_POLICY),
+    ("POST", re.compile(r"/api/sweets/\d+/purchase"), PURCHASE_POLICY),
+)
+
+
+class BucketStore:
+    """Base class for bucket stores.
+
+    Subclasses implement :meth:`take` and :meth:`clear`.
+    """
+
+    async def take(self, key: str, policy: Policy) -> float:
+        """Take a token from the bucket stored under ``key``.
+
+        Args:
+            key: Bucket key, already scoped to the policy.
+            policy: Size and refill rate of the bucket.
+
+        Returns:
+            0.0 if a token was taken, otherwise the seconds until one will be
+            available.
+        """
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Forget every bucket."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release anything the store opened."""
+
+
+class MemoryBucketStore(BucketStore):
+    """Buckets held in this process, split across independently locked shards.
+
+    Each shard is an LRU map holding at most ``max_keys / shards`` buckets.
+    Inserting past that evicts the shard's least recently used bucket, which
+    has usually been idle long enough to have refilled anyway.
+    """
+
+    def __init__(self, max_keys: int = MAX_KEYS, shards: int = SHARDS, clock: Callable[[], float] = time.monotonic):
+        """Create an empty store.
+
+        Args:
+            max_keys: Maximum number of buckets held at once.
+            shards: Number of independently locked shards.
+            clock: Monotonic time source, overridable for tests.
+        """
+        self._clock = clock
+        self._shard_size = max(1, max_keys // shards)
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return sum(len(buckets) for _, buckets in self._shards)
+
+    def take_now(self, key: str, policy: Policy) -> float:
+        """Synchronous :meth:`take`; the store never blocks on I/O."""
+        lock, buckets = self._shards[hash(key) % len(self._shards)]
+        with lock:
+            now = self._clock()
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = [float(policy.capacity), now]
+                while len(buckets) > self._shard_size:
+                    buckets.popitem(last=False)
+                    self.evictions += 1
+            else:
+                buckets.move_to_end(key)
+                bucket[0] = min(policy.capacity, bucket[0] + (now - bucket[1]) * policy.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / policy.rate
+
+    async def take(self, key: str, policy: Policy) -> float:
+        return self.take_now(key, policy)
+
+    def clear(self) -> None:
+        for lock, buckets in self._shards:
+            with lock:
+                buckets.clear()
+
+
+class SQLiteBucketStore(BucketStore):
+    """Buckets shared by every worker on a host through one SQLite table.
+
+    A take is a single upsert, so concurrent workers cannot both spend the
+    last token. Each row also records when its bucket will be full again;
+    past that moment the row is equivalent to no row at all, and such rows
+    are pruned every ``prune_interval`` seconds.
+    """
+
+    # Takes from several workers can commit slightly out of clock order, so
+    # time never runs backwards for a bucket.
+    _TAKE_SQL = (
+        "INSERT INTO rate_limit_buckets (key, tokens, updated_at, full_at) "
+        "VALUES (:key, :capacity - 1, :now, :now + 1 / :rate) "
+        "ON CONFLICT (key) DO UPDATE SET "
+        "tokens = MIN(:capacity, tokens + MAX(:now - updated_at, 0) * :rate) - 1, "
+        "updated_at = MAX(:now, updated_at), "
+        "full_at = MAX(:now, updated_at) + (:capacity + 1 - MIN(:capacity, tokens + MAX(:now - updated_at, 0) * :rate)) / :rate "
+        "WHERE MIN(:capacity, tokens + MAX(:now - updated_at, 0) * :rate) >= 1 "
+        "RETURNING tokens"
+    )
+
+    def __init__(self, path: str, prune_interval: float = 60.0):
+        """Configure the store; the database is opened on first use.
+
+        Args:
+            path: SQLite file shared by every worker on the host.
+            prune_interval: Seconds between sweeps of refilled buckets.
+        """
+        self.path = path
+        self.prune_interval = prune_interval
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "key TEXT PRIMARY KEY, "
+                "tokens REAL NOT NULL, "
+                "updated_at REAL NOT NULL, "
+                "full_at REAL NOT NULL) WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_full_at ON rate_limit_buckets (full_at)"
+            )
+        return self._conn
+
+    def take_now(self, key: str, policy: Policy) -> float:
+        """Synchronous :meth:`take`, run on a worker thread by the async API."""
+        now = time.time()
+        params = {"key": key, "capacity": policy.capacity, "rate": policy.rate, "now": now}
+        with self._lock:
+            conn = self._connect()
+            if now - self._last_prune >= self.prune_interval:
+                conn.execute("DELETE FROM rate_limit_buckets WHERE full_at < ?", (now,))
+                self._last_prune = now
+            if conn.execute(self._TAKE_SQL, params).fetchone() is not None:
+                return 0.0
+            # Denied: the row was left as it was, so its refill is still exact
+            row = conn.execute("SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return 0.0
+        tokens = min(policy.capacity, row[0] + max(now - row[1], 0) * policy.rate)
+        return max(0.0, (1 - tokens) / policy.rate)
+
+    async def take(self, key: str, policy: Policy) -> float:
+        return await asyncio.to_thread(self.take_now, key, policy)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connect().execute("DELETE FROM rate_limit_buckets")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def create_store() -> BucketStore:
+    """Build the store selected by the RATE_LIMIT_BACKEND environment variable.
+
+    ``RATE_LIMIT_BACKEND=sqlite`` shares buckets through ``RATE_LIMIT_PATH``
+    (default ``./sweetshop_ratelimit.db``). Anything else keeps them in
+    memory, limiting each worker separately.
+
+    Returns:
+        The configured bucket store.
+    """
+
+    if os.getenv("RATE_LIMIT_BACKEND", "memory") == "sqlite":
+        return SQLiteBucketStore(os.getenv("RATE_LIMIT_PATH", "./sweetshop_ratelimit.db"))
+    return MemoryBucketStore()
+
+
+store = create_store()
+
+# Subjects of verified bearer tokens, so a token is only decoded once
+_subjects = TTLCache(maxsize=MAX_KEYS, ttl=security.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+def token_subject(token: str) -> str | None:
+    """Return the ``sub`` claim of a valid, unexpired bearer token.
+
+    Unverified claims are never trusted; otherwise a client could pick a new
+    bucket for every request.
+
+    Args:
+        token: The bearer token sent by the client.
+
+    Returns:
+        The subject, or None if the token is invalid or carries none.
+    """
+
+    subject = _subjects.get(token)
+    if subject is not None:
+        return subject
+    try:
+        payload = jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
+    except JWTError:
+        return None
+    subject = payload.get("sub")
+    if subject is not None and "exp" in payload:
+        _subjects.set(token, subject, ttl=payload["exp"] - time.time())
+    return subject
+
+
+def client_key(scope: dict, policy: Policy) -> str:
+    """Identify the client a request is charged to under ``policy``.
+
+    Args:
+        scope: ASGI scope of the request.
+        policy: The policy that matched the request.
+
+    Returns:
+        ``"user:<sub>"`` for user-keyed policies with a valid bearer token,
+        otherwise ``"ip:<address>"``.
+    """
+
+    if policy.by_user:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    subject = token_subject(token)
+                    if subject is not None:
+                        return f"user:{subject}"
+                break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing ``ROUTES`` with the module's bucket store."""
+
+    def __init__(self, app, routes=ROUTES):
+        """Wrap an ASGI application.
+
+        Args:
+            app: The application to protect.
+            routes: (method, path pattern, policy) triples to enforce.
+        """
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http":
+            method, path = scope["method"], scope["path"]
+            for route_method, pattern, policy in self.routes:
+                if route_method == method and pattern.fullmatch(path):
+                    retry_after = await store.take(f"{policy.name}:{client_key(scope, policy)}", policy)
+                    if retry_after:
+                        response = JSONResponse(
+                            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            content={"detail": "Too many requests"},
+                            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                        )
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
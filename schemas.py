@@ -1,4 +1,9 @@
-from pydantic import BaseModel, EmailStr, ConfigDict
+from datetime import datetime
+
+from pydantic import BaseModel, EmailStr, ConfigDict, Field, field_validator
+
+# Largest value a SQLite INTEGER column can hold
+SQLITE_MAX_INTEGER = 2**63 - 1
 
 
 class UserCreate(BaseModel):
@@ -19,7 +24,27 @@ class SweetCreate(BaseModel):
     name: str
     category: str
     price: float
-    quantity: int
+    quantity: int = Field(le=SQLITE_MAX_INTEGER)
+    # None uses the category's default threshold
+    reorder_threshold: int | None = Field(default=None, ge=0)
+
+
+class SweetImportRow(SweetCreate):
+    """A bulk import row; a row carrying an id updates that existing sweet in place."""
+
+    id: int | None = Field(default=None, gt=0, le=SQLITE_MAX_INTEGER)
+
+
+class BulkImportError(BaseModel):
+    row: int
+    errors: list[str]
+
+
+class BulkImportResult(BaseModel):
+    received: int
+    imported: int
+    failed: int
+    errors: list[BulkImportError]
 
 
 class Sweet(BaseModel):
@@ -31,6 +56,36 @@ class Sweet(BaseModel):
     price: float
     quantity: int
     owner_id: int
+    version: int = 1
+    reorder_threshold: int | None = None
+    effective_reorder_threshold: int = 5
+
+
+class StockLevel(BaseModel):
+    """A sweet's stock reconstructed from the inventory ledger."""
+
+    sweet_id: int
+    quantity: int
+    at: datetime
+
+
+class SalesSeries(BaseModel):
+    """Sales of one category or sweet, aligned with ``SalesReport.buckets``."""
+
+    key: str | int
+    units: list[int]
+    revenue: list[float]
+    total_units: int
+    total_revenue: float
+
+
+class SalesReport(BaseModel):
+    """Sales over a time range, one series per category or sweet."""
+
+    group_by: str
+    granularity: str
+    buckets: list[datetime]
+    series: list[SalesSeries]
 
 
 class SweetUpdate(BaseModel):
@@ -38,9 +93,65 @@ class SweetUpdate(BaseModel):
     category: str | None = None
     price: float | None = None
     quantity: int | None = None
+    # An explicit null clears the override
+    reorder_threshold: int | None = Field(default=None, ge=0)
+
+
+class ReorderThresholdUpdate(BaseModel):
+    """Payload setting a category's default reorder threshold."""
+
+    reorder_threshold: int = Field(ge=0)
+
+
+class CategoryThreshold(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    category: str
+    reorder_threshold: int
 
 
 class RestockRequest(BaseModel):
     """Payload for restocking a sweet by increasing its quantity."""
 
     quantity: int
+
+
+class OrderLineCreate(BaseModel):
+    """A single cart line requesting a quantity of one sweet."""
+
+    sweet_id: int
+    quantity: int = Field(gt=0)
+
+
+class OrderCreate(BaseModel):
+    """Payload for placing a multi-item order."""
+
+    lines: list[OrderLineCreate] = Field(min_length=1)
+
+    @field_validator("lines")
+    @classmethod
+    def _one_line_per_sweet(cls, lines: list[OrderLineCreate]) -> list[OrderLineCreate]:
+        seen: set[int] = set()
+        for line in lines:
+            if line.sweet_id in seen:
+                raise ValueError(f"Sweet {line.sweet_id} appears on more than one line")
+            seen.add(line.sweet_id)
+        return lines
+
+
+class OrderLine(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    sweet_id: int
+    quantity: int
+    unit_price: float
+
+
+class Order(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    user_id: int
+    created_at: datetime
+    total: float
+    lines: list[OrderLine]
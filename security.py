@@ -1,24 +1,44 @@
+import os
+import threading
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Annotated, Any
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
 import crud
+import hashing
 import models
+from cache import TTLCache
 from database import get_db
 
 SECRET_KEY = "change-this-secret-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# Seconds a resolved principal may be served from the cache. Generations only
+# invalidate entries in this process, so this bounds how long other workers
+# keep honouring a demoted or deleted user.
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "5"))
+
+# Resolved principals keyed by bearer token. Each entry lives for at most
+# PRINCIPAL_CACHE_TTL_SECONDS (never past its token's expiry) and records the
+# user's generation at lookup time; bumping a user's generation (role change,
+# deletion) makes all of their cached tokens miss at once in this process.
+_principals = TTLCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096")),
+    ttl=PRINCIPAL_CACHE_TTL_SECONDS,
+)
+_user_generations: dict[int, int] = {}
+_generations_lock = threading.Lock()
+_invalidations = 0
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Validate a plaintext password against a stored bcrypt hash.
@@ -31,7 +51,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         True if the plaintext password matches the hash; otherwise False.
     """
 
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing.verify_password(plain_password, hashed_password)
 
 
 def create_access_token(data: dict[str, Any], expires_delta: timedelta | None = None) -> str:
@@ -57,6 +77,11 @@ def get_current_user(
  ) -> models.User:
     """Resolve the authenticated user from the bearer token in the request.
 
+    Repeat requests with the same token within PRINCIPAL_CACHE_TTL_SECONDS are
+    served from an in-process cache, skipping both the JWT decode and the user
+    lookup. On a cache hit the
+    returned user is a detached snapshot carrying only id, email and role.
+
     Args:
         token: The bearer token extracted from the Authorization header.
         db: SQLAlchemy session injected by FastAPI.
@@ -68,6 +93,12 @@ def get_current_user(
         HTTPException: If the token is invalid, expired, or the user does not exist.
     """
 
+    cached = _principals.get(token)
+    if cached is not None:
+        principal, generation = cached
+        if _user_generations.get(principal.id, 0) == generation:
+            return principal
+
     credentials_error = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -81,12 +112,45 @@ def get_current_user(
     except JWTError as exc:
         raise credentials_error from exc
 
+    invalidations = _invalidations
     user = crud.get_user_by_email(db, email)
     if user is None:
         raise credentials_error
+
+    # Skip caching if any user was invalidated while this one was being loaded.
+    remaining = payload["exp"] - time.time() if "exp" in payload else None
+    if invalidations == _invalidations and (remaining is None or remaining > 0):
+        principal = models.User(id=user.id, email=user.email, role=user.role)
+        ttl = PRINCIPAL_CACHE_TTL_SECONDS if remaining is None else min(remaining, PRINCIPAL_CACHE_TTL_SECONDS)
+        _principals.set(token, (principal, _user_generations.get(user.id, 0)), ttl=ttl)
     return user
 
 
+def invalidate_user(user_id: int) -> None:
+    """Force every cached token of a user to be re-validated on next use.
+
+    Args:
+        user_id: Identifier of the user whose role or existence changed.
+    """
+
+    global _invalidations
+    with _generations_lock:
+        _user_generations[user_id] = _user_generations.get(user_id, 0) + 1
+        _invalidations += 1
+
+
+def clear_principal_cache() -> None:
+    """Drop every cached principal, e.g. after bulk user changes that bypass the ORM."""
+
+    _principals.clear()
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(_mapper, _connection, target: models.User) -> None:
+    invalidate_user(target.id)
+
+
 def get_password_hash(password: str) -> str:
     """Hash a plaintext password using bcrypt.
 
@@ -96,7 +160,7 @@ def get_password_hash(password: str) -> str:
     Returns:
         The bcrypt hash of the password.
     """
-    return pwd_context.hash(password)
+    return hashing.hash_password(password)
 
 
 def require_admin(current_user: Annotated[models.User, Depends(get_current_user)]) -> models.User:
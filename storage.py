@@ -0,0 +1,124 @@
+"""Storage engine profile: database URL, SQLite pragmas and pool sizing.
+
+Settings come from the environment (see :meth:`StorageSettings.from_env`).
+SQLite pragmas are applied to every new DBAPI connection through an engine
+``connect`` event, so they hold for pooled, sync and aiosqlite connections
+alike. The defaults are WAL journaling with ``synchronous=NORMAL`` and a busy
+timeout. With them, readers no longer block writers and short write overlaps
+wait instead of failing with ``database is locked``.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+@dataclass(frozen=True)
+class StorageSettings:
+    """Connection and pragma settings for the application database."""
+
+    url: str = "sqlite:///./sweetshop.db"
+    async_url: str | None = None
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    # Negative values are KiB (SQLite's convention); -64000 is about 64 MB.
+    cache_size: int = -64000
+    mmap_size: int = 256 * 1024 * 1024
+    busy_timeout_ms: int = 5000
+    pool_size: int = 5
+    max_overflow: int = 10
+
+    def __post_init__(self):
+        if self.journal_mode.upper() not in JOURNAL_MODES:
+            raise ValueError(f"Unsupported SQLite journal mode: {self.journal_mode}")
+        if self.synchronous.upper() not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"Unsupported SQLite synchronous level: {self.synchronous}")
+
+    @classmethod
+    def from_env(cls) -> "StorageSettings":
+        """Read settings from the environment, falling back to the defaults.
+
+        Variables: DATABASE_URL, ASYNC_DATABASE_URL, SQLITE_JOURNAL_MODE,
+        SQLITE_SYNCHRONOUS, SQLITE_CACHE_SIZE, SQLITE_MMAP_SIZE,
+        SQLITE_BUSY_TIMEOUT_MS, DB_POOL_SIZE and DB_MAX_OVERFLOW.
+
+        Returns:
+            The storage settings for this process.
+
+        Raises:
+            ValueError: If a value is malformed or not a supported option.
+        """
+
+        defaults = cls()
+        return cls(
+            url=os.getenv("DATABASE_URL", defaults.url),
+            async_url=os.getenv("ASYNC_DATABASE_URL"),
+            journal_mode=os.getenv("SQLITE_JOURNAL_MODE", defaults.journal_mode),
+            synchronous=os.getenv("SQLITE_SYNCHRONOUS", defaults.synchronous),
+            cache_size=int(os.getenv("SQLITE_CACHE_SIZE", defaults.cache_size)),
+            mmap_size=int(os.getenv("SQLITE_MMAP_SIZE", defaults.mmap_size)),
+            busy_timeout_ms=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", defaults.busy_timeout_ms)),
+            pool_size=int(os.getenv("DB_POOL_SIZE", defaults.pool_size)),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", defaults.max_overflow)),
+        )
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.url.startswith("sqlite")
+
+    @property
+    def resolved_async_url(self) -> str:
+        """The async driver URL: ASYNC_DATABASE_URL, or the sqlite URL on aiosqlite."""
+        if self.async_url:
+            return self.async_url
+        if self.url.startswith("sqlite://"):
+            return "sqlite+aiosqlite://" + self.url[len("sqlite://"):]
+        return self.url
+
+    def pragmas(self) -> list[str]:
+        """Return the PRAGMA statements run on each new SQLite connection."""
+        return [
+            f"PRAGMA journal_mode={self.journal_mode.upper()}",
+            f"PRAGMA synchronous={self.synchronous.upper()}",
+            f"PRAGMA cache_size={self.cache_size}",
+            f"PRAGMA mmap_size={self.mmap_size}",
+            f"PRAGMA busy_timeout={self.busy_timeout_ms}",
+        ]
+
+    def engine_options(self) -> dict[str, Any]:
+        """Keyword arguments for ``create_engine``/``create_async_engine``."""
+        options: dict[str, Any] = {"pool_size": self.pool_size, "max_overflow": self.max_overflow}
+        if self.is_sqlite:
+            options["connect_args"] = {"check_same_thread": False}
+        return options
+
+
+def apply_pragmas(engine: Engine, settings: StorageSettings) -> None:
+    """Run the profile's pragmas on every connection the engine opens.
+
+    Does nothing for non-SQLite engines.
+
+    Args:
+        engine: A sync engine, or ``AsyncEngine.sync_engine``.
+        settings: The storage profile to apply.
+    """
+
+    if not settings.is_sqlite:
+        return
+
+    statements = settings.pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
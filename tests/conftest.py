@@ -5,22 +5,35 @@ from pathlib import Path
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 # Use test database
 TEST_DATABASE_URL = "sqlite:///./test_sweetshop.db"
+ASYNC_TEST_DATABASE_URL = "sqlite+aiosqlite:///./test_sweetshop.db"
+# Point the app's own engines (used by the lifespan's init_db) at the test database too
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
 
 # Import after path is set
-from database import Base, get_db
+from database import Base, get_async_db, get_db
 from main import app
+import catalog_cache
+import idempotency
+import migrations
 import models
+import rate_limit
+import security
 
 # Create test engine
 engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Each TestClient runs its own event loop, so async connections are not pooled across tests
+async_engine = create_async_engine(ASYNC_TEST_DATABASE_URL, poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 
 def override_get_db():
@@ -32,8 +45,15 @@ def override_get_db():
         db.close()
 
 
-# Override the dependency
+async def override_get_async_db():
+    """Override async database dependency for tests."""
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+# Override the dependencies
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -45,7 +65,7 @@ def setup_test_database():
         test_db.unlink()
 
     # Create tables
-    Base.metadata.create_all(bind=engine)
+    migrations.migrate(engine)
 
     yield
 
@@ -60,6 +80,16 @@ def setup_test_database():
         except PermissionError:
             pass  # Database file still locked, will be cleaned on next run
 
+@pytest.fixture(scope="function")
+def db_session():
+    """Provide a database session bound to the test database."""
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 @pytest.fixture(scope="function")
 def client():
     """Provide a test client for each test."""
@@ -73,8 +103,20 @@ def reset_database():
     # Clear all data but keep tables
     db = TestingSessionLocal()
     try:
+        db.query(models.OrderLine).delete()
+        db.query(models.Order).delete()
         db.query(models.Sweet).delete()
         db.query(models.User).delete()
+        db.query(models.IdempotencyKey).delete()
+        db.query(models.InventoryMovement).delete()
+        db.query(models.InventorySnapshot).delete()
+        db.query(models.SalesByCategory).delete()
+        db.query(models.SalesBySweet).delete()
+        db.query(models.CategoryThreshold).delete()
         db.commit()
     finally:
         db.close()
+    catalog_cache.invalidate()
+    security.clear_principal_cache()
+    idempotency.store.clear()
+    rate_limit.store.clear()
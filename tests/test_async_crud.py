@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import async_crud
+import crud
+import database
+import schemas
+from conftest import TestingAsyncSessionLocal
+
+
+def run(scenario) -> None:
+    async def with_session() -> None:
+        async with TestingAsyncSessionLocal() as db:
+            await scenario(db)
+
+    asyncio.run(with_session())
+
+
+async def make_sweet(db: AsyncSession, quantity: int = 5) -> tuple[int, int]:
+    """Create a user and a sweet they own, returning both ids.
+
+    Ids are read up front because a failed write rolls back, expiring the ORM objects.
+    """
+    user = await async_crud.create_user(
+        db, schemas.UserCreate(email="async@example.com", password="unused"), hashed_password="hash"
+    )
+    sweet = await async_crud.create_sweet(
+        db, schemas.SweetCreate(name="Async Fudge", category="Fudge", price=2.0, quantity=quantity), owner_id=user.id
+    )
+    assert (sweet.name, sweet.quantity, sweet.version) == ("Async Fudge", quantity, 1)
+    return user.id, sweet.id
+
+
+def test_get_async_db_yields_a_working_session() -> None:
+    async def scenario() -> None:
+        sessions = database.get_async_db()
+        db = await anext(sessions)
+        assert isinstance(db, AsyncSession)
+        assert (await db.execute(text("SELECT 1"))).scalar() == 1
+        await sessions.aclose()
+        await database.async_engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_async_create_update_and_lookup() -> None:
+    async def scenario(db: AsyncSession) -> None:
+        user_id, sweet_id = await make_sweet(db)
+        assert (await async_crud.get_user_by_email(db, "async@example.com")).id == user_id
+
+        updated = await async_crud.update_sweet(db, sweet_id, schemas.SweetUpdate(price=2.5), expected_version=1)
+        assert (updated.price, updated.version) == (2.5, 2)
+        stale = await async_crud.update_sweet(db, sweet_id, schemas.SweetUpdate(price=3.0), expected_version=1)
+        assert stale == crud.VERSION_CONFLICT
+        assert await async_crud.update_sweet(db, sweet_id + 1000, schemas.SweetUpdate(price=3.0)) is None
+
+        assert (await async_crud.get_sweet(db, sweet_id)).price == 2.5
+        assert await async_crud.get_sweet(db, sweet_id + 1000) is None
+
+    run(scenario)
+
+
+def test_async_purchase_and_restock() -> None:
+    async def scenario(db: AsyncSession) -> None:
+        _, sweet_id = await make_sweet(db, quantity=1)
+
+        bought = await async_crud.purchase_sweet(db, sweet_id)
+        assert (bought.quantity, bought.version) == (0, 2)
+        assert await async_crud.purchase_sweet(db, sweet_id) == crud.OUT_OF_STOCK
+        assert await async_crud.purchase_sweet(db, sweet_id + 1000) is None
+
+        restocked = await async_crud.restock_sweet(db, sweet_id, 10)
+        assert (restocked.quantity, restocked.version) == (10, 3)
+        assert await async_crud.restock_sweet(db, sweet_id + 1000, 10) is None
+
+    run(scenario)
+
+
+def test_async_create_order_loads_lines_and_reports_failures() -> None:
+    async def scenario(db: AsyncSession) -> None:
+        user_id, sweet_id = await make_sweet(db, quantity=3)
+
+        order, updated = await async_crud.create_order(
+            db, schemas.OrderCreate(lines=[{"sweet_id": sweet_id, "quantity": 2}]), user_id=user_id
+        )
+        # Lines were loaded inside run_sync, so reading them here needs no lazy load
+        assert [(line.sweet_id, line.quantity, line.unit_price) for line in order.lines] == [(sweet_id, 2, 2.0)]
+        assert order.total == 4.0
+        assert [row.quantity for row in updated] == [1]
+
+        for lines, error in (
+            ([{"sweet_id": sweet_id, "quantity": 2}], ValueError),
+            ([{"sweet_id": sweet_id + 1000, "quantity": 1}], LookupError),
+        ):
+            with pytest.raises(error):
+                await async_crud.create_order(db, schemas.OrderCreate(lines=lines), user_id=user_id)
+        assert (await async_crud.get_sweet(db, sweet_id)).quantity == 1
+
+    run(scenario)
@@ -1,3 +1,12 @@
+import asyncio
+import threading
+
+import pytest
+
+import hashing
+import rate_limit
+
+
 def test_register_user_success(client) -> None:
     payload = {"email": "register@example.com", "password": "password123"}
     response = client.post("/api/auth/register", json=payload)
@@ -21,3 +30,61 @@ def test_login_user_success(client) -> None:
     body = response.json()
     assert "access_token" in body
     assert body.get("token_type") == "bearer"
+
+
+def test_login_sheds_load_when_hasher_is_saturated(client, monkeypatch) -> None:
+    registration_payload = {"email": "storm@example.com", "password": "password123"}
+    register_response = client.post("/api/auth/register", json=registration_payload)
+    assert register_response.status_code == 201
+
+    saturated = hashing.PasswordHasher(workers=1, queue_size=0)
+    assert saturated._slots.acquire(blocking=False)
+    monkeypatch.setattr(hashing, "hasher", saturated)
+
+    login_payload = {"username": "storm@example.com", "password": "password123"}
+    response = client.post("/api/auth/login", data=login_payload)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    saturated._slots.release()
+    response = client.post("/api/auth/login", data=login_payload)
+    assert response.status_code == 200
+    saturated.shutdown()
+
+
+def test_cancelled_hash_holds_its_slot_until_the_pool_finishes() -> None:
+    hasher = hashing.PasswordHasher(workers=1, queue_size=0)
+    release = threading.Event()
+
+    async def scenario() -> None:
+        running = asyncio.create_task(hasher._submit(release.wait))
+        await asyncio.sleep(0.05)
+        running.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await running
+        # The job is still on the pool, so the bound still holds
+        with pytest.raises(hashing.HasherBusyError):
+            await asyncio.wait_for(hasher._submit(len, "busy"), timeout=1)
+        release.set()
+        for _ in range(100):
+            if hasher._slots.acquire(blocking=False):
+                hasher._slots.release()
+                break
+            await asyncio.sleep(0.01)
+        assert await hasher._submit(len, "free") == 4
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        hasher.shutdown()
+
+
+def test_login_is_rate_limited_per_client(client) -> None:
+    login_payload = {"username": "nobody@example.com", "password": "guess"}
+    statuses = [client.post("/api/auth/login", data=login_payload).status_code for _ in range(rate_limit.LOGIN_POLICY.capacity)]
+    assert statuses == [401] * rate_limit.LOGIN_POLICY.capacity
+
+    response = client.post("/api/auth/login", data=login_payload)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
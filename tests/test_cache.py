@@ -0,0 +1,43 @@
+from cache import TTLCache
+
+
+def test_ttl_cache_evicts_least_recently_used_and_expires() -> None:
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+    now[0] = 11.0
+    assert cache.get("a") is None
+    assert cache.stats() == {"hits": 3, "misses": 2, "evictions": 1, "size": 1}
+
+
+def test_catalog_reads_see_writes_immediately(client) -> None:
+    register_payload = {"email": "cache@example.com", "password": "password123", "role": "admin"}
+    assert client.post("/api/auth/register", json=register_payload).status_code == 201
+    token = client.post(
+        "/api/auth/login",
+        data={"username": "cache@example.com", "password": "password123"},
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    sweet_payload = {"name": "Butterscotch", "category": "Candy", "price": 1.10, "quantity": 3}
+    sweet_id = client.post("/api/sweets", json=sweet_payload, headers=headers).json()["id"]
+
+    assert client.get(f"/api/sweets/{sweet_id}", headers=headers).json()["quantity"] == 3
+    assert client.get("/api/sweets", headers=headers).json()[0]["quantity"] == 3
+
+    client.post(f"/api/sweets/{sweet_id}/purchase", headers=headers)
+
+    assert client.get(f"/api/sweets/{sweet_id}", headers=headers).json()["quantity"] == 2
+    assert client.get("/api/sweets", headers=headers).json()[0]["quantity"] == 2
+
+    stats = client.get("/api/admin/cache", headers=headers).json()
+    assert stats["items"]["misses"] >= 2
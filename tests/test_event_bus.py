@@ -0,0 +1,119 @@
+import asyncio
+import json
+import multiprocessing
+import sqlite3
+import time
+
+from event_bus import SQLiteEventBus
+from websocket_manager import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self) -> None:
+        self.received: list[dict] = []
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        self.received.append(json.loads(data))
+
+
+def test_sqlite_bus_delivers_every_event_to_every_worker(tmp_path) -> None:
+    async def scenario() -> None:
+        path = str(tmp_path / "events.db")
+        workers = [ConnectionManager(bus=SQLiteEventBus(path, poll_interval=0.01)) for _ in range(3)]
+        clients = []
+        for worker in workers:
+            await worker.start()
+            for _ in range(2):
+                client = FakeWebSocket()
+                await worker.connect(client)
+                clients.append(client)
+
+        for n, worker in enumerate(workers):
+            await worker.broadcast({"type": "sweet_purchased", "data": {"id": n}})
+
+        for _ in range(200):
+            if all(len(client.received) == 3 for client in clients):
+                break
+            await asyncio.sleep(0.01)
+        for client in clients:
+            assert sorted(message["data"]["id"] for message in client.received) == [0, 1, 2]
+
+        for worker in workers:
+            for websocket in list(worker.active_connections):
+                worker.disconnect(websocket)
+            await worker.stop()
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_bus_poller_survives_an_undeliverable_event(tmp_path) -> None:
+    async def scenario() -> None:
+        path = str(tmp_path / "events.db")
+        worker = ConnectionManager(bus=SQLiteEventBus(path, poll_interval=0.01))
+        await worker.start()
+        client = FakeWebSocket()
+        await worker.connect(client)
+
+        # Rows appended by another worker: one that cannot be decoded, then a valid one
+        with sqlite3.connect(path) as other:
+            other.executemany(
+                "INSERT INTO ws_events (origin, created_at, payload) VALUES ('other', ?, ?)",
+                [(time.time(), "{not json"), (time.time(), json.dumps({"type": "sweet_deleted", "data": {"id": 7}}))],
+            )
+
+        for _ in range(200):
+            if client.received:
+                break
+            await asyncio.sleep(0.01)
+        assert client.received == [{"type": "sweet_deleted", "data": {"id": 7}}]
+
+        worker.disconnect(client)
+        await worker.stop()
+
+    asyncio.run(scenario())
+
+
+async def _worker_main(path: str, index: int, workers: int, events: int, ready, results) -> None:
+    manager = ConnectionManager(bus=SQLiteEventBus(path, poll_interval=0.01))
+    await manager.start()
+    clients = [FakeWebSocket() for _ in range(2)]
+    for client in clients:
+        await manager.connect(client)
+    # Every worker must be polling before anyone publishes
+    ready.wait()
+    for n in range(events):
+        await manager.broadcast({"type": "sweet_purchased", "data": {"id": index * events + n}})
+    deadline = time.monotonic() + 10
+    while any(len(client.received) < workers * events for client in clients) and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    results.put([sorted(message["data"]["id"] for message in client.received) for client in clients])
+    for websocket in list(manager.active_connections):
+        manager.disconnect(websocket)
+    await manager.stop()
+
+
+def _worker(path: str, index: int, workers: int, events: int, ready, results) -> None:
+    asyncio.run(_worker_main(path, index, workers, events, ready, results))
+
+
+def test_sqlite_bus_delivers_every_event_across_worker_processes(tmp_path) -> None:
+    workers, events = 3, 20
+    context = multiprocessing.get_context("fork")
+    ready = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_worker, args=(str(tmp_path / "events.db"), index, workers, events, ready, results))
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    received = [results.get(timeout=30) for _ in processes]
+    for process in processes:
+        process.join(timeout=10)
+        assert process.exitcode == 0
+
+    everything = list(range(workers * events))
+    assert received == [[everything, everything]] * workers
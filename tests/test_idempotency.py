@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+
+import models
+from idempotency import IdempotencyInProgress, IdempotencyStore, IdempotencyStoreFull, StoredResponse
+
+
+async def run_once(store: IdempotencyStore, key: str) -> StoredResponse | None:
+    replayed = await store.begin(key, "fingerprint")
+    if replayed is None:
+        await store.complete(key, StoredResponse(200, f'{{"key": "{key}"}}'))
+    return replayed
+
+
+def test_memory_store_refuses_new_keys_instead_of_forgetting_live_ones() -> None:
+    store = IdempotencyStore(ttl=60, maxsize=3)
+
+    async def scenario() -> None:
+        for key in ("a", "b", "c"):
+            assert await run_once(store, key) is None
+        with pytest.raises(IdempotencyStoreFull):
+            await run_once(store, "d")
+        assert await run_once(store, "a") == StoredResponse(200, '{"key": "a"}')
+
+    asyncio.run(scenario())
+
+
+def test_memory_store_makes_room_once_keys_expire() -> None:
+    now = [0.0]
+    store = IdempotencyStore(ttl=60, maxsize=2)
+    store._completed._clock = lambda: now[0]
+
+    async def scenario() -> None:
+        assert await run_once(store, "a") is None
+        assert await run_once(store, "b") is None
+        now[0] = 61.0
+        assert await run_once(store, "c") is None
+        assert await run_once(store, "c") == StoredResponse(200, '{"key": "c"}')
+
+    asyncio.run(scenario())
+
+
+def test_persistent_store_replays_keys_evicted_from_memory(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'keys.db'}")
+    models.IdempotencyKey.__table__.create(engine)
+    store = IdempotencyStore(ttl=60, maxsize=2, engine=engine)
+
+    async def scenario() -> None:
+        for key in ("a", "b", "c", "d"):
+            assert await run_once(store, key) is None
+        assert await run_once(store, "a") == StoredResponse(200, '{"key": "a"}')
+
+    asyncio.run(scenario())
+    engine.dispose()
+
+
+def test_persistent_claim_of_a_dead_worker_is_taken_over_after_its_lease(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'keys.db'}")
+    models.IdempotencyKey.__table__.create(engine)
+    dead = IdempotencyStore(ttl=60, engine=engine, lease=0.2)
+    retrying = IdempotencyStore(ttl=60, engine=engine, lease=0.2)
+
+    async def scenario() -> None:
+        # The first worker claims the key and never records a response
+        assert await dead.begin("a", "fingerprint") is None
+        with pytest.raises(IdempotencyInProgress):
+            await retrying.begin("a", "fingerprint")
+        await asyncio.sleep(0.3)
+        assert await run_once(retrying, "a") is None
+        assert await run_once(retrying, "a") == StoredResponse(200, '{"key": "a"}')
+
+    asyncio.run(scenario())
+    engine.dispose()
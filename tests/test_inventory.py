@@ -1,5 +1,15 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from uuid import uuid4
 
+import pytest
+
+import inventory_ledger
+import models
+import websocket_manager
+from websocket_manager import manager
+
 
 def test_purchase_sweet_success(client) -> None:
     email = f"inventory_purchase_{uuid4().hex}@example.com"
@@ -72,3 +82,292 @@ def test_restock_sweet_success(client) -> None:
     assert response.status_code == 200
     body = response.json()
     assert body["quantity"] == initial_quantity + restock_payload["quantity"]
+
+
+def test_purchase_sweet_out_of_stock(client) -> None:
+    email = f"inventory_out_of_stock_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    assert login_response.status_code == 200
+
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    sweet_payload = {
+        "name": "Last Truffle",
+        "category": "Chocolate",
+        "price": 4.00,
+        "quantity": 1,
+    }
+
+    create_response = client.post("/api/sweets", json=sweet_payload, headers=headers)
+    assert create_response.status_code == 201
+    sweet_id = create_response.json()["id"]
+
+    first_response = client.post(f"/api/sweets/{sweet_id}/purchase", headers=headers)
+    assert first_response.status_code == 200
+    assert first_response.json()["quantity"] == 0
+
+    second_response = client.post(f"/api/sweets/{sweet_id}/purchase", headers=headers)
+    assert second_response.status_code == 400
+
+    missing_response = client.post(f"/api/sweets/{sweet_id + 1000}/purchase", headers=headers)
+    assert missing_response.status_code == 404
+
+
+def test_purchase_with_idempotency_key_runs_once(client) -> None:
+    email = f"inventory_idempotent_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    assert login_response.status_code == 200
+
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    sweet_payload = {
+        "name": "Sea Salt Caramel",
+        "category": "Candy",
+        "price": 1.5,
+        "quantity": 10,
+    }
+
+    create_response = client.post("/api/sweets", json=sweet_payload, headers=headers)
+    assert create_response.status_code == 201
+    sweet_id = create_response.json()["id"]
+
+    keyed_headers = {**headers, "Idempotency-Key": uuid4().hex}
+
+    def purchase():
+        return client.post(f"/api/sweets/{sweet_id}/purchase", headers=keyed_headers)
+
+    # Concurrent retries of the same purchase
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(lambda _: purchase(), range(8)))
+
+    assert all(response.status_code == 200 for response in responses)
+    assert {response.json()["quantity"] for response in responses} == {sweet_payload["quantity"] - 1}
+    replayed = [response for response in responses if response.headers.get("Idempotent-Replayed") == "true"]
+    assert len(replayed) == len(responses) - 1
+
+    sweet_response = client.get(f"/api/sweets/{sweet_id}", headers=headers)
+    assert sweet_response.json()["quantity"] == sweet_payload["quantity"] - 1
+
+    # A different key is a new purchase
+    response = client.post(
+        f"/api/sweets/{sweet_id}/purchase",
+        headers={**headers, "Idempotency-Key": uuid4().hex},
+    )
+    assert response.status_code == 200
+    assert response.json()["quantity"] == sweet_payload["quantity"] - 2
+
+
+def test_restock_idempotency_key_reused_with_different_body(client) -> None:
+    email = f"inventory_key_reuse_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    assert login_response.status_code == 200
+
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": uuid4().hex}
+
+    sweet_payload = {
+        "name": "Butterscotch",
+        "category": "Candy",
+        "price": 1.25,
+        "quantity": 5,
+    }
+
+    create_response = client.post("/api/sweets", json=sweet_payload, headers=headers)
+    assert create_response.status_code == 201
+    sweet_id = create_response.json()["id"]
+
+    first = client.post(f"/api/sweets/{sweet_id}/restock", json={"quantity": 10}, headers=headers)
+    assert first.status_code == 200
+    assert first.json()["quantity"] == 15
+
+    retry = client.post(f"/api/sweets/{sweet_id}/restock", json={"quantity": 10}, headers=headers)
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+
+    reused = client.post(f"/api/sweets/{sweet_id}/restock", json={"quantity": 20}, headers=headers)
+    assert reused.status_code == 422
+
+    sweet_response = client.get(f"/api/sweets/{sweet_id}", headers=headers)
+    assert sweet_response.json()["quantity"] == 15
+
+
+def test_purchase_key_is_kept_when_the_broadcast_fails(client, monkeypatch) -> None:
+    email = f"inventory_broadcast_failure_{uuid4().hex}@example.com"
+    password = "password123"
+
+    client.post("/api/auth/register", json={"email": email, "password": password, "role": "admin"})
+    token = client.post("/api/auth/login", data={"username": email, "password": password}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    sweet_payload = {"name": "Cinder Toffee", "category": "Candy", "price": 1.0, "quantity": 10}
+    sweet_id = client.post("/api/sweets", json=sweet_payload, headers=headers).json()["id"]
+    keyed_headers = {**headers, "Idempotency-Key": uuid4().hex}
+
+    async def broken_broadcast(message) -> None:
+        raise RuntimeError("broadcast failed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(manager, "broadcast", broken_broadcast)
+        with pytest.raises(RuntimeError):
+            client.post(f"/api/sweets/{sweet_id}/purchase", headers=keyed_headers)
+
+    retry = client.post(f"/api/sweets/{sweet_id}/purchase", headers=keyed_headers)
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["quantity"] == sweet_payload["quantity"] - 1
+    assert client.get(f"/api/sweets/{sweet_id}", headers=headers).json()["quantity"] == sweet_payload["quantity"] - 1
+
+
+def test_inventory_ledger_reconstructs_stock_before_and_after_compaction(client, db_session) -> None:
+    email = f"inventory_ledger_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    assert login_response.status_code == 200
+
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    sweet_payload = {"name": "Ledger Licorice", "category": "Candy", "price": 0.75, "quantity": 10}
+    create_response = client.post("/api/sweets", json=sweet_payload, headers=headers)
+    assert create_response.status_code == 201
+    sweet_id = create_response.json()["id"]
+
+    def checkpoint() -> float:
+        time.sleep(0.01)
+        moment = time.time()
+        time.sleep(0.01)
+        return moment
+
+    after_create = checkpoint()
+    client.post(f"/api/sweets/{sweet_id}/purchase", headers=headers)
+    client.post("/api/orders", json={"lines": [{"sweet_id": sweet_id, "quantity": 3}]}, headers=headers)
+    after_sales = checkpoint()
+    client.post(f"/api/sweets/{sweet_id}/restock", json={"quantity": 20}, headers=headers)
+    after_restock = checkpoint()
+    client.put(f"/api/sweets/{sweet_id}", json={"quantity": 5, "price": 0.8}, headers=headers)
+    client.put(f"/api/sweets/{sweet_id}", json={"price": 0.9}, headers=headers)
+
+    expected = {after_create: 10, after_sales: 6, after_restock: 26, None: 5}
+    for moment, quantity in expected.items():
+        assert inventory_ledger.stock_at(db_session, sweet_id, moment) == quantity
+    # The price-only edit did not touch stock, so it is not in the ledger
+    movements = db_session.query(models.InventoryMovement).filter_by(sweet_id=sweet_id).count()
+    assert movements == 5
+
+    response = client.get(
+        f"/api/admin/inventory/{sweet_id}",
+        params={"at": datetime.fromtimestamp(after_sales, timezone.utc).isoformat()},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["quantity"] == 6
+
+    # The periodic pass only snapshots sweets with a long enough tail
+    assert inventory_ledger.snapshot_busy(db_session, min_movements=6)[0] == 0
+    written, through_id = inventory_ledger.snapshot_busy(db_session, min_movements=5)
+    assert written == 1
+    assert inventory_ledger.snapshot_busy(db_session, min_movements=1, since_id=through_id) == (0, through_id)
+    for moment, quantity in expected.items():
+        assert inventory_ledger.stock_at(db_session, sweet_id, moment) == quantity
+
+    # Fold everything before the restock into a snapshot
+    result = inventory_ledger.compact(db_session, retention_seconds=0, now=after_restock)
+    assert result == {"snapshots": 1, "deleted": 4}
+    assert db_session.query(models.InventoryMovement).filter_by(sweet_id=sweet_id).count() == 1
+    assert inventory_ledger.stock_at(db_session, sweet_id, after_restock) == 26
+    assert inventory_ledger.stock_at(db_session, sweet_id) == 5
+    with pytest.raises(ValueError):
+        inventory_ledger.stock_at(db_session, sweet_id, after_create)
+
+    # Ledger ids keep growing after compaction empties the table
+    inventory_ledger.compact(db_session, retention_seconds=0)
+    client.post(f"/api/sweets/{sweet_id}/purchase", headers=headers)
+    assert inventory_ledger.stock_at(db_session, sweet_id) == 4
+    assert client.get("/api/admin/inventory/999999", headers=headers).status_code == 404
+
+
+def test_purchase_storm_fires_each_threshold_crossing_once(client, monkeypatch) -> None:
+    email = f"inventory_storm_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    assert login_response.status_code == 200
+
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    sweet_payload = {"name": "Storm Sherbet", "category": "Candy", "price": 0.5, "quantity": 10, "reorder_threshold": 3}
+    create_response = client.post("/api/sweets", json=sweet_payload, headers=headers)
+    assert create_response.status_code == 201
+    sweet_id = create_response.json()["id"]
+
+    crossings = []
+    broadcast = manager.broadcast
+
+    async def recording_broadcast(message):
+        if message.get("type") in websocket_manager.ADMIN_EVENT_TYPES:
+            crossings.append((message["type"], message["data"].quantity))
+        await broadcast(message)
+
+    monkeypatch.setattr(manager, "broadcast", recording_broadcast)
+
+    def storm(purchases: int) -> list[int]:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = pool.map(lambda _: client.post(f"/api/sweets/{sweet_id}/purchase", headers=headers), range(purchases))
+            return [response.status_code for response in responses]
+
+    statuses = storm(14)
+    assert statuses.count(200) == 10
+    assert statuses.count(400) == 4
+    assert crossings == [("stock_low", 3), ("stock_out", 0)]
+    assert websocket_manager.event_topics({"type": "stock_low", "data": {}}) == {"admin"}
+
+    # A restock above the threshold re-arms both crossings
+    crossings.clear()
+    client.post(f"/api/sweets/{sweet_id}/restock", json={"quantity": 6}, headers=headers)
+    statuses = storm(8)
+    assert statuses.count(200) == 6
+    assert crossings == [("stock_low", 3), ("stock_out", 0)]
+
+    # One order line can cross both thresholds at once
+    crossings.clear()
+    client.post(f"/api/sweets/{sweet_id}/restock", json={"quantity": 6}, headers=headers)
+    order = client.post("/api/orders", json={"lines": [{"sweet_id": sweet_id, "quantity": 6}]}, headers=headers)
+    assert order.status_code == 201
+    assert crossings == [("stock_low", 0), ("stock_out", 0)]
+
@@ -0,0 +1,96 @@
+from sqlalchemy import create_engine, text
+
+import migrations
+import models
+from database import Base
+
+
+def _schema(engine) -> dict[str, list]:
+    with engine.connect() as connection:
+        objects = connection.execute(
+            text("SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY name")
+        ).all()
+        schema = {"objects": [tuple(row) for row in objects]}
+        for _, name in objects:
+            if name in Base.metadata.tables:
+                schema[name] = [tuple(row) for row in connection.execute(text(f"PRAGMA table_info({name})"))]
+    return schema
+
+
+def test_migrations_match_models_and_are_idempotent(tmp_path) -> None:
+    migrated = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    assert migrations.migrate(migrated) == migrations.LATEST_VERSION
+
+    reference = create_engine(f"sqlite:///{tmp_path / 'reference.db'}")
+    Base.metadata.create_all(bind=reference)
+    assert _schema(migrated) == _schema(reference)
+    for engine in (migrated, reference):
+        with engine.connect() as connection:
+            sweets_sql = connection.execute(text("SELECT sql FROM sqlite_master WHERE name = 'sweets'")).scalar_one()
+            assert "AUTOINCREMENT" in sweets_sql
+
+    with migrated.begin() as connection:
+        connection.execute(
+            models.User.__table__.insert().values(email="keep@example.com", hashed_password="x", role="customer")
+        )
+    assert migrations.migrate(migrated) == migrations.LATEST_VERSION
+    with migrated.connect() as connection:
+        assert connection.execute(text("SELECT email FROM users")).scalar_one() == "keep@example.com"
+        assert connection.execute(text("PRAGMA user_version")).scalar_one() == migrations.LATEST_VERSION
+
+    # A database created by create_all is stamped with the latest version
+    assert migrations.migrate(reference) == migrations.LATEST_VERSION
+    migrated.dispose()
+    reference.dispose()
+
+
+# What the original drop_all/create_all startup produced: no FTS index, no triggers
+BASELINE_SCHEMA = (
+    "CREATE TABLE users ("
+    "id INTEGER NOT NULL, "
+    "email VARCHAR NOT NULL, "
+    "hashed_password VARCHAR NOT NULL, "
+    "role VARCHAR NOT NULL, "
+    "PRIMARY KEY (id))",
+    "CREATE UNIQUE INDEX ix_users_email ON users (email)",
+    "CREATE INDEX ix_users_id ON users (id)",
+    "CREATE TABLE sweets ("
+    "id INTEGER NOT NULL, "
+    "name VARCHAR NOT NULL, "
+    "category VARCHAR NOT NULL, "
+    "price FLOAT NOT NULL, "
+    "quantity INTEGER NOT NULL, "
+    "owner_id INTEGER NOT NULL, "
+    "PRIMARY KEY (id), "
+    "FOREIGN KEY(owner_id) REFERENCES users (id))",
+    "CREATE INDEX ix_sweets_id ON sweets (id)",
+)
+
+
+def test_migrate_adopts_unversioned_baseline_database(tmp_path) -> None:
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with legacy.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql(
+            "INSERT INTO users (id, email, hashed_password, role) VALUES (1, 'legacy@example.com', 'x', 'admin')"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO sweets (name, category, price, quantity, owner_id) VALUES ('Old Fudge', 'Candy', 1.0, 3, 1)"
+        )
+
+    assert migrations.migrate(legacy) == migrations.LATEST_VERSION
+
+    reference = create_engine(f"sqlite:///{tmp_path / 'reference.db'}")
+    Base.metadata.create_all(bind=reference)
+    assert _schema(legacy) == _schema(reference)
+    with legacy.begin() as connection:
+        assert connection.execute(text("SELECT name FROM sweets")).scalar_one() == "Old Fudge"
+        # Rows that predate the FTS triggers are indexed, and renaming one keeps the index consistent
+        assert connection.execute(text("SELECT rowid FROM sweets_fts WHERE sweets_fts MATCH 'fudge'")).all() == [(1,)]
+        connection.execute(text("UPDATE sweets SET name = 'Old Toffee' WHERE id = 1"))
+    with legacy.connect() as connection:
+        assert connection.execute(text("SELECT rowid FROM sweets_fts WHERE sweets_fts MATCH 'toffee'")).all() == [(1,)]
+        assert connection.execute(text("PRAGMA integrity_check")).scalar_one() == "ok"
+    legacy.dispose()
+    reference.dispose()
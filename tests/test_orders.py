@@ -0,0 +1,173 @@
+from uuid import uuid4
+
+
+def test_create_order_success(client) -> None:
+    email = f"order_tester_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    assert login_response.status_code == 200
+
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    sweets = [
+        {"name": "Gummy Bears", "category": "Candy", "price": 1.50, "quantity": 10},
+        {"name": "Toffee Crunch", "category": "Candy", "price": 2.00, "quantity": 5},
+    ]
+    sweet_ids = []
+    for payload in sweets:
+        response = client.post("/api/sweets", json=payload, headers=headers)
+        assert response.status_code == 201
+        sweet_ids.append(response.json()["id"])
+
+    order_payload = {
+        "lines": [
+            {"sweet_id": sweet_ids[0], "quantity": 3},
+            {"sweet_id": sweet_ids[1], "quantity": 2},
+        ]
+    }
+
+    response = client.post("/api/orders", json=order_payload, headers=headers)
+
+    assert response.status_code == 201
+    body = response.json()
+    assert body["total"] == 3 * 1.50 + 2 * 2.00
+    assert len(body["lines"]) == 2
+
+    first = client.get(f"/api/sweets/{sweet_ids[0]}", headers=headers).json()
+    second = client.get(f"/api/sweets/{sweet_ids[1]}", headers=headers).json()
+    assert first["quantity"] == 7
+    assert second["quantity"] == 3
+
+    history_response = client.get("/api/orders", headers=headers)
+    assert history_response.status_code == 200
+    history = history_response.json()
+    assert len(history) == 1
+    assert history[0]["id"] == body["id"]
+
+
+def test_create_order_is_all_or_nothing(client) -> None:
+    email = f"order_rollback_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    assert login_response.status_code == 200
+
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    plenty = client.post(
+        "/api/sweets",
+        json={"name": "Jelly Beans", "category": "Candy", "price": 0.75, "quantity": 20},
+        headers=headers,
+    ).json()
+    scarce = client.post(
+        "/api/sweets",
+        json={"name": "Rare Fudge", "category": "Fudge", "price": 5.00, "quantity": 1},
+        headers=headers,
+    ).json()
+
+    order_payload = {
+        "lines": [
+            {"sweet_id": plenty["id"], "quantity": 5},
+            {"sweet_id": scarce["id"], "quantity": 2},
+        ]
+    }
+
+    response = client.post("/api/orders", json=order_payload, headers=headers)
+
+    assert response.status_code == 400
+    unchanged = client.get(f"/api/sweets/{plenty['id']}", headers=headers).json()
+    assert unchanged["quantity"] == 20
+    assert client.get("/api/orders", headers=headers).json() == []
+
+    duplicated = {
+        "lines": [
+            {"sweet_id": plenty["id"], "quantity": 1},
+            {"sweet_id": plenty["id"], "quantity": 2},
+        ]
+    }
+    response = client.post("/api/orders", json=duplicated, headers=headers)
+
+    assert response.status_code == 422
+    assert client.get(f"/api/sweets/{plenty['id']}", headers=headers).json()["quantity"] == 20
+
+
+def test_sales_reports_roll_up_purchases_and_orders(client) -> None:
+    email = f"order_analytics_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    assert login_response.status_code == 200
+
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    beans = client.post(
+        "/api/sweets",
+        json={"name": "Jelly Beans", "category": "Candy", "price": 0.75, "quantity": 20},
+        headers=headers,
+    ).json()
+    fudge = client.post(
+        "/api/sweets",
+        json={"name": "Rare Fudge", "category": "Fudge", "price": 5.00, "quantity": 1},
+        headers=headers,
+    ).json()
+
+    def order(beans_quantity: int, fudge_quantity: int) -> int:
+        lines = [
+            {"sweet_id": beans["id"], "quantity": beans_quantity},
+            {"sweet_id": fudge["id"], "quantity": fudge_quantity},
+        ]
+        return client.post("/api/orders", json={"lines": lines}, headers=headers).status_code
+
+    assert client.post(f"/api/sweets/{beans['id']}/purchase", headers=headers).status_code == 200
+    assert order(3, 1) == 201
+    # Failed sales are not counted
+    assert client.post(f"/api/sweets/{fudge['id']}/purchase", headers=headers).status_code == 400
+    assert order(1, 1) == 400
+
+    response = client.get("/api/admin/analytics/sales/categories", headers=headers)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["granularity"] == "day"
+    assert len(report["buckets"]) in (30, 31)
+    totals = {series["key"]: (series["total_units"], series["total_revenue"]) for series in report["series"]}
+    # Best-selling category first
+    assert list(totals) == ["Fudge", "Candy"]
+    assert totals == {"Fudge": (1, 5.0), "Candy": (4, 3.0)}
+    assert sum(report["series"][1]["units"]) == 4
+    assert report["series"][1]["units"][-1] == 4
+
+    hourly = client.get(
+        "/api/admin/analytics/sales/sweets",
+        params={"granularity": "hour", "sweet_id": beans["id"], "start": report["buckets"][-1]},
+        headers=headers,
+    ).json()
+    assert [series["key"] for series in hourly["series"]] == [beans["id"]]
+    assert hourly["series"][0]["total_revenue"] == 3.0
+    assert len(hourly["buckets"]) <= 25
+
+    too_long = client.get(
+        "/api/admin/analytics/sales/categories",
+        params={"granularity": "hour", "start": "2000-01-01T00:00:00"},
+        headers=headers,
+    )
+    assert too_long.status_code == 400
+
@@ -0,0 +1,126 @@
+"""Query-plan regression checks for every query shape issued by crud.
+
+Each shape runs the real crud function against the test database while the
+emitted SQL is captured, then every captured statement is re-run under
+EXPLAIN QUERY PLAN. A shape fails if SQLite plans a full table scan for it,
+so a model or query change that drops an index shows up here instead of in
+production latency.
+"""
+
+import re
+from collections.abc import Callable
+
+import pytest
+from sqlalchemy import event
+
+import analytics
+import crud
+import inventory_ledger
+import schemas
+
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+@pytest.fixture()
+def catalog(db_session):
+    owner = crud.create_user(
+        db_session,
+        schemas.UserCreate(email="planner@example.com", password="password123"),
+        role="admin",
+    )
+    sweets = [
+        crud.create_sweet(
+            db_session,
+            schemas.SweetCreate(name=f"Chocolate Drop {index}", category=f"Category {index % 3}", price=1.0 + index, quantity=index),
+            owner_id=owner.id,
+        )
+        for index in range(10)
+    ]
+    return owner, sweets
+
+
+def capture_statements(db_session, action: Callable[[], object]) -> list[tuple[str, object]]:
+    """Run an action and return the SELECT/UPDATE/DELETE statements it emitted."""
+
+    statements: list[tuple[str, object]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().split(None, 1)[0].upper() in {"SELECT", "UPDATE", "DELETE"}:
+            statements.append((statement, parameters))
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        action()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def full_scans(db_session, statement: str, parameters) -> list[str]:
+    plan = db_session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return [row[-1] for row in plan if FULL_SCAN.match(row[-1])]
+
+
+def shapes(owner, sweets) -> dict[str, tuple[Callable, set[str]]]:
+    """Map each query shape to a crud call and the tables it may legitimately scan."""
+
+    sweet = sweets[4]
+    after_price = (sweet.price, sweet.id)
+    return {
+        "user by email": (lambda db: crud.get_user_by_email(db, owner.email), set()),
+        "sweet by id": (lambda db: crud.get_sweet(db, sweet.id), set()),
+        # An unfiltered listing in id order is a bounded walk of the table itself.
+        "list by id": (lambda db: crud.get_sweets(db, limit=5), {"sweets"}),
+        "list by id after cursor": (lambda db: crud.get_sweets(db, limit=5, after=(sweet.id, sweet.id)), set()),
+        "list by name": (lambda db: crud.get_sweets(db, limit=5, sort="name"), set()),
+        "list by price after cursor": (lambda db: crud.get_sweets(db, limit=5, sort="price", after=after_price), set()),
+        "list by owner": (lambda db: crud.get_sweets(db, limit=5, owner_id=owner.id), set()),
+        "search by name": (lambda db: crud.search_sweets(db, name="choc", sort="relevance"), set()),
+        "search by category": (lambda db: crud.search_sweets(db, category="Category 1"), set()),
+        "search by category and price range": (
+            lambda db: crud.search_sweets(db, category="Category 1", min_price=2.0, max_price=8.0, sort="price"),
+            set(),
+        ),
+        "search by price range": (lambda db: crud.search_sweets(db, min_price=2.0, max_price=8.0, sort="price"), set()),
+        "search by owner": (lambda db: crud.search_sweets(db, owner_id=owner.id), set()),
+        "purchase": (lambda db: crud.purchase_sweet(db, sweet.id), set()),
+        "purchase out of stock": (lambda db: crud.purchase_sweet(db, sweets[0].id), set()),
+        "restock": (lambda db: crud.restock_sweet(db, sweet.id, 5), set()),
+        "update": (lambda db: crud.update_sweet(db, sweet.id, schemas.SweetUpdate(price=9.5)), set()),
+        "update at stale version": (
+            lambda db: crud.update_sweet(db, sweet.id, schemas.SweetUpdate(price=9.0), expected_version=0),
+            set(),
+        ),
+        "low stock": (lambda db: crud.get_low_stock(db), set()),
+        "order history": (lambda db: crud.get_orders(db, owner.id), set()),
+        "stock at a point in time": (lambda db: inventory_ledger.stock_at(db, sweet.id, 4102444800.0), set()),
+        "sales by category": (lambda db: analytics.sales_report(db, "category", 0.0, 86400.0 * 90, "hour"), set()),
+        "sales of one sweet": (lambda db: analytics.sales_report(db, "sweet", 0.0, 86400.0 * 90, key=sweet.id), set()),
+        "delete": (lambda db: crud.delete_sweet(db, sweets[-1].id), set()),
+    }
+
+
+def test_crud_query_shapes_use_indexes(db_session, catalog) -> None:
+    owner, sweets = catalog
+    failures = []
+    for name, (action, allowed) in shapes(owner, sweets).items():
+        statements = capture_statements(db_session, lambda: action(db_session))
+        assert statements, f"{name}: no statements captured"
+        for statement, parameters in statements:
+            for scan in full_scans(db_session, statement, parameters):
+                if scan.split()[1] not in allowed:
+                    failures.append(f"{name}: {scan}\n    {statement}")
+    assert not failures, "Full table scans planned:\n" + "\n".join(failures)
+
+
+def test_low_stock_view_reads_only_the_partial_index(db_session, catalog) -> None:
+    statements = capture_statements(db_session, lambda: crud.get_low_stock(db_session))
+    plan = [
+        row[-1]
+        for statement, parameters in statements
+        for row in db_session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+    ]
+    assert any("ix_sweets_low_stock" in step for step in plan), plan
+    indexes = db_session.connection().exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").scalars()
+    assert "ix_sweets_quantity" not in set(indexes)
@@ -0,0 +1,57 @@
+import asyncio
+
+import security
+from rate_limit import PURCHASE_POLICY, MemoryBucketStore, Policy, SQLiteBucketStore, client_key
+
+
+def test_memory_store_refills_lazily_and_evicts_idle_keys() -> None:
+    now = [0.0]
+    store = MemoryBucketStore(max_keys=2, shards=1, clock=lambda: now[0])
+    policy = Policy("test", capacity=2, period=10)
+
+    assert store.take_now("a", policy) == 0.0
+    assert store.take_now("a", policy) == 0.0
+    assert store.take_now("a", policy) == 5.0
+
+    now[0] = 2.5
+    assert store.take_now("a", policy) == 2.5
+    now[0] = 5.0
+    assert store.take_now("a", policy) == 0.0
+
+    store.take_now("b", policy)
+    store.take_now("a", policy)
+    store.take_now("c", policy)
+    assert len(store) == 2
+    assert store.evictions == 1
+    # "b" was the idle key, so it comes back with a full bucket
+    assert store.take_now("b", policy) == 0.0
+    assert store.take_now("b", policy) == 0.0
+
+
+def test_sqlite_store_shares_buckets_between_workers(tmp_path) -> None:
+    path = str(tmp_path / "buckets.db")
+    workers = [SQLiteBucketStore(path) for _ in range(2)]
+    policy = Policy("test", capacity=3, period=3600)
+
+    async def scenario() -> list[float]:
+        return await asyncio.gather(*(workers[index % 2].take("client", policy) for index in range(5)))
+
+    waits = asyncio.run(scenario())
+    assert waits.count(0.0) == 3
+    assert all(1100 < wait <= 1200 for wait in waits if wait)
+    workers[0].clear()
+    assert workers[1].take_now("client", policy) == 0.0
+    for worker in workers:
+        worker.close()
+
+
+def test_purchases_are_keyed_by_verified_token_subject() -> None:
+    token = security.create_access_token({"sub": "buyer@example.com"})
+    forged = security.create_access_token({"sub": "buyer@example.com"}).rsplit(".", 1)[0] + ".forged"
+
+    def scope(authorization: str) -> dict:
+        return {"headers": [(b"authorization", authorization.encode())], "client": ("203.0.113.7", 5000)}
+
+    assert client_key(scope(f"Bearer {token}"), PURCHASE_POLICY) == "user:buyer@example.com"
+    assert client_key(scope(f"Bearer {forged}"), PURCHASE_POLICY) == "ip:203.0.113.7"
+    assert client_key(scope("Basic abc"), PURCHASE_POLICY) == "ip:203.0.113.7"
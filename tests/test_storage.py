@@ -0,0 +1,24 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from storage import StorageSettings, apply_pragmas
+
+
+def test_storage_profile_pragmas_apply_to_new_connections(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'profile.db'}")
+    monkeypatch.setenv("SQLITE_SYNCHRONOUS", "full")
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "1234")
+    settings = StorageSettings.from_env()
+    assert settings.resolved_async_url == f"sqlite+aiosqlite:///{tmp_path / 'profile.db'}"
+
+    engine = create_engine(settings.url, **settings.engine_options())
+    apply_pragmas(engine, settings)
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 2  # FULL
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+    engine.dispose()
+
+    monkeypatch.setenv("SQLITE_JOURNAL_MODE", "wal; DROP TABLE users")
+    with pytest.raises(ValueError):
+        StorageSettings.from_env()
@@ -1,5 +1,10 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from uuid import uuid4
 
+import bulk_import
+import pagination
+
 
 def test_create_sweet_success(client) -> None:
     email = f"sweet_tester_{uuid4().hex}@example.com"
@@ -174,3 +179,371 @@ def test_delete_sweet_success(client) -> None:
 
     get_response = client.get(f"/api/sweets/{sweet_id}", headers=headers)
     assert get_response.status_code == 404
+
+
+def test_bulk_import_sweets_reports_invalid_rows(client) -> None:
+    email = f"sweet_bulk_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    assert login_response.status_code == 200
+
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    body = "\n".join([
+        "name,category,price,quantity",
+        "Rock Candy,Candy,1.25,40",
+        "Sour Worms,Candy,not-a-price,12",
+        "Nougat Bar,Chocolate,2.10,15",
+    ])
+
+    response = client.post(
+        "/api/sweets/bulk",
+        content=body,
+        headers={**headers, "Content-Type": "text/csv"},
+    )
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["received"] == 3
+    assert report["imported"] == 2
+    assert report["failed"] == 1
+    assert report["errors"][0]["row"] == 2
+
+    sweets = client.get("/api/sweets", headers=headers).json()
+    rock_candy = next(sweet for sweet in sweets if sweet["name"] == "Rock Candy")
+
+    update_line = '{"id": %d, "name": "Rock Candy", "category": "Candy", "price": 1.50, "quantity": 60}' % rock_candy["id"]
+    response = client.post(
+        "/api/sweets/bulk",
+        content=update_line,
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["imported"] == 1
+    updated = client.get(f"/api/sweets/{rock_candy['id']}", headers=headers).json()
+    assert updated["quantity"] == 60
+    assert updated["price"] == 1.50
+    assert len(client.get("/api/sweets", headers=headers).json()) == 2
+
+    # Undecodable lines and out-of-range ids fail their own row only
+    body = b"\n".join([
+        b'{"name": "Caf\xe9 Cr\xe8me", "category": "Candy", "price": 1.0, "quantity": 5}',
+        b'{"id": 1e23, "name": "Giant", "category": "Candy", "price": 1.0, "quantity": 5}',
+        b'{"name": "Sherbet Lemon", "category": "Candy", "price": 0.8, "quantity": 9}',
+    ])
+    response = client.post("/api/sweets/bulk", content=body, headers={**headers, "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["received"], report["imported"], report["failed"]) == (3, 1, 2)
+    assert [error["row"] for error in report["errors"]] == [1, 2]
+    assert "UTF-8" in report["errors"][0]["errors"][0]
+
+    # Ids of deleted sweets are never revived, and over-long lines fail alone
+    assert client.delete(f"/api/sweets/{rock_candy['id']}", headers=headers).status_code == 204
+    body = "\n".join([
+        '{"name": "%s", "category": "Candy", "price": 1.0, "quantity": 1}' % ("x" * bulk_import.MAX_LINE_BYTES),
+        update_line,
+        '{"name": "Pear Drop", "category": "Candy", "price": 0.5, "quantity": 3}',
+    ])
+    response = client.post("/api/sweets/bulk", content=body, headers={**headers, "Content-Type": "application/x-ndjson"})
+    report = response.json()
+    assert (report["received"], report["imported"], report["failed"]) == (3, 1, 2)
+    assert [error["row"] for error in report["errors"]] == [1, 2]
+    assert "longer than" in report["errors"][0]["errors"][0]
+    assert report["errors"][1]["errors"] == [f"id: no sweet with id {rock_candy['id']}"]
+    assert client.get(f"/api/sweets/{rock_candy['id']}", headers=headers).status_code == 404
+
+
+def test_bulk_import_never_buffers_more_than_one_capped_line(monkeypatch) -> None:
+    monkeypatch.setattr(bulk_import, "MAX_LINE_BYTES", 8)
+
+    async def chunks():
+        for chunk in (b"ok\n0123", b"456789abc", b"def", b"\nfine\n", b"tail"):
+            yield chunk
+
+    async def collect() -> list[bytes]:
+        return [line async for line in bulk_import.iter_lines(chunks())]
+
+    assert asyncio.run(collect()) == [b"ok", b"012345678", b"fine", b"tail"]
+
+
+def test_list_sweets_cursor_pagination(client) -> None:
+    email = f"sweet_pages_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    assert login_response.status_code == 200
+
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    prices = [3.0, 1.0, 2.0, 1.0, 5.0]
+    for index, price in enumerate(prices):
+        payload = {"name": f"Drop {index}", "category": "Candy", "price": price, "quantity": 1}
+        assert client.post("/api/sweets", json=payload, headers=headers).status_code == 201
+
+    seen = []
+    params = {"limit": 2, "sort": "price"}
+    while True:
+        response = client.get("/api/sweets", params=params, headers=headers)
+        assert response.status_code == 200
+        seen.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params["cursor"] = cursor
+
+    assert [sweet["price"] for sweet in seen] == sorted(prices)
+    assert len({sweet["id"] for sweet in seen}) == len(prices)
+
+    # Relevance pages on (bm25 rank, id); identical names tie on rank
+    names = ["Lemon Drop", "Lemon Drop", "Lemon Sherbet", "Lemon Drop", "Lemon Sherbet"]
+    lemon_ids = [
+        client.post(
+            "/api/sweets", json={"name": name, "category": "Candy", "price": 1.0, "quantity": 1}, headers=headers
+        ).json()["id"]
+        for name in names
+    ]
+    seen = []
+    params = {"name": "lemon", "limit": 2}
+    while True:
+        response = client.get("/api/sweets/search", params=params, headers=headers)
+        assert response.status_code == 200
+        seen.extend(sweet["id"] for sweet in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params["cursor"] = cursor
+    assert sorted(seen) == lemon_ids
+    # Within a tie the id breaks it, so each name's sweets come out in id order
+    for name in set(names):
+        tied = [sweet_id for sweet_id, sweet_name in zip(lemon_ids, names) if sweet_name == name]
+        assert [sweet_id for sweet_id in seen if sweet_id in tied] == tied
+
+    bad_cursor = client.get("/api/sweets", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert bad_cursor.status_code == 400
+    # Well-formed cursors whose key has the wrong type for the sort
+    for key in ([1, 2], "cheap", None, True):
+        crafted = pagination.encode_cursor("price", key, 1)
+        response = client.get("/api/sweets", params={"sort": "price", "cursor": crafted}, headers=headers)
+        assert response.status_code == 400
+
+
+def test_search_sweets_name_index_follows_writes(client) -> None:
+    email = f"sweet_fts_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    assert login_response.status_code == 200
+
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    payload = {"name": "Chocolate Eclair", "category": "Pastry", "price": 2.50, "quantity": 10}
+    sweet_id = client.post("/api/sweets", json=payload, headers=headers).json()["id"]
+
+    def search(name: str) -> list[dict]:
+        response = client.get("/api/sweets/search", params={"name": name}, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    assert [sweet["id"] for sweet in search("choc ecl")] == [sweet_id]
+
+    client.put(f"/api/sweets/{sweet_id}", json={"name": "Vanilla Eclair"}, headers=headers)
+    assert search("choc") == []
+    assert [sweet["id"] for sweet in search("VAN")] == [sweet_id]
+
+    client.delete(f"/api/sweets/{sweet_id}", headers=headers)
+    assert search("eclair") == []
+
+
+def test_sweet_reads_answer_if_none_match_with_304(client) -> None:
+    email = f"sweet_etag_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    assert login_response.status_code == 200
+
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    first_id = client.post(
+        "/api/sweets", json={"name": "Lemon Drop", "category": "Candy", "price": 0.5, "quantity": 10}, headers=headers
+    ).json()["id"]
+    second_id = client.post(
+        "/api/sweets", json={"name": "Rum Truffle", "category": "Chocolate", "price": 1.5, "quantity": 10}, headers=headers
+    ).json()["id"]
+
+    listing = client.get("/api/sweets", headers=headers)
+    assert listing.status_code == 200
+    assert listing.headers["Cache-Control"] == "private, no-cache"
+    assert "Last-Modified" in listing.headers
+    list_etag = listing.headers["ETag"]
+
+    item = client.get(f"/api/sweets/{first_id}", headers=headers)
+    item_etag = item.headers["ETag"]
+
+    not_modified = client.get("/api/sweets", headers={**headers, "If-None-Match": list_etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == list_etag
+    search = client.get("/api/sweets/search", params={"name": "lemon"}, headers={**headers, "If-None-Match": list_etag})
+    assert search.status_code == 304
+    assert client.get(f"/api/sweets/{first_id}", headers={**headers, "If-None-Match": item_etag}).status_code == 304
+
+    # A purchase of another sweet changes the catalog but not this sweet's version
+    assert client.post(f"/api/sweets/{second_id}/purchase", headers=headers).status_code == 200
+    changed = client.get("/api/sweets", headers={**headers, "If-None-Match": list_etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != list_etag
+    assert {sweet["id"]: sweet["quantity"] for sweet in changed.json()}[second_id] == 9
+    assert client.get(f"/api/sweets/{first_id}", headers={**headers, "If-None-Match": item_etag}).status_code == 304
+
+    client.post(f"/api/sweets/{first_id}/restock", json={"quantity": 5}, headers=headers)
+    refreshed = client.get(f"/api/sweets/{first_id}", headers={**headers, "If-None-Match": item_etag})
+    assert refreshed.status_code == 200
+    assert refreshed.json()["quantity"] == 15
+    assert refreshed.headers["ETag"] != item_etag
+
+    # A sweet created after deleting the newest one gets a fresh id, so its ETag is new too
+    latest_etag = client.get(f"/api/sweets/{second_id}", headers=headers).headers["ETag"]
+    assert client.delete(f"/api/sweets/{second_id}", headers=headers).status_code == 204
+    third_id = client.post(
+        "/api/sweets", json={"name": "Rum Truffle", "category": "Chocolate", "price": 1.5, "quantity": 9}, headers=headers
+    ).json()["id"]
+    assert third_id != second_id
+    assert client.get(f"/api/sweets/{third_id}", headers={**headers, "If-None-Match": latest_etag}).status_code == 200
+
+
+def test_concurrent_updates_at_same_version_conflict(client) -> None:
+    email = f"sweet_occ_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    assert login_response.status_code == 200
+
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    sweet_payload = {"name": "Pecan Brittle", "category": "Candy", "price": 2.0, "quantity": 10}
+    create_response = client.post("/api/sweets", json=sweet_payload, headers=headers)
+    assert create_response.status_code == 201
+    sweet = create_response.json()
+    sweet_id = sweet["id"]
+
+    # Every editor read the same version before saving
+    def save(price: float):
+        return client.put(
+            f"/api/sweets/{sweet_id}",
+            params={"expected_version": sweet["version"]},
+            json={"price": price},
+            headers=headers,
+        )
+
+    prices = [2.0 + index for index in range(1, 9)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(save, prices))
+
+    winners = [response for response in responses if response.status_code == 200]
+    assert len(winners) == 1
+    assert sorted(response.status_code for response in responses) == [200] + [409] * 7
+    stored = client.get(f"/api/sweets/{sweet_id}", headers=headers).json()
+    assert stored["price"] == winners[0].json()["price"]
+    assert stored["version"] == sweet["version"] + 1
+
+    # The winner's ETag is a valid If-Match for the next edit; the stale one is not
+    etag = winners[0].headers["ETag"]
+    stale = client.put(f"/api/sweets/{sweet_id}", json={"quantity": 3}, headers={**headers, "If-Match": f'"s{sweet_id}-{sweet["version"]}"'})
+    assert stale.status_code == 409
+    fresh = client.put(f"/api/sweets/{sweet_id}", json={"quantity": 3}, headers={**headers, "If-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.json()["quantity"] == 3
+
+    malformed = client.put(f"/api/sweets/{sweet_id}", json={"quantity": 4}, headers={**headers, "If-Match": '"c1"'})
+    assert malformed.status_code == 400
+
+
+def test_low_stock_view_follows_sweet_and_category_thresholds(client) -> None:
+    email = f"sweet_low_stock_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    assert login_response.status_code == 200
+
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def create(name: str, category: str, quantity: int, **extra) -> dict:
+        payload = {"name": name, "category": category, "price": 1.0, "quantity": quantity, **extra}
+        response = client.post("/api/sweets", json=payload, headers=headers)
+        assert response.status_code == 201
+        return response.json()
+
+    def low_stock() -> list[int]:
+        response = client.get("/api/sweets/low-stock", headers=headers)
+        assert response.status_code == 200
+        return [sweet["id"] for sweet in response.json()]
+
+    scarce = create("Scarce Fudge", "Fudge", 2)
+    steady = create("Steady Fudge", "Fudge", 8)
+    toffee = create("Tuned Toffee", "Toffee", 4, reorder_threshold=1)
+    create("Plentiful Toffee", "Toffee", 50)
+    assert scarce["effective_reorder_threshold"] == 5
+    assert toffee["effective_reorder_threshold"] == 1
+    assert low_stock() == [scarce["id"]]
+
+    # A category default applies to the category's sweets without an override
+    response = client.put("/api/admin/categories/Fudge/reorder-threshold", json={"reorder_threshold": 10}, headers=headers)
+    assert response.json() == {"category": "Fudge", "reorder_threshold": 10}
+    refreshed = client.get(f"/api/sweets/{steady['id']}", headers=headers).json()
+    assert refreshed["effective_reorder_threshold"] == 10
+    assert refreshed["version"] == steady["version"] + 1
+
+    # Clearing the override falls back to the global default
+    response = client.put(f"/api/sweets/{toffee['id']}", json={"reorder_threshold": None}, headers=headers)
+    assert response.json()["effective_reorder_threshold"] == 5
+    assert low_stock() == [scarce["id"], toffee["id"], steady["id"]]
+
+    assert client.delete("/api/admin/categories/Fudge/reorder-threshold", headers=headers).status_code == 204
+    assert client.delete("/api/admin/categories/Fudge/reorder-threshold", headers=headers).status_code == 404
+    assert low_stock() == [scarce["id"], toffee["id"]]
+
+    customer_email = f"sweet_low_stock_customer_{uuid4().hex}@example.com"
+    client.post("/api/auth/register", json={"email": customer_email, "password": password})
+    customer_token = client.post("/api/auth/login", data={"username": customer_email, "password": password}).json()["access_token"]
+    response = client.get("/api/sweets/low-stock", headers={"Authorization": f"Bearer {customer_token}"})
+    assert response.status_code == 403
+
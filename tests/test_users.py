@@ -1,3 +1,7 @@
+import models
+import security
+
+
 def test_read_current_user_success(client) -> None:
     email = "test@example.com"
     password = "password123"
@@ -17,3 +21,51 @@ def test_read_current_user_success(client) -> None:
     assert response.status_code == 200
     body = response.json()
     assert body.get("email") == email
+
+
+def test_cached_principal_follows_role_changes_and_deletion(client, db_session) -> None:
+    email = "promoted@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/api/users/me", headers=headers).json()["role"] == "customer"
+
+    user = db_session.query(models.User).filter(models.User.email == email).one()
+    user.role = "admin"
+    db_session.commit()
+
+    assert client.get("/api/users/me", headers=headers).json()["role"] == "admin"
+
+    db_session.delete(user)
+    db_session.commit()
+
+    assert client.get("/api/users/me", headers=headers).status_code == 401
+
+
+def test_cached_principal_expires_after_changes_made_by_other_workers(client, db_session, monkeypatch) -> None:
+    email = "elsewhere@example.com"
+    password = "password123"
+
+    client.post("/api/auth/register", json={"email": email, "password": password})
+    token = client.post("/api/auth/login", data={"username": email, "password": password}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    now = [1000.0]
+    monkeypatch.setattr(security._principals, "_clock", lambda: now[0])
+    assert client.get("/api/users/me", headers=headers).json()["role"] == "customer"
+
+    # Another worker's update fires no ORM event in this process
+    db_session.connection().exec_driver_sql("UPDATE users SET role = 'admin' WHERE email = ?", (email,))
+    db_session.commit()
+    assert client.get("/api/users/me", headers=headers).json()["role"] == "customer"
+
+    now[0] += security.PRINCIPAL_CACHE_TTL_SECONDS
+    assert client.get("/api/users/me", headers=headers).json()["role"] == "admin"
@@ -0,0 +1,252 @@
+import asyncio
+import json
+from uuid import uuid4
+
+import schemas
+import websocket_manager
+from websocket_manager import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.received: list[dict] = []
+        self.closed_with: int | None = None
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, data: str) -> None:
+        await asyncio.sleep(self.delay)
+        self.received.append(json.loads(data))
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed_with = code
+
+
+def test_slow_client_does_not_delay_fast_clients() -> None:
+    async def scenario() -> None:
+        manager = ConnectionManager(queue_size=2, slow_client_policy="drop_oldest")
+        fast, slow = FakeWebSocket(), FakeWebSocket(delay=60)
+        await manager.connect(fast)
+        await manager.connect(slow)
+
+        for n in range(5):
+            await asyncio.wait_for(manager.broadcast({"n": n}), timeout=0.1)
+        await asyncio.sleep(0.05)
+
+        assert [m["n"] for m in fast.received] == [0, 1, 2, 3, 4]
+        assert slow.received == []
+        # The slow writer holds message 0; its queue keeps only the newest two.
+        assert manager.dropped_messages == 2
+        pending = [json.loads(m.text)["n"] for m in manager.active_connections[slow].queue._queue]
+        assert pending == [3, 4]
+
+        manager.disconnect(fast)
+        manager.disconnect(slow)
+        manager.disconnect(slow)
+        assert manager.active_connections == {}
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_policy_closes_lagging_client() -> None:
+    async def scenario() -> None:
+        manager = ConnectionManager(queue_size=1, slow_client_policy="disconnect")
+        slow = FakeWebSocket(delay=60)
+        await manager.connect(slow)
+
+        for n in range(3):
+            await manager.broadcast({"n": n})
+        await asyncio.sleep(0.01)
+
+        assert slow not in manager.active_connections
+        assert slow.closed_with == 1013
+        assert manager.slow_disconnects == 1
+
+    asyncio.run(scenario())
+
+
+def test_coalescer_batches_quantities_and_preserves_order() -> None:
+    async def scenario() -> None:
+        manager = ConnectionManager(coalesce_window_ms=20)
+        client = FakeWebSocket()
+        await manager.connect(client)
+
+        for version, quantity in enumerate((9, 8, 7), start=2):
+            await manager.broadcast(
+                {
+                    "type": "sweet_purchased",
+                    "data": {"id": 1, "quantity": quantity, "version": version, "name": "A", "category": "Candy"},
+                }
+            )
+        await manager.broadcast(
+            {"type": "sweet_restocked", "data": {"id": 2, "quantity": 50, "version": 3, "name": "B", "category": "Fudge"}}
+        )
+        await asyncio.sleep(0.05)
+        assert client.received == [
+            {
+                "type": "inventory_batch",
+                "data": [
+                    {"id": 1, "quantity": 7, "version": 4, "category": "Candy"},
+                    {"id": 2, "quantity": 50, "version": 3, "category": "Fudge"},
+                ],
+            },
+        ]
+
+        await manager.broadcast(
+            {"type": "sweet_purchased", "data": {"id": 1, "quantity": 6, "version": 5, "name": "A", "category": "Candy"}}
+        )
+        await manager.broadcast({"type": "sweet_deleted", "data": {"id": 1}})
+        await asyncio.sleep(0.05)
+        assert [message["type"] for message in client.received[1:]] == ["inventory_batch", "sweet_deleted"]
+
+        stats = manager.stats()
+        assert stats["events_in"] == 6
+        assert stats["messages_out"] == 3
+        manager.disconnect(client)
+
+    asyncio.run(scenario())
+
+
+def test_coalesced_batches_reach_topic_subscribers_with_their_sweets_only() -> None:
+    async def scenario() -> None:
+        manager = ConnectionManager(coalesce_window_ms=20)
+        everything, candy, fudge_bar, both = FakeWebSocket(), FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        for websocket in (everything, candy, fudge_bar, both):
+            await manager.connect(websocket)
+        manager.subscribe(candy, ["category:Candy"])
+        manager.subscribe(fudge_bar, ["sweet:3"], fields=["quantity"])
+        manager.subscribe(both, ["category:Candy", "sweet:3"])
+
+        sweets = [(1, "Candy"), (2, "Candy"), (3, "Fudge"), (4, "Toffee")]
+        for sweet_id, category in sweets:
+            await manager.broadcast(
+                {
+                    "type": "sweet_purchased",
+                    "data": {"id": sweet_id, "quantity": 5, "version": 2, "name": "X", "category": category},
+                }
+            )
+        await asyncio.sleep(0.05)
+
+        def batch_ids(websocket: FakeWebSocket) -> list[list[int]]:
+            return [[entry["id"] for entry in message["data"]] for message in websocket.received]
+
+        assert batch_ids(everything) == [[1, 2, 3, 4]]
+        assert batch_ids(candy) == [[1, 2]]
+        assert batch_ids(both) == [[1, 2, 3]]
+        assert fudge_bar.received == [{"type": "inventory_batch", "data": [{"id": 3, "quantity": 5}]}]
+        for websocket in (everything, candy, fudge_bar, both):
+            manager.disconnect(websocket)
+
+    asyncio.run(scenario())
+
+
+def test_fan_out_decodes_events_only_to_build_projected_copies(monkeypatch) -> None:
+    decoded: list[str] = []
+
+    class CountingJson:
+        @staticmethod
+        def loads(text: str):
+            decoded.append(text)
+            return json.loads(text)
+
+    monkeypatch.setattr(websocket_manager, "json", CountingJson)
+
+    async def scenario() -> None:
+        manager = ConnectionManager()
+        everything, candy = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(everything)
+        await manager.connect(candy)
+        manager.subscribe(candy, ["category:Candy"])
+        sweet = schemas.Sweet(id=1, name="Mint", category="Candy", price=1.0, quantity=4, owner_id=1)
+
+        await manager.broadcast({"type": "sweet_purchased", "data": sweet})
+        await asyncio.sleep(0.01)
+        assert decoded == []
+        assert everything.received == candy.received == [{"type": "sweet_purchased", "data": sweet.model_dump()}]
+
+        manager.subscribe(candy, ["category:Candy"], fields=["quantity"])
+        await manager.broadcast({"type": "sweet_purchased", "data": sweet})
+        await asyncio.sleep(0.01)
+        assert len(decoded) == 1
+        assert candy.received[-1] == {"type": "sweet_purchased", "data": {"id": 1, "quantity": 4}}
+
+        for websocket in (everything, candy):
+            manager.disconnect(websocket)
+
+    asyncio.run(scenario())
+
+
+def test_ws_subscription_filters_topics_and_projects_fields(client) -> None:
+    email = f"ws_topics_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    watched = client.post(
+        "/api/sweets", json={"name": "Watched Fudge", "category": "Fudge", "price": 2.0, "quantity": 5}, headers=headers
+    ).json()
+    other = client.post(
+        "/api/sweets", json={"name": "Other Toffee", "category": "Toffee", "price": 1.0, "quantity": 5}, headers=headers
+    ).json()
+
+    with client.websocket_connect("/ws") as websocket:
+        websocket.send_json({"action": "subscribe", "topics": ["admin"]})
+        assert websocket.receive_json()["type"] == "error"
+
+        websocket.send_json({"action": "subscribe", "topics": [f"sweet:{watched['id']}"], "fields": ["quantity"]})
+        assert websocket.receive_json() == {"type": "subscriptions", "topics": [f"sweet:{watched['id']}"]}
+
+        client.post(f"/api/sweets/{other['id']}/purchase", headers=headers)
+        client.post(f"/api/sweets/{watched['id']}/purchase", headers=headers)
+        assert websocket.receive_json() == {"type": "sweet_purchased", "data": {"id": watched["id"], "quantity": 4}}
+
+    with client.websocket_connect(f"/ws?token={token}") as websocket:
+        websocket.send_json({"action": "subscribe", "topics": ["admin", "category:Toffee"]})
+        assert websocket.receive_json() == {"type": "subscriptions", "topics": ["admin", "category:Toffee"]}
+
+
+def test_purchase_response_and_broadcast_share_one_encoding(client) -> None:
+    email = f"ws_shared_{uuid4().hex}@example.com"
+    password = "password123"
+
+    register_payload = {"email": email, "password": password, "role": "admin"}
+    register_response = client.post("/api/auth/register", json=register_payload)
+    assert register_response.status_code == 201
+
+    login_payload = {"username": email, "password": password}
+    login_response = client.post("/api/auth/login", data=login_payload)
+    token = login_response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    sweet = client.post(
+        "/api/sweets", json={"name": "Shared Nougat", "category": "Nougat", "price": 1.75, "quantity": 3}, headers=headers
+    ).json()
+
+    with client.websocket_connect("/ws") as websocket:
+        response = client.post(f"/api/sweets/{sweet['id']}/purchase", headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        event = websocket.receive_json()
+
+    assert event["type"] == "sweet_purchased"
+    assert event["data"] == response.json()
+    assert set(response.json()) == {
+        "id",
+        "name",
+        "category",
+        "price",
+        "quantity",
+        "owner_id",
+        "version",
+        "reorder_threshold",
+        "effective_reorder_threshold",
+    }
@@ -1,15 +1,238 @@
 """WebSocket connection manager for real-time updates."""
 
-from typing import List
+import asyncio
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable
+
 from fastapi import WebSocket
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from event_bus import EventBus, InProcessEventBus, create_event_bus
+
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+# What to do when a client's queue is full: "drop_oldest" discards the stalest
+# pending message, "disconnect" closes the lagging connection.
+SLOW_CLIENT_POLICY = os.getenv("WS_SLOW_CLIENT_POLICY", "drop_oldest")
+
+# Opt-in: when above zero, quantity-only events are merged over this window
+# into one "inventory_batch" message.
+COALESCE_WINDOW_MS = float(os.getenv("WS_COALESCE_WINDOW_MS", "0"))
+COALESCED_EVENT_TYPES = frozenset({"sweet_purchased", "sweet_restocked"})
+
+# Topics a client can subscribe to: "all" (every public event, the default
+# until a client subscribes), "admin" (admin-only events), "sweet:<id>" and
+# "category:<name>".
+ALL_TOPIC = "all"
+ADMIN_TOPIC = "admin"
+# Stock threshold crossings (see crud.stock_crossings)
+ADMIN_EVENT_TYPES: frozenset[str] = frozenset({"stock_low", "stock_out"})
+
+Fields = frozenset[str] | None
+
+# Close code sent to clients disconnected for falling behind ("try again later").
+_CLOSE_TRY_AGAIN_LATER = 1013
+
+
+@dataclass(frozen=True, slots=True)
+class EncodedMessage:
+    """A broadcast payload serialized once and shared by every connection."""
+
+    text: str
+
+    @classmethod
+    def from_message(cls, message: Any) -> "EncodedMessage":
+        """Serialize a message with pydantic's JSON encoder.
+
+        Args:
+            message: Event dictionary (or any value pydantic can serialize).
+
+        Returns:
+            The encoded message, ready to be sent as a text frame.
+        """
+        return cls(to_json(message).decode())
+
+
+def validate_topic(topic: Any) -> str:
+    """Check that a client-supplied topic is one the manager can route.
+
+    Args:
+        topic: Topic string from a subscribe or unsubscribe request.
+
+    Returns:
+        The topic, unchanged.
+
+    Raises:
+        ValueError: If the topic is not a known topic or pattern.
+    """
+    if topic in {ALL_TOPIC, ADMIN_TOPIC} or (isinstance(topic, str) and topic.startswith("category:")):
+        return topic
+    if isinstance(topic, str) and topic.startswith("sweet:") and topic[len("sweet:"):].isdigit():
+        return topic
+    raise ValueError(f"Unknown topic: {topic!r}")
+
+
+def _field(sweet: Any, name: str) -> Any:
+    """Read a field of a sweet given as a dict or as a model."""
+    return sweet.get(name) if isinstance(sweet, dict) else getattr(sweet, name, None)
+
+
+def _sweets_in(data: Any) -> list[Any]:
+    """Return the sweets (dicts or models) carried by an event's data."""
+    if isinstance(data, list):
+        return [item for item in data if isinstance(item, (dict, BaseModel))]
+    if isinstance(data, BaseModel):
+        return [data]
+    if isinstance(data, dict):
+        if isinstance(data.get("sweets"), list):
+            return data["sweets"]
+        if "id" in data:
+            return [data]
+    return []
+
+
+def event_topics(message: dict) -> set[str]:
+    """List the topics an event is published to.
+
+    Admin-only event types go to the admin topic alone. Every other event
+    goes to "all" plus a sweet and category topic for each sweet it carries.
+
+    Args:
+        message: Event with "type" and "data", either decoded or as
+            broadcast, with models for sweets.
+
+    Returns:
+        The set of topics whose subscribers should receive the event.
+    """
+    if message.get("type") in ADMIN_EVENT_TYPES:
+        return {ADMIN_TOPIC}
+    topics = {ALL_TOPIC}
+    for sweet in _sweets_in(message.get("data")):
+        sweet_id, category = _field(sweet, "id"), _field(sweet, "category")
+        if sweet_id is not None:
+            topics.add(f"sweet:{sweet_id}")
+        if category is not None:
+            topics.add(f"category:{category}")
+    return topics
+
+
+def _select(message: dict, topics: frozenset[str]) -> dict:
+    """Keep only the sweets of a multi-sweet event that match one of ``topics``."""
+
+    def matches(sweet: dict) -> bool:
+        return f"sweet:{sweet.get('id')}" in topics or f"category:{sweet.get('category')}" in topics
+
+    data = message.get("data")
+    if isinstance(data, list):
+        data = [item for item in data if isinstance(item, dict) and matches(item)]
+    elif isinstance(data, dict) and isinstance(data.get("sweets"), list):
+        data = {**data, "sweets": [sweet for sweet in data["sweets"] if matches(sweet)]}
+    return {**message, "data": data}
+
+
+def _project(message: dict, fields: frozenset[str]) -> dict:
+    """Trim every sweet in an event down to the requested fields (plus id)."""
+
+    def trim(sweet: dict) -> dict:
+        return {key: value for key, value in sweet.items() if key == "id" or key in fields}
+
+    data = message.get("data")
+    if isinstance(data, list):
+        data = [trim(item) if isinstance(item, dict) else item for item in data]
+    elif isinstance(data, dict) and isinstance(data.get("sweets"), list):
+        data = {**data, "sweets": [trim(sweet) for sweet in data["sweets"]]}
+    elif isinstance(data, dict) and "id" in data:
+        data = trim(data)
+    return {**message, "data": data}
+
+
+class _Client:
+    """A connected socket with its own outbound queue, writer task and topics."""
+
+    __slots__ = ("websocket", "queue", "writer", "subscriptions")
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: asyncio.Task | None = None
+        self.subscriptions: Dict[str, Fields] = {}
 
 
 class ConnectionManager:
-    """Manages WebSocket connections and broadcasts messages."""
+    """Manages WebSocket connections and broadcasts messages.
 
-    def __init__(self):
-        """Initialize the connection manager with an empty list of active connections."""
-        self.active_connections: List[WebSocket] = []
+    Every connection gets a bounded outbound queue drained by its own writer
+    task, so ``broadcast`` only enqueues and one slow client cannot hold up
+    the others or the HTTP request that triggered the event. Events go
+    through an :class:`event_bus.EventBus`, so with several workers each
+    event reaches every worker's clients.
+
+    Clients are indexed by the topics they subscribe to. Fan-out only visits
+    the subscribers of an event's topics, and serializes each distinct field
+    projection once. New connections are subscribed to "all" until they
+    choose their own topics.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = SEND_QUEUE_SIZE,
+        slow_client_policy: str = SLOW_CLIENT_POLICY,
+        bus: EventBus | None = None,
+        coalesce_window_ms: float = COALESCE_WINDOW_MS,
+    ):
+        """Initialize the connection manager with no active connections.
+
+        Args:
+            queue_size: Maximum number of pending messages per connection.
+            slow_client_policy: "drop_oldest" or "disconnect".
+            bus: Event bus shared with other workers; in-process by default.
+            coalesce_window_ms: Window for merging purchase/restock events
+                into ``inventory_batch`` messages; 0 sends every event as is.
+        """
+        if slow_client_policy not in {"drop_oldest", "disconnect"}:
+            raise ValueError(f"Unknown slow client policy: {slow_client_policy}")
+        self.queue_size = queue_size
+        self.slow_client_policy = slow_client_policy
+        self.active_connections: Dict[WebSocket, _Client] = {}
+        self._subscribers: Dict[str, Dict[_Client, Fields]] = {}
+        self.dropped_messages = 0
+        self.slow_disconnects = 0
+        self.bus = bus or InProcessEventBus()
+        self.bus.bind(self._fan_out)
+        self.coalesce_window = coalesce_window_ms / 1000
+        self._pending_quantities: Dict[int, dict] = {}
+        self._flush_timer: asyncio.Task | None = None
+        self.events_in = 0
+        self.messages_out = 0
+        self.bytes_out = 0
+
+    async def start(self):
+        """Start the event bus, e.g. its poller for other workers' events."""
+        await self.bus.start()
+
+    async def stop(self):
+        """Send any pending inventory batch, then stop the event bus."""
+        await self.flush()
+        await self.bus.stop()
+
+    def stats(self) -> dict[str, int]:
+        """Return broadcast pipeline counters for this worker.
+
+        Returns:
+            Events passed to ``broadcast``, messages and bytes published after
+            coalescing, local connections and topics, and slow-client counters.
+        """
+        return {
+            "events_in": self.events_in,
+            "messages_out": self.messages_out,
+            "bytes_out": self.bytes_out,
+            "connections": len(self.active_connections),
+            "topics": len(self._subscribers),
+            "dropped_messages": self.dropped_messages,
+            "slow_disconnects": self.slow_disconnects,
+        }
 
     async def connect(self, websocket: WebSocket):
         """Accept and register a new WebSocket connection.
@@ -18,34 +241,241 @@ class ConnectionManager:
             websocket: The WebSocket connection to register.
         """
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = _Client(websocket, self.queue_size)
+        client.writer = asyncio.create_task(self._write(client))
+        self.active_connections[websocket] = client
+        self._add_subscription(client, ALL_TOPIC, None)
 
     def disconnect(self, websocket: WebSocket):
-        """Remove a WebSocket connection from the active list.
+        """Remove a WebSocket connection, its subscriptions and its writer.
+
+        Safe to call more than once for the same connection.
 
         Args:
             websocket: The WebSocket connection to remove.
         """
-        self.active_connections.remove(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client is None:
+            return
+        for topic in list(client.subscriptions):
+            self._remove_subscription(client, topic)
+        if client.writer is not asyncio.current_task():
+            client.writer.cancel()
+
+    def _add_subscription(self, client: _Client, topic: str, fields: Fields):
+        client.subscriptions[topic] = fields
+        self._subscribers.setdefault(topic, {})[client] = fields
+
+    def _remove_subscription(self, client: _Client, topic: str):
+        client.subscriptions.pop(topic, None)
+        subscribers = self._subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.pop(client, None)
+            if not subscribers:
+                del self._subscribers[topic]
+
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str], fields: Iterable[str] | None = None) -> list[str]:
+        """Subscribe a connection to topics, optionally projecting sweet fields.
+
+        A connection's first subscription replaces its default "all" topic.
+        Subscribing again to a topic replaces that topic's projection.
+
+        Args:
+            websocket: A registered WebSocket connection.
+            topics: Topics such as "sweet:3", "category:Chocolate" or "admin".
+            fields: Sweet fields to send (``id`` is always included), or None
+                for the full objects.
+
+        Returns:
+            The connection's topics after the change.
+
+        Raises:
+            ValueError: If a topic is unknown or the fields are not strings.
+        """
+        topics = [validate_topic(topic) for topic in topics]
+        if fields is not None:
+            fields = list(fields)
+            if not all(isinstance(field, str) for field in fields):
+                raise ValueError("Fields must be a list of strings")
+            fields = frozenset(fields)
+        client = self.active_connections[websocket]
+        if client.subscriptions == {ALL_TOPIC: None}:
+            self._remove_subscription(client, ALL_TOPIC)
+        for topic in topics:
+            self._add_subscription(client, topic, fields)
+        return sorted(client.subscriptions)
 
-    async def broadcast(self, message: dict):
-        """Broadcast a message to all connected clients.
+    def unsubscribe(self, websocket: WebSocket, topics: Iterable[str]) -> list[str]:
+        """Drop topics from a connection's subscriptions.
 
         Args:
-            message: Dictionary containing the event type and data to broadcast.
+            websocket: A registered WebSocket connection.
+            topics: Topics to stop receiving.
+
+        Returns:
+            The connection's topics after the change.
+        """
+        client = self.active_connections[websocket]
+        for topic in topics:
+            self._remove_subscription(client, topic)
+        return sorted(client.subscriptions)
+
+    def send(self, websocket: WebSocket, message: dict):
+        """Queue a message for a single connection, e.g. a subscription reply.
+
+        Args:
+            websocket: A registered WebSocket connection.
+            message: The message to send.
         """
-        # Remove disconnected clients
-        disconnected = []
-        for connection in self.active_connections:
+        client = self.active_connections.get(websocket)
+        if client is not None:
+            self._enqueue(client, EncodedMessage.from_message(message))
+
+    async def _write(self, client: _Client):
+        """Drain a connection's queue onto its socket until it fails."""
+        while True:
+            message = await client.queue.get()
             try:
-                await connection.send_json(message)
+                await client.websocket.send_text(message.text)
             except Exception:
-                disconnected.append(connection)
-        
-        # Clean up disconnected clients
-        for connection in disconnected:
-            self.active_connections.remove(connection)
+                self.disconnect(client.websocket)
+                return
+
+    async def _close_slow(self, websocket: WebSocket):
+        try:
+            await websocket.close(code=_CLOSE_TRY_AGAIN_LATER)
+        except Exception:
+            pass
+
+    async def broadcast(self, message: dict | EncodedMessage):
+        """Publish a message to the clients of every worker.
+
+        The message is serialized once, here, and published on the event bus,
+        which hands it back to each worker's manager for local fan-out. When
+        coalescing is on, purchase and restock events are instead held for
+        the window and merged into one ``inventory_batch``; any other event
+        flushes the pending batch first so clients see changes in order.
+
+        Args:
+            message: Dictionary containing the event type and data to broadcast,
+                or an already encoded message.
+        """
+        self.events_in += 1
+        if self.coalesce_window > 0 and isinstance(message, dict) and message.get("type") in COALESCED_EVENT_TYPES:
+            data = message["data"]
+            if not isinstance(data, dict):
+                data = data.model_dump()
+            # The category keeps the batch routable to category subscribers, and
+            # the version keeps clients' cached rows usable for conditional edits
+            self._pending_quantities[data["id"]] = {
+                "id": data["id"],
+                "quantity": data["quantity"],
+                "version": data["version"],
+                "category": data["category"],
+            }
+            if self._flush_timer is None:
+                self._flush_timer = asyncio.create_task(self._flush_after_window())
+            return
+        await self.flush()
+        await self._publish(message)
+
+    async def flush(self):
+        """Publish the pending ``inventory_batch``, if any, right away."""
+        if self._flush_timer is not None and self._flush_timer is not asyncio.current_task():
+            self._flush_timer.cancel()
+        self._flush_timer = None
+        if not self._pending_quantities:
+            return
+        pending, self._pending_quantities = self._pending_quantities, {}
+        await self._publish({
+            "type": "inventory_batch",
+            "data": list(pending.values()),
+        })
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.coalesce_window)
+        await self.flush()
+
+    async def _publish(self, message: dict | EncodedMessage):
+        # Topics are read off the event as built, so no worker has to decode it to route it
+        topics = None
+        if not isinstance(message, EncodedMessage):
+            topics = frozenset(event_topics(message))
+            message = EncodedMessage.from_message(message)
+        self.messages_out += 1
+        self.bytes_out += len(message.text.encode())
+        await self.bus.publish(message.text, topics)
+
+    def _fan_out(self, text: str, topics: frozenset[str] | None = None):
+        """Queue an encoded event for this worker's interested clients without waiting on sends.
+
+        A client that only receives a multi-sweet event (such as an
+        ``inventory_batch``) through sweet or category topics gets just the
+        sweets matching those topics. The event is decoded only to build
+        such narrowed or projected copies, or when ``topics`` is not given.
+        """
+        event = None
+        if topics is None:
+            event = json.loads(text)
+            topics = frozenset(event_topics(event))
+        targets: Dict[_Client, Fields] = {}
+        for topic in topics:
+            for client, fields in self._subscribers.get(topic, {}).items():
+                if client in targets and (targets[client] is None or fields is None):
+                    targets[client] = None
+                elif client in targets:
+                    targets[client] = targets[client] | fields
+                else:
+                    targets[client] = fields
+        # Narrowing only changes events carrying more than one sweet
+        if sum(topic.startswith("sweet:") for topic in topics) > 1:
+            self._fan_out_selected(event, text, topics, targets)
+            return
+        encoded: Dict[Fields, EncodedMessage] = {None: EncodedMessage(text)}
+        for client, fields in targets.items():
+            if fields not in encoded:
+                if event is None:
+                    event = json.loads(text)
+                encoded[fields] = EncodedMessage.from_message(_project(event, fields))
+            self._enqueue(client, encoded[fields])
+
+    def _fan_out_selected(
+        self, event: dict | None, text: str, topics: frozenset[str], targets: Dict[_Client, Fields]
+    ):
+        """Fan out a multi-sweet event, narrowed to each client's matching sweets."""
+        # Sweet and category topics each client matched; None for the whole event
+        matched: Dict[_Client, set[str] | None] = {}
+        for topic in topics:
+            whole = topic in {ALL_TOPIC, ADMIN_TOPIC}
+            for client in self._subscribers.get(topic, {}):
+                if whole:
+                    matched[client] = None
+                elif matched.setdefault(client, set()) is not None:
+                    matched[client].add(topic)
+        encoded: Dict[tuple[Fields, frozenset[str] | None], EncodedMessage] = {(None, None): EncodedMessage(text)}
+        for client, fields in targets.items():
+            selected = matched[client]
+            key = (fields, None if selected is None else frozenset(selected))
+            if key not in encoded:
+                if event is None:
+                    event = json.loads(text)
+                message = event if key[1] is None else _select(event, key[1])
+                encoded[key] = EncodedMessage.from_message(message if fields is None else _project(message, fields))
+            self._enqueue(client, encoded[key])
+
+    def _enqueue(self, client: _Client, message: EncodedMessage):
+        try:
+            client.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            if self.slow_client_policy == "disconnect":
+                self.slow_disconnects += 1
+                self.disconnect(client.websocket)
+                asyncio.create_task(self._close_slow(client.websocket))
+                return
+            client.queue.get_nowait()
+            client.queue.put_nowait(message)
+            self.dropped_messages += 1
 
 
 # Global instance
-manager = ConnectionManager()
+manager = ConnectionManager(bus=create_event_bus())